@@ -6,6 +6,7 @@ from NetMatch import *
 
 from sch_reader import *
 from svg_edit import *
+from footprint_cache import prepare_footprint_png
 
 from PCB_utils import *
 
@@ -13,6 +14,8 @@ import cv2
 import os
 import subprocess
 
+from concurrent.futures import ThreadPoolExecutor
+
 class CircuitMatch():
 	'''
 		Represents a circuit match and includes relevant details of the match for future analysis
@@ -551,7 +554,7 @@ class CircuitMatching():
 		self.net_arr = net_arr
 		self.cm_data = {}
 
-	def fill_cm_data(self, temp_dir, kicad_cli, footprints_dir):
+	def fill_cm_data(self, temp_dir, kicad_cli, footprints_dir, workers=1):
 		'''
 		fill out cm_data dict by performing component matching across every component in net
 		
@@ -560,38 +563,114 @@ class CircuitMatching():
 		kicad_cli (str) - path to access kicad command line interface tool
 		footprints_dir (str) - path to the directory of kicad footprints
 		
+		Optional:
+		workers (int) - number of footprints matched at the same time (threads sharing the board, which is only read while matching). None for one per cpu.
+			opt-in, the GUI matches serially
 		
 		Effects:
 		CircuitMatching object property cm_data (dict) component matching information
 		'''
+		if workers is None:
+			workers = os.cpu_count()
+
+		# the shared board indices are built before any thread reads them
+		self.pcb_board.create_pad_indices()
+		self.pcb_board.get_pad_trace_index()
+
+		# footprints with the same name are rendered to the same temp image, so they are matched one after the other
+		fp_groups = {}
+		for fp in self.footprints_dict.keys():
+			fp_name = fp.split(":")[1]
+			if fp_name in fp_groups:
+				fp_groups[fp_name].append(fp)
+			else:
+				fp_groups[fp_name] = [fp]
+
+		def match_group(fps):
+			return [(fp, self.match_footprint(fp, temp_dir, kicad_cli, footprints_dir)) for fp in fps]
+
+		if workers > 1 and len(fp_groups) > 1:
+			# footprints are rendered and their template banks built serially, only the matching runs in the threads
+			cms = {}
+			for fps in fp_groups.values():
+				for fp in fps:
+					cms[fp] = self.prepare_footprint(fp, temp_dir, kicad_cli, footprints_dir)
 
+			def match_prepared_group(fps):
+				return [(fp, self.match_prepared_footprint(cms[fp])) for fp in fps]
+
+			with ThreadPoolExecutor(max_workers=workers) as executor:
+				group_results = list(executor.map(match_prepared_group, fp_groups.values()))
+		else:
+			group_results = [match_group(fps) for fps in fp_groups.values()]
+
+		fp_matches = {}
+		for results in group_results:
+			for fp, matches in results:
+				fp_matches[fp] = matches
+
+		# same order as matching the footprints serially
 		for fp, refs in self.footprints_dict.items():
-			footprint_arr = fp.split(":")
-			fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
+			for ref in refs:
+				self.cm_data[ref] = {'matches': fp_matches[fp]}
 
-			if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-				complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-			
-				
+	def prepare_footprint(self, fp, temp_dir, kicad_cli, footprints_dir):
+		'''
+		renders a footprint and loads it for matching on the board (helper function of fill_cm_data)
 
-				if complete.returncode != 0:
-					print('did not return')
-					fp_parent_file = temp_dir + "/Footprint Libraries/KiCad.pretty"
-					complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
+		Parameters:
+		fp (str) - footprint as library:name
+		temp_dir (str) - directory where to output temp image files 
+		kicad_cli (str) - path to access kicad command line interface tool
+		footprints_dir (str) - path to the directory of kicad footprints
 
-				gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
-			
+		Returns:
+		cm (ComponentMatching) - component matching of the footprint, with its template bank built
+		'''
+		footprint_arr = fp.split(":")
+		fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-			cm = ComponentMatching()
-			cm.pcb_board = self.pcb_board
-			cm.initialize_fp_from_file(temp_dir + "/" + footprint_arr[1] + ".png", fp_parent_file + "/" + footprint_arr[1] + ".kicad_mod")
-			matches = cm.get_matches()
+		fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
+		
 
-			sorted_matches = cm.sort_matches(matches)
-			matches = cm.add_traces_data_to_matches(sorted_matches)
+		cm = ComponentMatching()
+		cm.pcb_board = self.pcb_board
+		cm.initialize_fp_from_file(temp_dir + "/" + footprint_arr[1] + ".png", fp_parent_file + "/" + footprint_arr[1] + ".kicad_mod")
+		cm.get_template_bank()
 
-			for ref in refs:
-				self.cm_data[ref] = {'matches': matches}
+		return cm
+
+	def match_prepared_footprint(self, cm):
+		'''
+		component matching of a loaded footprint on the board (helper function of fill_cm_data)
+
+		Parameters:
+		cm (ComponentMatching) - component matching returned by prepare_footprint
+
+		Returns:
+		matches (array) - sorted component matches with their trace data
+		'''
+		matches = cm.get_matches()
+
+		sorted_matches = cm.sort_matches(matches)
+		matches = cm.add_traces_data_to_matches(sorted_matches)
+
+		return matches
+
+	def match_footprint(self, fp, temp_dir, kicad_cli, footprints_dir):
+		'''
+		component matching of one footprint on the board (helper function of fill_cm_data)
+
+		Parameters:
+		fp (str) - footprint as library:name
+		temp_dir (str) - directory where to output temp image files 
+		kicad_cli (str) - path to access kicad command line interface tool
+		footprints_dir (str) - path to the directory of kicad footprints
+
+		Returns:
+		matches (array) - sorted component matches with their trace data
+		'''
+		return self.match_prepared_footprint(self.prepare_footprint(fp, temp_dir, kicad_cli, footprints_dir))
 
 	def generate_components_file(self, file):
 
@@ -819,10 +898,7 @@ class CircuitMatching():
 		footprint_arr = footprint.split(":")
 		fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-		if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-			complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-		
-			gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+		fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 		
 		cm = ComponentMatching()
 		cm.pcb_board = self.pcb_board
@@ -1027,10 +1103,7 @@ class CircuitMatching():
 												footprint_arr = footprint.split(":")
 												fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-												if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-													complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-												
-													gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+												fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 												
 												cm = ComponentMatching()
 
@@ -1099,10 +1172,7 @@ class CircuitMatching():
 		footprint_arr = footprint.split(":")
 		fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-		if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-			complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-			queue.put_nowait('circuit matching - gen first fp ')
-			gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+		fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 		
 		cm = ComponentMatching()
 		
@@ -1319,10 +1389,7 @@ class CircuitMatching():
 												footprint_arr = footprint.split(":")
 												fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-												if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-													complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-												
-													gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+												fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 												print(f'searching for {starting_node["ref"]}')
 												cm = ComponentMatching()
 												
@@ -1397,15 +1464,7 @@ class CircuitMatching():
 			footprint_arr = footprint.split(":")
 			fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-			if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-				complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-				print(complete)
-				if complete.returncode != 0:
-					print('did not return')
-					fp_parent_file = temp_dir + "/Footprint Libraries/KiCad.pretty"
-					complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-				
-				gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+			fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 			
 			cm = ComponentMatching()
 			cm.pcb_board = self.pcb_board
@@ -2250,10 +2309,7 @@ class CircuitMatching():
 		footprint_arr = footprint.split(":")
 		fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-		if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-			complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-		
-			gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+		fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 		
 		cm = ComponentMatching()
 		cm.pcb_board = self.pcb_board
@@ -2717,10 +2773,7 @@ class CircuitMatching():
 													footprint_arr = footprint.split(":")
 													fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-													if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-														complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-													
-														gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+													fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 													
 													cm = ComponentMatching()
 													cm.pcb_board = self.pcb_board
@@ -2781,10 +2834,7 @@ class CircuitMatching():
 		footprint_arr = footprint.split(":")
 		fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-		if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-			complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-		
-			gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+		fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 		
 		cm = ComponentMatching()
 		cm.pcb_board = self.pcb_board
@@ -3166,10 +3216,7 @@ class CircuitMatching():
 			footprint_arr = footprint.split(":")
 			fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-			if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-				complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-			
-				gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+			fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 			
 			cm = ComponentMatching()
 			cm.pcb_board = self.pcb_board
@@ -3577,15 +3624,7 @@ class CircuitMatching():
 			footprint_arr = footprint.split(":")
 			fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-			if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-				complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-				
-				if complete.returncode != 0:
-					print('did not return')
-					fp_parent_file = temp_dir + "/Footprint Libraries/KiCad.pretty"
-					complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-			
-				gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+			fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 			
 			cm = ComponentMatching()
 			cm.pcb_board = self.pcb_board
@@ -3966,7 +4005,7 @@ class CircuitMatching():
 							starting_net_search_index = 1
 							while 1:
 
-								if hasattr(self.pcb_board, 'pcb_rgb_original'):
+								if hasattr(self.pcb_board, 'original_snapshot'):
 									self.pcb_board.revert_original()
 									nm.pcb_board = self.pcb_board
 									incomplete_net_match = nm.update_traces(incomplete_net_match)
@@ -4725,10 +4764,7 @@ class CircuitMatching():
 			footprint_arr = footprint.split(":")
 			fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-			if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-				complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-
-				gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+			fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 			cm.initialize_fp_from_file(temp_dir + "/" + footprint_arr[1] + ".png", fp_parent_file + "/" + footprint_arr[1] + ".kicad_mod")
 
@@ -5033,10 +5069,7 @@ class CircuitMatching():
 					footprint_arr = footprint.split(":")
 					fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-					if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-						complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-
-						gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+					fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 					cm.initialize_fp_from_file(temp_dir + "/" + footprint_arr[1] + ".png", fp_parent_file + "/" + footprint_arr[1] + ".kicad_mod")
 
@@ -6154,7 +6187,7 @@ class CircuitMatching():
 									incomplete_net_match = last_step['match']
 
 									while 1:
-										if hasattr(self.pcb_board, 'pcb_rgb_original'):
+										if hasattr(self.pcb_board, 'original_snapshot'):
 											self.pcb_board.revert_original()
 											nm.pcb_board = self.pcb_board
 											incomplete_net_match = nm.update_traces(incomplete_net_match)
@@ -6507,7 +6540,7 @@ class CircuitMatching():
 										starting_net_search_index = 1
 										while 1:
 
-											if hasattr(self.pcb_board, 'pcb_rgb_original'):
+											if hasattr(self.pcb_board, 'original_snapshot'):
 												self.pcb_board.revert_original()
 												nm.pcb_board = self.pcb_board
 												incomplete_net_match = nm.update_traces(incomplete_net_match)
@@ -6666,28 +6699,25 @@ class CircuitMatching():
 
 				#(4)touched traces (multi pads for a pin connection) are all different
 				
+				pad_trace_index = self.pcb_board.get_pad_trace_index()
+
 				for pad in node['pads']:
 
-					for trace_ID in self.pcb_board.board_connections_dict.keys():
+					for trace_ID in pad_trace_index.traces_of_pad(pad, 'front' if node['match'].fb == 'front' else 'back'):
 						if node['match'].fb == 'front':
-							if pad in self.pcb_board.board_connections_dict[trace_ID]['front pads']:
-								if trace_ID not in net['traces']:
-									if trace_ID in touched_traces:
-
-
-										for f_trace in self.pcb_board.board_connections_dict[trace_ID]['front traces']:
-											cv2.drawContours(temp, self.pcb_board.trace_contours, f_trace, (255, 255, 0), 3)
-
-										return False
-									else:
-										touched_traces.append(trace_ID)
+							if trace_ID not in net['traces']:
+								if trace_ID in touched_traces:
+									for f_trace in self.pcb_board.board_connections_dict[trace_ID]['front traces']:
+										cv2.drawContours(temp, self.pcb_board.trace_contours, f_trace, (255, 255, 0), 3)
+									return False
+								else:
+									touched_traces.append(trace_ID)
 						else:
-							if pad in self.pcb_board.board_connections_dict[trace_ID]['back pads']:
-								if trace_ID not in net['traces']:
-									if trace_ID in touched_traces:
-										return False
-									else:
-										touched_traces.append(trace_ID)
+							if trace_ID not in net['traces']:
+								if trace_ID in touched_traces:
+									return False
+								else:
+									touched_traces.append(trace_ID)
 
 		return True
 
@@ -7,25 +7,28 @@ import cv2
 import numpy as np
 import re
 import json
+import hashlib
+import threading
 
 import math
 
 from kicad_mod import *
 from PCB_utils import *
+from geometric_match import load_footprint_geometry, find_placements, placement_orientation, placement_contours
 
 import os.path
 
-def rotation(image, angleInDegrees):
+def rotation_matrix(h, w, angleInDegrees):
     """
-        Helper function for 'get_match_images_info', 'map_pads', 'get_images_of_match'. Used to rotate images for specific orientations.
+        Helper function for 'rotation' and 'get_match_warp'.
         Parameters:
-        image (2D array): image to rotate
+        h, w (int): size of the image to rotate
         angleInDegrees (int): degrees to rotate image by
 
         Returns:
-        (img array) rotated image array
+        rot (2D array): affine transform rotating the image about its center into the bounds of the rotated image
+        (tuple): b_w, b_h size of the rotated image
     """
-    h, w = image.shape[:2]
     img_c = (w / 2, h / 2)
 
     rot = cv2.getRotationMatrix2D(img_c, angleInDegrees, 1)
@@ -39,9 +42,494 @@ def rotation(image, angleInDegrees):
     rot[0, 2] += ((b_w / 2) - img_c[0])
     rot[1, 2] += ((b_h / 2) - img_c[1])
 
+    return rot, (b_w, b_h)
+
+def rotation(image, angleInDegrees):
+    """
+        Helper function for 'get_match_images_info', 'map_pads'. Used to rotate images for specific orientations.
+        Parameters:
+        image (2D array): image to rotate
+        angleInDegrees (int): degrees to rotate image by
+
+        Returns:
+        (img array) rotated image array
+    """
+    h, w = image.shape[:2]
+    rot, (b_w, b_h) = rotation_matrix(h, w, angleInDegrees)
+
     outImg = cv2.warpAffine(image, rot, (b_w, b_h), flags=cv2.INTER_LINEAR)
     return outImg
 
+SCORING_ENGINES = ['loop', 'ccorr', 'fft']
+
+def coverage_map(img, template, rad, engine='ccorr'):
+    """
+        Helper function for 'find_matches' and 'find_matches_incomplete'. Scores every offset (on a grid with step rad) by the fraction of the
+        footprint pad pixels that land on solderable pad pixels of the mask image.
+
+        Parameters:
+        img (2D array): solder mask image (pads are black)
+        template (2D array): footprint image (pads are black)
+        rad (int): step between scored offsets
+
+        Optional:
+        engine (str): 'loop' slides the template in python, 'ccorr' uses cv2.matchTemplate and 'fft' uses a float64 numpy FFT.
+                      all engines return the same map
+
+        Returns:
+        res (2D array): coverage score at each scored top left offset (0 elsewhere)
+    """
+    if engine not in SCORING_ENGINES:
+        raise ValueError(f"unknown scoring engine '{engine}', expected one of {SCORING_ENGINES}")
+
+    h,w = img.shape[:2]
+    th,tw = template.shape[:2]
+
+    img = cv2.bitwise_not(img)
+    template = cv2.bitwise_not(template)
+
+    fp_white_pix = np.sum(template == 255)
+
+    res = np.zeros(img.shape[:2])
+
+    if engine == 'loop':
+        for i in range(0, h, rad):
+            for j in range(0, w, rad):
+
+                if i + th < h and j + tw < w:
+                    img_crop = img[i:(i+th), j:(j+tw)]
+                    intersection = cv2.bitwise_and(template, img_crop)
+
+                    number_of_white_pix = np.sum(intersection == 255)
+
+                    if number_of_white_pix == 0:
+                        res[i,j] = 0
+                    else:
+                        res[i,j] = number_of_white_pix/(fp_white_pix * 1.00)
+
+        return res
+
+    # offsets where the template fits strictly inside the image (same bounds as the loop)
+    if th >= h or tw >= w or fp_white_pix == 0:
+        return res
+
+    # a pixel only survives bitwise_and as 255 if it is 255 in both images, so the
+    # intersection count is the correlation of the two binary masks (summed over channels)
+    img_bin = (img == 255).astype(np.float32)
+    template_bin = (template == 255).astype(np.float32)
+
+    if engine == 'ccorr':
+        counts = cv2.matchTemplate(img_bin, template_bin, cv2.TM_CCORR)
+    else:
+        if img_bin.ndim == 2:
+            img_bin = img_bin[:, :, np.newaxis]
+            template_bin = template_bin[:, :, np.newaxis]
+
+        fft_h = cv2.getOptimalDFTSize(h + th - 1)
+        fft_w = cv2.getOptimalDFTSize(w + tw - 1)
+
+        spectrum = 0
+        for c in range(img_bin.shape[2]):
+            img_f = np.fft.rfft2(img_bin[:, :, c].astype(np.float64), s=(fft_h, fft_w))
+            template_f = np.fft.rfft2(template_bin[::-1, ::-1, c].astype(np.float64), s=(fft_h, fft_w))
+            spectrum = spectrum + img_f * template_f
+
+        counts = np.fft.irfft2(spectrum, s=(fft_h, fft_w))[th-1:h, tw-1:w]
+
+    # counts are whole pixels, rounding removes the floating point noise of the correlation
+    counts = np.rint(counts[0:h-th:rad, 0:w-tw:rad].astype(np.float64))
+
+    res[0:h-th:rad, 0:w-tw:rad] = counts / (fp_white_pix * 1.00)
+
+    return res
+
+SEARCH_MODES = ['full', 'pyramid']
+
+MATCH_ENGINES = ['raster', 'geometric']
+
+PAD_INFO_BACKENDS = ['labels', 'contours']
+
+def coverage_bound_map(img, template, factor):
+    """
+        Helper function for 'coverage_map_pyramid'. Bounds the coverage score of blocks of offsets on factor times smaller images:
+        the pad pixels of the mask are max pooled (over 2x2 blocks, the template can straddle block borders) and the template pad pixels are sum pooled,
+        so no offset inside a block scores above the bound of the block.
+
+        Parameters:
+        img (2D array): solder mask image (pads are black)
+        template (2D array): footprint image (pads are black)
+        factor (int): downsampling factor
+
+        Returns:
+        bound (2D array): upper bound of the coverage score of the offsets [bi*factor, (bi+1)*factor) x [bj*factor, (bj+1)*factor) at [bi, bj]
+    """
+    h,w = img.shape[:2]
+    th,tw = template.shape[:2]
+
+    img_bin = (cv2.bitwise_not(img) == 255)
+    template_bin = (cv2.bitwise_not(template) == 255)
+
+    fp_white_pix = np.sum(template_bin)
+
+    # channels are bounded together: a pixel counts once per template channel if any of its mask channels is a pad
+    if img_bin.ndim == 3:
+        img_bin = np.logical_or.reduce([img_bin[:, :, c] for c in range(img_bin.shape[2])])
+        template_bin = template_bin.sum(axis=2)
+
+    bh, bw = -(-h // factor), -(-w // factor)
+    tbh, tbw = -(-th // factor), -(-tw // factor)
+
+    if fp_white_pix == 0:
+        return np.zeros((bh, bw))
+
+    # max over the 2x2 blocks starting at each block
+    pooled = cv2.dilate(img_bin.astype(np.uint8), np.ones((2*factor, 2*factor), np.uint8), anchor=(0, 0))[::factor, ::factor]
+
+    template_pooled = np.zeros((tbh * factor, tbw * factor), np.float32)
+    template_pooled[:th, :tw] = template_bin
+    template_pooled = template_pooled.reshape(tbh, factor, tbw, factor).sum(axis=(1, 3))
+
+    padded = np.zeros((bh + tbh, bw + tbw), np.float32)
+    padded[:bh, :bw] = pooled
+
+    counts = np.rint(cv2.matchTemplate(padded, template_pooled, cv2.TM_CCORR)[:bh, :bw].astype(np.float64))
+
+    return counts / (fp_white_pix * 1.00)
+
+def template_rectangles(template_bin):
+    """
+        Helper function for 'coverage_map_pyramid'. Splits the pad pixels of a binary footprint image into rectangles
+        (runs of each row, joined with the same runs of the following rows)
+
+        Parameters:
+        template_bin (2D array): binary footprint image (pads are nonzero)
+
+        Returns:
+        rects (2D array): (y0, x0, y1, x1) of each rectangle, end exclusive
+    """
+    th,tw = template_bin.shape[:2]
+
+    padded = np.zeros((th, tw + 2), np.int8)
+    padded[:, 1:-1] = template_bin != 0
+    edges = np.diff(padded, axis=1)
+
+    open_rects = {}
+    rects = []
+    for y in range(th):
+        runs = set(zip(np.flatnonzero(edges[y] == 1), np.flatnonzero(edges[y] == -1)))
+
+        for run in list(open_rects.keys()):
+            if run not in runs:
+                rects.append((open_rects.pop(run), run[0], y, run[1]))
+        for run in runs:
+            if run not in open_rects:
+                open_rects[run] = y
+
+    for run, y0 in open_rects.items():
+        rects.append((y0, run[0], th, run[1]))
+
+    return np.array(rects, dtype=np.int64).reshape(-1, 4)
+
+def coverage_map_pyramid(img, template, rad, threshold, factor=4, recall_guard=1.0):
+    """
+        Helper function for 'find_matches' and 'find_matches_incomplete'. Coarse to fine version of coverage_map: blocks of offsets are bounded on
+        downsampled images first (see coverage_bound_map) and only the offsets in blocks whose bound is above threshold * recall_guard are scored
+        at full resolution (from a summed area table of the mask and the pad rectangles of the template).
+
+        The bound is never below the exact score, so with recall_guard <= 1 every offset scoring above threshold keeps its coverage_map value
+        (offsets below it may be 0) and the peaks found above threshold are the same as with coverage_map.
+        recall_guard > 1 prunes more blocks (faster, but matches scoring close to threshold can be missed)
+
+        Parameters:
+        img (2D array): solder mask image (pads are black)
+        template (2D array): footprint image (pads are black)
+        rad (int): step between scored offsets
+        threshold (float): lowest score the caller looks at
+
+        Optional:
+        factor (int): downsampling factor of the coarse pass
+        recall_guard (float): multiplies threshold to select the offsets scored at full resolution
+
+        Returns:
+        res (2D array): coverage score at each scored top left offset (0 elsewhere)
+    """
+    h,w = img.shape[:2]
+    th,tw = template.shape[:2]
+
+    res = np.zeros(img.shape[:2])
+
+    if th >= h or tw >= w:
+        return res
+
+    candidates = coverage_bound_map(img, template, factor) > threshold * recall_guard
+
+    # offsets of the coverage_map grid inside candidate blocks
+    grid_y, grid_x = np.meshgrid(np.arange(0, h - th, rad), np.arange(0, w - tw, rad), indexing='ij')
+    keep = candidates[grid_y // factor, grid_x // factor]
+    ys, xs = grid_y[keep], grid_x[keep]
+
+    img_bin = (cv2.bitwise_not(img) == 255)
+    template_bin = (cv2.bitwise_not(template) == 255)
+
+    fp_white_pix = np.sum(template_bin)
+
+    if len(ys) == 0 or fp_white_pix == 0:
+        return res
+
+    if img_bin.ndim == 2:
+        img_bin = img_bin[:, :, np.newaxis]
+        template_bin = template_bin[:, :, np.newaxis]
+
+    # footprint images are grey, one template channel against the pad pixels summed over the mask channels gives the same count
+    if all(np.array_equal(template_bin[:, :, 0], template_bin[:, :, c]) for c in range(1, template_bin.shape[2])):
+        img_bin = sum(img_bin[:, :, c].view(np.uint8) for c in range(img_bin.shape[2]))[:, :, np.newaxis]
+        template_bin = template_bin[:, :, :1]
+
+    counts = np.zeros(len(ys), np.int64)
+    for c in range(img_bin.shape[2]):
+        table = cv2.integral(img_bin[:, :, c].astype(np.uint8)).ravel()
+        base = ys * (w + 1) + xs
+
+        for y0, x0, y1, x1 in template_rectangles(template_bin[:, :, c]):
+            counts += table[base + (y1 * (w + 1) + x1)] - table[base + (y0 * (w + 1) + x1)] - table[base + (y1 * (w + 1) + x0)] + table[base + (y0 * (w + 1) + x0)]
+
+    res[ys, xs] = counts / (fp_white_pix * 1.00)
+
+    return res
+
+def find_peaks(res, threshold, rad):
+    """
+        Helper function for 'find_matches' and 'find_matches_incomplete'. Non-maximum suppression of a score map in one pass over the
+        offsets above threshold, sorted by score: gives the same peaks in the same order as taking cv2.minMaxLoc of res and blacking out
+        a filled circle of radius rad around it for as long as the max is above threshold (ties go to the first offset in row order)
+
+        Parameters:
+        res (2D array): score map (i.e. from coverage_map)
+        threshold (float): lowest score of a peak (exclusive)
+        rad (int): radius of the neighbourhood each peak suppresses
+
+        Returns:
+        peaks (array): (score, (x, y)) of each peak, highest score first
+    """
+    scores = res.ravel()
+    # compared in double precision, like the max_val of cv2.minMaxLoc
+    candidates = np.flatnonzero(scores > np.float64(threshold))
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+    # circles drawn like the blackout of the score map, so the suppressed neighbourhoods are the same pixels
+    suppressed = np.zeros(res.shape[:2], np.uint8)
+    suppressed_flat = suppressed.ravel()
+    w = res.shape[1]
+
+    peaks = []
+    for idx in candidates.tolist():
+        if suppressed_flat[idx]:
+            continue
+
+        y, x = divmod(idx, w)
+        peaks.append((float(scores[idx]), (x, y)))
+        cv2.circle(suppressed, (x, y), radius=rad, color=1, thickness=cv2.FILLED)
+
+    return peaks
+
+def footprint_signature(fp_contours, fp_areas):
+    """
+        Helper function for 'find_matches' and 'find_matches_incomplete'. Summarizes the pads of a footprint orientation for window_can_match
+
+        Parameters:
+        fp_contours (array): contours of the footprint pads (from the alpha image)
+        fp_areas (array): area of each of fp_contours
+
+        Returns:
+        signature (dict): 'num_pads', 'areas' (area of each pad), 'boxes' (x, y, w, h bounding box of each pad on the template),
+                          'min_area' and 'max_area' (pad size range) and 'pitch' (smallest distance between pad centers, 0 for one pad)
+    """
+    boxes = np.array([cv2.boundingRect(cnt) for cnt in fp_contours], dtype=np.int64).reshape(-1, 4)
+    centers = boxes[:, :2] + boxes[:, 2:] / 2
+
+    pitch = 0
+    if len(centers) > 1:
+        distances = np.linalg.norm(centers[:, np.newaxis] - centers[np.newaxis], axis=2)
+        pitch = np.min(distances[~np.eye(len(centers), dtype=bool)])
+
+    areas = np.array(fp_areas, dtype=np.float64)
+
+    return {'num_pads': len(fp_contours), 'areas': areas, 'boxes': boxes, 'min_area': areas.min(initial=0), 'max_area': areas.max(initial=0), 'pitch': pitch}
+
+def window_can_match(match_loc, size, signature, pad_features, pad_weights, num_fp_pads):
+    """
+        Helper function for 'find_matches' and 'find_matches_incomplete'. Checks the pads around a window against the footprint signature
+        with the rules of get_pad_info, bounding each board pad by its bounding box:
+        the pads touching the window must give at least num_fp_pads pad IDs, the pads over each footprint pad must be able to cover half of it
+        and every footprint pad needs its own board pad (pads closer than their pitch can't share one).
+        A window failing the check can't give a match, so get_pad_info can be skipped
+
+        Parameters:
+        match_loc (tuple): top left coordinates of the window on the board image
+        size (tuple): width and height of the window
+        signature (dict): footprint_signature of the template
+        pad_features (array): pad-feature table of the board side (see gen_pad_features)
+        pad_weights (array): number of pad IDs that hitting each pad adds to the match pad_list
+        num_fp_pads (int): number of pads the match needs
+
+        Returns:
+        (bool) False if the window can't host the footprint
+    """
+    x, y = match_loc
+    w, h = size
+
+    near = np.flatnonzero((pad_features['x'] < x + w) & (pad_features['x'] + pad_features['w'] > x) & (pad_features['y'] < y + h) & (pad_features['y'] + pad_features['h'] > y))
+
+    if np.sum(pad_weights[near]) < num_fp_pads:
+        return False
+
+    if signature['num_pads'] == 0:
+        return True
+
+    pads = pad_features[near]
+    boxes = signature['boxes']
+
+    # bounding box overlap of every footprint pad (rows) with every nearby board pad (columns)
+    overlap_w = np.minimum(x + boxes[:, 0:1] + boxes[:, 2:3], pads['x'] + pads['w']) - np.maximum(x + boxes[:, 0:1], pads['x'])
+    overlap_h = np.minimum(y + boxes[:, 1:2] + boxes[:, 3:4], pads['y'] + pads['h']) - np.maximum(y + boxes[:, 1:2], pads['y'])
+    overlap = np.clip(overlap_w, 0, None) * np.clip(overlap_h, 0, None)
+
+    if np.any(overlap.sum(axis=1) < signature['areas'] * 5 / 10):
+        return False
+
+    # assign a different board pad to each footprint pad (augmenting paths)
+    candidates = [np.flatnonzero(row) for row in overlap]
+    pad_owner = {}
+
+    def assign(i, seen):
+        for j in candidates[i]:
+            if j not in seen:
+                seen.add(j)
+                if j not in pad_owner or assign(pad_owner[j], seen):
+                    pad_owner[j] = i
+                    return True
+        return False
+
+    return all(assign(i, set()) for i in range(len(candidates)))
+
+def footprint_pad_pixels(fp_alpha, fp_contours=None):
+    """
+        Helper function for 'get_pad_info'. Labels the pixels of each footprint pad once per template
+
+        Parameters:
+        fp_alpha (2D array): img of the footprint of component (inverted)
+
+        Optional:
+        fp_contours (array): precomputed contours of fp_alpha
+
+        Returns:
+        fp_pixels (dict): 'pixels' (flat index of every footprint pad pixel),
+                          'codes' (pad * 3 + 1 for pixels on the pad contour, see outline_areas), 'areas' (contour area of each pad) and 'shape' of the template
+    """
+    fp_alpha_img = cv2.cvtColor(fp_alpha, cv2.COLOR_BGR2GRAY)
+    if fp_contours is None:
+        fp_contours, fp_hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+
+    labels = np.zeros(fp_alpha_img.shape[:2], np.int32)
+    for i in range(len(fp_contours)):
+        cv2.drawContours(labels, fp_contours, i, i + 1, -1)
+    labels[fp_alpha_img == 0] = 0
+
+    outline = np.zeros(fp_alpha_img.shape[:2], np.uint8)
+    cv2.drawContours(outline, fp_contours, -1, 1, 1)
+
+    pixels = np.flatnonzero(labels)
+    codes = (labels.ravel()[pixels] - 1) * 3 + outline.ravel()[pixels]
+
+    return {'pixels': pixels, 'codes': codes, 'areas': outline_areas(codes, len(fp_contours)), 'shape': labels.shape}
+
+def outline_areas(codes, size):
+    """
+        Helper function for 'get_pad_info'. Areas of pixel regions like cv2.moments gives for their contours:
+        the contour polygon runs through the centers of the outline pixels, so by Pick's theorem outline pixels count half.
+        Pixels on two outlines at once are one pixel wide slivers of an intersection, which have no area
+
+        Parameters:
+        codes (array): region * 3 + number of outlines (0 to 2) each pixel is on
+        size (int): number of regions
+
+        Returns:
+        (array) area of each region (-1 for empty regions)
+    """
+    counts = np.bincount(codes, minlength=size * 3).reshape(size, 3)
+
+    return counts[:, 0] + counts[:, 1] / 2 - 1
+
+def footprint_image_key(footprint_rgb):
+    '''
+        Parameters:
+        footprint_rgb (2D array) - image of a component footprint
+
+        Returns:
+        (tuple) shape and sha1 of the image, the same for every copy of the same footprint image
+    '''
+    return (footprint_rgb.shape, hashlib.sha1(np.ascontiguousarray(footprint_rgb).tobytes()).hexdigest())
+
+# template banks shared between ComponentMatching objects, keyed by footprint image (see ComponentMatching.get_template_bank),
+# only the newest version of each image is kept
+_template_banks = {}
+
+def clear_template_banks():
+    '''
+        Drops all cached footprint template banks and pin mappings (e.g. after footprint images were regenerated)
+    '''
+    with _cache_lock:
+        _template_banks.clear()
+        _pin_mappings.clear()
+
+# pin mappings shared between ComponentMatching objects, keyed by footprint file, image size and contours (see ComponentMatching.get_pin_mapping),
+# only the newest version of each footprint file is kept
+_pin_mappings = {}
+
+# guards _template_banks and _pin_mappings, which are shared by the threads of CircuitMatching.fill_cm_data
+_cache_lock = threading.Lock()
+
+class FootprintTemplateBank():
+    """
+        Every rotation of a footprint computed once so that all matching calls can reuse it.
+        Properties include
+        orientations (array) - orientations held by the bank (0, 45, 90,...315)
+        templates (dict) - per orientation dict with
+            'template' (2D array) - rotated footprint image
+            'alpha' (2D array) - rotated footprint alpha
+            'contours' (array) - contours of the rotated footprint pads
+            'cnt_map' (array) - mapping between original footprint contours and rotated contours
+            'pad_areas' (array) - area of each rotated contour
+        pin_cnt_maps (dict) - pin to rotated contour mappings already computed, keyed by pin map and orientation
+    """
+    orientations = [0, 45, 90, 135, 180, 225, 270, 315]
+
+    def __init__(self):
+        self.templates = {}
+        self.pin_cnt_maps = {}
+
+    def add_orientation(self, orientation, template, alpha, contours, cnt_map):
+        '''
+        stores the precomputed data for one orientation
+
+        Parameters:
+        orientation (int) - rotation of the footprint
+        template (2D array) - rotated footprint image
+        alpha (2D array) - rotated footprint alpha
+        contours (array) - contours of the rotated footprint pads
+        cnt_map (array) - mapping between original footprint contours and rotated contours
+        '''
+        pad_areas = [cv2.moments(cnt)['m00'] for cnt in contours]
+        self.templates[orientation] = {'template': template, 'alpha': alpha, 'contours': contours, 'cnt_map': cnt_map, 'pad_areas': pad_areas}
+
+    def get(self, orientation):
+        '''
+        Returns:
+        (dict) precomputed template, alpha, contours, cnt_map and pad_areas for the orientation
+        '''
+        return self.templates[orientation]
+
+
 class ComponentMatch():
     """
         Represents a component match and includes relevant details of the match for future analysis.
@@ -50,12 +538,13 @@ class ComponentMatch():
         pad_centers (array) - coordinates of the center of each pad hit in the match
         pad_list (array) - an array of all pads hit (identified by contour ID)
         coordinates (tuple) - the x,y coordinates of the match on the mask image
-        orientation (int) - the rotation of the component. will be 0, 45, 90,...315
+        orientation (int) - the rotation of the component. will be 0, 45, 90,...315 (any angle in degrees for geometric matches)
         pad_IDs (dict) - list of pads hit split up by the pin 
 
         set through component matching process:
         fp_contours (array) - the contours of the match footprint
         pad_coverage (dict) - total area of the coverage of each pad 
+        fp_transform (array) - 2x3 affine transform from the footprint image to the mask image (geometric matches only, see get_match_warp)
 
     """
     def __init__(self, score, pad_centers, pad_list, coordinates, orientation):
@@ -109,25 +598,19 @@ class ComponentMatch():
         self.touched_traces_dict = {}
         self.touched_traces_list = []
 
+        pad_trace_index = pcb_board.get_pad_trace_index()
+        fb = 'front' if self.fb == 'front' else 'back'
+
         for pin, pads in self.pad_IDs.items():
             for pad in pads:
-                for trace_ID, trace_info in pcb_board.board_connections_dict.items():
-                    if self.fb == 'front':
-                        if pad in trace_info['front pads']:
-                            if pin in self.touched_traces_dict.keys():
-                                self.touched_traces_dict[pin].append(trace_ID)
-                            else:
-                                self.touched_traces_dict[pin] = [trace_ID]
-                            self.touched_traces_list.append(trace_ID)
-                            break
+                traces = pad_trace_index.traces_of_pad(pad, fb)
+                if len(traces) > 0:
+                    trace_ID = traces[0]
+                    if pin in self.touched_traces_dict.keys():
+                        self.touched_traces_dict[pin].append(trace_ID)
                     else:
-                        if pad in trace_info['back pads']:
-                            if pin in self.touched_traces_dict.keys():
-                                self.touched_traces_dict[pin].append(trace_ID)
-                            else:
-                                self.touched_traces_dict[pin] = [trace_ID]
-                            self.touched_traces_list.append(trace_ID)
-                            break
+                        self.touched_traces_dict[pin] = [trace_ID]
+                    self.touched_traces_list.append(trace_ID)
 
         return self
 
@@ -169,16 +652,49 @@ class ComponentMatching():
         trace_contours (array) - array of all contours in the PCB image (connected parts)
         pad_map (dict) - each pad with corresponding pad center
         trace_map (dict) - each trace with corresponding pads within trace
+        scoring_engine (str) - how template coverage is scored ('loop', 'ccorr' or 'fft', see coverage_map)
+        search_mode (str) - 'full' scores every offset, 'pyramid' bounds offsets on downsampled images first (see coverage_map_pyramid)
+        pyramid_factor (int) - downsampling factor of the pyramid search
+        recall_guard (float) - multiplies the match threshold to select the offsets the pyramid search scores at full resolution
+        pad_prefilter (bool) - skip get_pad_info at windows whose pads can't host the footprint (see window_can_match)
+        window_stats (dict) - 'windows' checked and 'pruned' by the pad prefilter, over all searches of this object
+        match_engine (str) - 'raster' slides the rotated footprint images over the mask, 'geometric' matches pad point sets (see get_geometric_matches).
+            only get_matches uses the engine, get_incomplete_matches, get_matches_with_interventions and get_matches_around_pad always search the raster way
+        pad_info_backend (str) - 'labels' measures pad coverage from one joint label histogram per window, 'contours' intersects each window pad contour on its own
     """
-    def __init__(self):
+    def __init__(self, scoring_engine='ccorr', search_mode='full', pyramid_factor=4, recall_guard=1.0, pad_prefilter=True, match_engine='raster', pad_info_backend='labels'):
         """
         init for component matching
 
         use different pathways to initialize values
 
+        Optional:
+        scoring_engine (str) - how template coverage is scored ('loop', 'ccorr' or 'fft', see coverage_map)
+        search_mode (str) - 'full' or 'pyramid' (see coverage_map_pyramid)
+        pyramid_factor (int) - downsampling factor of the pyramid search
+        recall_guard (float) - the pyramid search gives the same matches as the full search for values <= 1
+        pad_prefilter (bool) - reject windows from the pad-feature table before get_pad_info
+        match_engine (str) - 'raster' or 'geometric' pathway of get_matches (the other searches are raster only)
+        pad_info_backend (str) - 'labels' or 'contours' implementation of get_pad_info
+
         """
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"unknown search mode '{search_mode}', expected one of {SEARCH_MODES}")
+        if match_engine not in MATCH_ENGINES:
+            raise ValueError(f"unknown match engine '{match_engine}', expected one of {MATCH_ENGINES}")
+        if pad_info_backend not in PAD_INFO_BACKENDS:
+            raise ValueError(f"unknown pad info backend '{pad_info_backend}', expected one of {PAD_INFO_BACKENDS}")
+
         self.pad_map = {}
         self.trace_map = {}
+        self.scoring_engine = scoring_engine
+        self.search_mode = search_mode
+        self.pyramid_factor = pyramid_factor
+        self.recall_guard = recall_guard
+        self.pad_prefilter = pad_prefilter
+        self.window_stats = {'windows': 0, 'pruned': 0}
+        self.match_engine = match_engine
+        self.pad_info_backend = pad_info_backend
 
 
     def initialize_pcb_vars(self, mask_rgb, mask_contours, pcb_rgb, trace_contours, pad_map, trace_map):
@@ -215,6 +731,7 @@ class ComponentMatching():
         self.fp_alpha (2D array) - image of component footprint reversed (alpha)
         self.fp_contours (array) - contours of fp
         self.num_fp_pads (int) - number of pads of component footprint
+        self.fp_bank_key (tuple) - path and contents of the footprint image, key of the shared template banks
 
         '''
 
@@ -228,6 +745,7 @@ class ComponentMatching():
         #read footprint image and create small border to improve masking
         footprint_rgb0 = cv2.imread(fp_file_png)
         self.footprint_rgb = cv2.copyMakeBorder(footprint_rgb0, 2, 2, 2, 2, cv2.BORDER_CONSTANT, value=(255,255,255))
+        self.fp_bank_key = (os.path.abspath(fp_file_png), footprint_image_key(self.footprint_rgb))
         
         ##generate mask over pads
         self.fp_alpha = cv2.bitwise_not(self.footprint_rgb)
@@ -263,6 +781,7 @@ class ComponentMatching():
         #read footprint image and create small border to improve masking
         footprint_rgb0 = cv2.imread(fp_file_png)
         self.footprint_rgb = cv2.copyMakeBorder(footprint_rgb0, 2, 2, 2, 2, cv2.BORDER_CONSTANT, value=(255,255,255))
+        self.fp_bank_key = (os.path.abspath(fp_file_png), footprint_image_key(self.footprint_rgb))
         
         ##generate mask over pads
         self.fp_alpha = cv2.bitwise_not(self.footprint_rgb)
@@ -287,7 +806,7 @@ class ComponentMatching():
         self.trace_map = connected_pads(self.pad_map, self.trace_contours, trace_hierarchy, t_inv_img_grey)
 
 
-    def get_pad_info(self, match_loc, w, h, match_contours, fp_alpha, fb='front'):
+    def get_pad_info(self, match_loc, w, h, match_contours, fp_alpha, fb='front', fp_contours=None, fp_areas=None, fp_pixels=None):
         """
             Helper function for 'find_matches'. Gets the pad centers for affected pads. Also does some initial processing to ensure that pad coverage area is enough.
 
@@ -300,6 +819,9 @@ class ComponentMatching():
 
             Optional:
             fb (str) - designate if you're looking on the back or front of the pcb
+            fp_contours (array) - precomputed contours of fp_alpha (from the template bank)
+            fp_areas (array) - precomputed area of each of fp_contours
+            fp_pixels (dict) - precomputed footprint_pad_pixels of fp_alpha (labels backend)
 
             Returns:
             pad_centers (array): array of the coordinates of the pad centers touched
@@ -308,6 +830,96 @@ class ComponentMatching():
             true_match (bool): whether or not this is an appropriate match (for example, the same pad is not touched by two pins)
             fp_contours (array): the footprint contours from the alpha image
         """
+        if self.pad_info_backend == 'contours':
+            return self.get_pad_info_contours(match_loc, w, h, match_contours, fp_alpha, fb, fp_contours, fp_areas)
+
+        return self.get_pad_info_labels(match_loc, w, h, match_contours, fp_alpha, fb, fp_contours, fp_pixels)
+
+    def get_pad_info_labels(self, match_loc, w, h, match_contours, fp_alpha, fb='front', fp_contours=None, fp_pixels=None):
+        """
+            get_pad_info from one label image of the window pads: the overlap of every window pad with every footprint pad is
+            a single np.bincount over the joint labels of the footprint pixels (areas in pixels), instead of a mask, intersection
+            and findContours per window pad.
+
+            Returns:
+            see get_pad_info
+        """
+        true_match = True
+        pad_centers = []
+        match_pad_map = {}
+        match_area_map = {}
+
+        if fp_contours is None:
+            fp_contours, fp_hierarchy = cv2.findContours(cv2.cvtColor(fp_alpha, cv2.COLOR_BGR2GRAY), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        if fp_pixels is None:
+            fp_pixels = footprint_pad_pixels(fp_alpha, fp_contours)
+
+        num_fp = len(fp_contours)
+        if num_fp == 0:
+            return pad_centers, match_pad_map, match_area_map, true_match, fp_contours
+
+        labels = np.zeros(fp_pixels['shape'], np.int32)
+        for k in range(len(match_contours)):
+            cv2.drawContours(labels, match_contours, k, k + 1, -1)
+        outline = np.zeros(fp_pixels['shape'], np.uint8)
+        cv2.drawContours(outline, match_contours, -1, 1, 1)
+
+        # intersection area of each window pad (rows, row 0 is the background) with each footprint pad (columns),
+        # the outlines of both bound the intersection
+        pixels = fp_pixels['pixels']
+        joint = labels.ravel()[pixels] * (num_fp * 3) + fp_pixels['codes'] + outline.ravel()[pixels]
+        overlap = outline_areas(joint, (len(match_contours) + 1) * num_fp).reshape(-1, num_fp)[1:]
+        fp_areas = fp_pixels['areas']
+
+        hit = overlap > 0
+        num_hit = np.count_nonzero(hit, axis=1).tolist()
+        first_hit = np.argmax(hit, axis=1).tolist()
+        overlap = overlap.tolist()
+
+        pad_index = self.pcb_board.get_pad_index(fb)
+        for k in range(len(match_contours)):
+            if num_hit[k] == 0:
+                continue
+
+            #the same pad under two footprint pads
+            if num_hit[k] > 1:
+                true_match = False
+                continue
+
+            i = first_hit[k]
+            M = cv2.moments(match_contours[k])
+            if M['m00'] <= 0:
+                continue
+
+            #use the pad index to identify the pad corresponding to the window pad
+            pad_ID = pad_index.pad_at((match_loc[0] + int(M['m10']/M['m00']), match_loc[1] + int(M['m01']/M['m00'])))
+            if pad_ID == -1:
+                continue
+
+            center = pad_index.pad_centers[pad_ID]
+            if center not in pad_centers:
+                pad_centers.append(center)
+                match_pad_map.setdefault(i, []).append(center)
+                match_area_map[i] = match_area_map.get(i, 0) + overlap[k][i]
+            elif any(center in centers and ID != i for ID, centers in match_pad_map.items()):
+                true_match = False #if that pad center is associated with a different pin on the template footprint, not a match
+
+        if num_fp > len(match_pad_map.keys()):
+            true_match = False
+
+        for i, area in match_area_map.items():
+            if area < fp_areas[i] * 5 / 10:
+                true_match = False
+
+        return pad_centers, match_pad_map, match_area_map, true_match, fp_contours
+
+    def get_pad_info_contours(self, match_loc, w, h, match_contours, fp_alpha, fb='front', fp_contours=None, fp_areas=None):
+        """
+            get_pad_info intersecting each window pad contour with the footprint on its own (areas from contour moments)
+
+            Returns:
+            see get_pad_info
+        """
 
         #**NOTE** fp_alpha is passed in because orientation may be different
         true_match = True
@@ -316,7 +928,10 @@ class ComponentMatching():
         match_area_map = {}
         
         fp_alpha_img = cv2.cvtColor(fp_alpha, cv2.COLOR_BGR2GRAY)
-        fp_contours, fp_hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        if fp_contours is None:
+            fp_contours, fp_hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        if fp_areas is None:
+            fp_areas = [cv2.moments(fp_cnt)['m00'] for fp_cnt in fp_contours]
         
         #going through all contours found in match area (rect of match loc)
         for m_cnt in match_contours:
@@ -352,46 +967,38 @@ class ComponentMatching():
                     m_cx = int(match_loc[0] + cx)
                     m_cy = int(match_loc[1] + cy)
 
-                    #loop through original mask image to identify the pads corresponding to intersection points
-                    if fb == 'front':
-                        mask_contours = self.pcb_board.mask_contours
-                    else:
-                        mask_contours = self.pcb_board.mask_back_contours
-
-
-                    for mask_cnt in mask_contours:
-                        result = cv2.pointPolygonTest(mask_cnt, (m_cx, m_cy), False)
+                    #use the pad index to identify the pad corresponding to intersection points
+                    pad_index = self.pcb_board.get_pad_index(fb)
+                    pad_ID = pad_index.pad_at((m_cx, m_cy))
 
-                        #this point is inside a pad in the solder mask image
-                        if result == 1:
+                    #this point is inside a pad in the solder mask image
+                    if pad_ID != -1:
 
-                            #get center for the identified pad
-                            P_M = cv2.moments(mask_cnt)
-                            P_cx = int(P_M['m10']/P_M['m00'])
-                            P_cy = int(P_M['m01']/P_M['m00'])
+                        #get center for the identified pad
+                        (P_cx, P_cy) = pad_index.pad_centers[pad_ID]
 
-                            if (P_cx, P_cy) not in pad_centers: #need to add this pad
-                                pad_centers.append((P_cx, P_cy))
+                        if (P_cx, P_cy) not in pad_centers: #need to add this pad
+                            pad_centers.append((P_cx, P_cy))
                                 
-                                for i in range(len(fp_contours)):
-                                    id_result = cv2.pointPolygonTest(fp_contours[i], (i_cx, i_cy), False)
-                                    if id_result == 1 or id_result == 0:
-                                        if i in match_pad_map.keys():
-                                            match_pad_map[i].append((P_cx, P_cy))
-                                            match_area_map[i] += M_i['m00']
-                                        else:
-                                            match_pad_map[i] = [(P_cx, P_cy)]
-                                            match_area_map[i] = M_i['m00']
+                            for i in range(len(fp_contours)):
+                                id_result = cv2.pointPolygonTest(fp_contours[i], (i_cx, i_cy), False)
+                                if id_result == 1 or id_result == 0:
+                                    if i in match_pad_map.keys():
+                                        match_pad_map[i].append((P_cx, P_cy))
+                                        match_area_map[i] += M_i['m00']
+                                    else:
+                                        match_pad_map[i] = [(P_cx, P_cy)]
+                                        match_area_map[i] = M_i['m00']
                                     
 
-                            else: #pad was already in pad_centers
-                                #identify which footprint pad intersection corresponds to
-                                for i in range(len(fp_contours)):
-                                    id_result = cv2.pointPolygonTest(fp_contours[i], (i_cx, i_cy), False)
-                                    if id_result == 1 or id_result == 0:
-                                        for id, centers in match_pad_map.items():
-                                            if ((P_cx, P_cy) in centers) and (id != i):
-                                                true_match = False #if that pad center is associated with a different pin on the template footprint, not a match
+                        else: #pad was already in pad_centers
+                            #identify which footprint pad intersection corresponds to
+                            for i in range(len(fp_contours)):
+                                id_result = cv2.pointPolygonTest(fp_contours[i], (i_cx, i_cy), False)
+                                if id_result == 1 or id_result == 0:
+                                    for id, centers in match_pad_map.items():
+                                        if ((P_cx, P_cy) in centers) and (id != i):
+                                            true_match = False #if that pad center is associated with a different pin on the template footprint, not a match
             elif len(int_contours) > 1:
                 true_match = False
                 
@@ -399,9 +1006,8 @@ class ComponentMatching():
             true_match = False
 
         for i in range(len(fp_contours)):
-            f_M = cv2.moments(fp_contours[i])
-            #min_area_coverage = f_M['m00'] * 2 / 10
-            min_area_coverage = f_M['m00'] * 5 / 10
+            #min_area_coverage = fp_areas[i] * 2 / 10
+            min_area_coverage = fp_areas[i] * 5 / 10
             if i in match_area_map.keys() and match_area_map[i] < min_area_coverage:
                 true_match = False
 
@@ -420,15 +1026,75 @@ class ComponentMatching():
             pad_list(array): array of pads hit by match using mask contours IDs
         
         """
+        center_IDs = self.get_center_IDs(pad_map)
+
         pad_list = []
         for center in pad_centers_list:
-            for pad_id, pad_center in pad_map.items():
-                if center == pad_center:
-                    pad_list.append(pad_id)
+            pad_list += center_IDs.get(center, [])
         return pad_list
-        
-        
-    def find_matches(self, orig_img, fp_img, alpha, pad_map, orientation, offset=(0,0), fb='front'):
+
+    def get_center_IDs(self, pad_map):
+        '''
+            Reverse lookup for pad_map, taken from the board's PadIndex when pad_map belongs to the board
+
+            Parameters:
+            pad_map (dict): dict with each pad ID and corresponding center
+
+            Returns:
+            center_IDs (dict): dict of pad centers and the pad IDs with that center
+        '''
+        if hasattr(self, 'pcb_board'):
+            pad_index = self.pcb_board.find_pad_index(pad_map)
+            if pad_index is not None:
+                return pad_index.center_IDs
+
+        return gen_center_ID_map(pad_map)
+
+    def get_prefilter_data(self, alpha, pad_map, fb='front', fp_contours=None, fp_areas=None):
+        '''
+            Helper function for 'find_matches' and 'find_matches_incomplete'. Gathers what window_can_match needs for one search
+
+            Parameters:
+            alpha (2D array): img of the footprint of component (inverted), for the searched orientation
+            pad_map (dict): dict with each pad ID and corresponding center
+
+            Optional:
+            fb (str) - designate front or back of the board
+            fp_contours (array) - precomputed contours of alpha (from the template bank)
+            fp_areas (array) - precomputed area of each of fp_contours
+
+            Returns:
+            signature (dict): footprint_signature of alpha
+            pad_features (array): pad-feature table of the board side
+            pad_weights (array): see get_pad_weights
+        '''
+        if fp_contours is None:
+            fp_contours, fp_hierarchy = cv2.findContours(cv2.cvtColor(alpha, cv2.COLOR_BGR2GRAY), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        if fp_areas is None:
+            fp_areas = [cv2.moments(fp_cnt)['m00'] for fp_cnt in fp_contours]
+
+        return footprint_signature(fp_contours, fp_areas), self.pcb_board.get_pad_features(fb), self.get_pad_weights(pad_map, fb)
+
+    def get_pad_weights(self, pad_map, fb='front'):
+        '''
+            Helper function for 'find_matches' and 'find_matches_incomplete'.
+
+            Parameters:
+            pad_map (dict): dict with each pad ID and corresponding center
+
+            Optional:
+            fb (str) - designate front or back of the board
+
+            Returns:
+            weights (array): for each pad of the board's pad index, number of pad IDs of pad_map sharing its center (what hitting it adds to a pad_list)
+        '''
+        pad_index = self.pcb_board.get_pad_index(fb)
+        center_IDs = self.get_center_IDs(pad_map)
+
+        return np.array([len(center_IDs.get(pad_index.pad_centers[i], [])) for i in range(len(pad_index.features))], dtype=np.int64)
+
+
+    def find_matches(self, orig_img, fp_img, alpha, pad_map, orientation, offset=(0,0), fb='front', fp_contours=None, fp_areas=None):
         """
             Returns an array of Component Match objects.
 
@@ -441,6 +1107,8 @@ class ComponentMatching():
             Optional Parameters:
                     offset (tuple) - default (0,0). to only search on a particular location (i.e. for trace matching)
                     fb (str) - designate if searching on the front or back
+                    fp_contours (array) - precomputed contours of alpha (from the template bank)
+                    fp_areas (array) - precomputed area of each of fp_contours
             Returns:
                     match_list (Component Match array): array of Component Match objects
         """
@@ -453,55 +1121,34 @@ class ComponentMatching():
             h,w = img.shape[:2]
             th,tw = template.shape[:2]
 
-            img = cv2.bitwise_not(img)
-            template = cv2.bitwise_not(template)
-
-            fp_white_pix = np.sum(template == 255)
-
-            res = np.zeros(img.shape[:2])
-
             min_d = min(th,tw)
             min_di = min(h,w)
             
             rad = max(int(min_d/20), int(min_di/140))
 
-            for i in range(0, h, rad):
-                for j in range(0, w, rad):
-
-                    if i + th < h and j + tw < w:
-                        img_crop = img[i:(i+th), j:(j+tw)]
-                        intersection = cv2.bitwise_and(template, img_crop)
-                        
-                        number_of_white_pix = np.sum(intersection == 255) 
-                        number_of_black_pix = np.sum(intersection == 0)
-
+            if self.search_mode == 'pyramid':
+                return coverage_map_pyramid(img, template, rad, threshold, factor=self.pyramid_factor, recall_guard=self.recall_guard)
 
-                        if number_of_white_pix == 0:
-                            res[i,j] = 0
-                        else:
-                            res[i,j] = number_of_white_pix/(fp_white_pix * 1.00)
-                            
-                            
-                            
+            return coverage_map(img, template, rad, engine=self.scoring_engine)
 
-                    else:
-                        res[i,j] = 0
-                    j += rad
-                i += rad
-
-            return res
+        threshold = 0.15
+        #threshold = 0.5
 
         # Perform match operations.
         res = match_template(orig_img, fp_img)
-        
-        threshold = 0.15
-        #threshold = 0.5
+
+        # footprint pads found and labelled once for every window of this search
+        if fp_contours is None:
+            fp_contours, fp_hierarchy = cv2.findContours(cv2.cvtColor(alpha, cv2.COLOR_BGR2GRAY), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        fp_pixels = footprint_pad_pixels(alpha, fp_contours) if self.pad_info_backend == 'labels' else None
+
+        if self.pad_prefilter:
+            signature, pad_features, pad_weights = self.get_prefilter_data(alpha, pad_map, fb, fp_contours, fp_areas)
 
         matches = 0
         matches_pad_list = []
         match_list = []
         
-        max_val = 1
         #rad = int(math.sqrt(h*h+w*w)/16) # 8 seemed to work well to account for close by pads
         i_h,i_w = orig_img.shape[:2]
         min_d = min(i_h,i_w)
@@ -510,14 +1157,20 @@ class ComponentMatching():
         rad = max(int(min_di/20), int(min_d/140))
 
 
-        while max_val > threshold:
+        # every peak of the score map above the threshold, strongest first
+        for max_val, max_loc in find_peaks(res, threshold, rad):
+
+            ##check num of pads in match
 
-            # find max value of correlation image
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
-           
-            if max_val > threshold:
+            # are the pads around the window able to host the footprint?
+            self.window_stats['windows'] += 1
+            can_match = not self.pad_prefilter or window_can_match((max_loc[0] + offset[0], max_loc[1] + offset[1]), (w, h), signature, pad_features, pad_weights, self.num_fp_pads)
+            if not can_match:
+                self.window_stats['pruned'] += 1
 
-                ##check num of pads in match
+            # filter if less than # fp pads (aka the required number of pads)
+            #if num_match_pads >= self.num_fp_pads:
+            if can_match:
 
                 #crop match img and invert for processing
                 if fb == 'front':
@@ -532,42 +1185,28 @@ class ComponentMatching():
 
                 match_contours, hierarchy = cv2.findContours(match_inv, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
                 num_match_pads = len(match_contours)
-                
-                # filter if less than # fp pads (aka the required number of pads)
-                #if num_match_pads >= self.num_fp_pads:
-                if True:
 
-                    # are these the same pads as a different match?
+                # are these the same pads as a different match?
 
-                    pad_centers_list, match_pad_map, match_area_map, true_match, fp_contours = self.get_pad_info((max_loc[0] + offset[0], max_loc[1] + offset[1]), w, h, match_contours, alpha, fb=fb)
-                    
-
-
-                    pad_list = self.get_list_from_pad_centers(pad_centers_list, pad_map)
-                    
-                    if true_match and (pad_list not in matches_pad_list) and (len(pad_list) >= self.num_fp_pads):
-                        matches_pad_list.append(pad_list)
-
-                        c_match = ComponentMatch(max_val, match_pad_map, pad_list, (max_loc[0] + offset[0], max_loc[1] + offset[1]), orientation)
-                        c_match.fp_contours = fp_contours
-                        c_match.pad_coverage = match_area_map
-                        c_match.fb = fb
-                        match_list.append(c_match)
+                pad_centers_list, match_pad_map, match_area_map, true_match, match_fp_contours = self.get_pad_info((max_loc[0] + offset[0], max_loc[1] + offset[1]), w, h, match_contours, alpha, fb=fb, fp_contours=fp_contours, fp_areas=fp_areas, fp_pixels=fp_pixels)
+                
 
-                    # write black circle at max_loc in corr_img
-                    cv2.circle(res, (max_loc), radius=rad, color=0, thickness=cv2.FILLED)
 
-                else:
-                    #make sure to blackout location so loop doesn't get stuck
-                    cv2.circle(res, (max_loc), radius=rad, color=0, thickness=cv2.FILLED)
+                pad_list = self.get_list_from_pad_centers(pad_centers_list, pad_map)
+                
+                if true_match and (pad_list not in matches_pad_list) and (len(pad_list) >= self.num_fp_pads):
+                    matches_pad_list.append(pad_list)
 
-            else:
-                break
+                    c_match = ComponentMatch(max_val, match_pad_map, pad_list, (max_loc[0] + offset[0], max_loc[1] + offset[1]), orientation)
+                    c_match.fp_contours = match_fp_contours
+                    c_match.pad_coverage = match_area_map
+                    c_match.fb = fb
+                    match_list.append(c_match)
 
         return match_list
         
  
-    def find_matches_incomplete(self, orig_img, fp_img, alpha, pad_map, orientation, num_fp_pads, offset=(0,0), fb='front'):
+    def find_matches_incomplete(self, orig_img, fp_img, alpha, pad_map, orientation, num_fp_pads, offset=(0,0), fb='front', fp_contours=None, fp_areas=None):
         """
             Returns an array of Component Match objects and allows for an incomplete match.
 
@@ -581,6 +1220,8 @@ class ComponentMatching():
             Optional Parameters:
                     offset (tuple) - default (0,0). to only search on a particular location (i.e. for trace matching)
                     fb (str) - designate if searching on the front or back
+                    fp_contours (array) - precomputed contours of alpha (from the template bank)
+                    fp_areas (array) - precomputed area of each of fp_contours
             Returns:
                     match_list (Component Match array): array of Component Match objects
         """
@@ -590,75 +1231,55 @@ class ComponentMatching():
         h, w = fp_img.shape[:2]
 
         def match_template(img, template):
-            h,w = img.shape[:2]
             th,tw = template.shape[:2]
 
-            img = cv2.bitwise_not(img)
-            template = cv2.bitwise_not(template)
-
-
-
-            fp_white_pix = np.sum(template == 255)
-
-            res = np.zeros(img.shape[:2])
-
             min_d = min(th,tw)
             min_di = min(self.pcb_board.pcb_rgb.shape[:2])
             
             rad = max(int(min_d/16), int(min_di/100))
 
-            for i in range(0, h, rad):
-                for j in range(0, w, rad):
-
-                    if i + th < h and j + tw < w:
-                        img_crop = img[i:(i+th), j:(j+tw)]
-                        intersection = cv2.bitwise_and(template, img_crop)
-
-
-                        
-                        number_of_white_pix = np.sum(intersection == 255) 
-                        number_of_black_pix = np.sum(intersection == 0)
-
-                        if number_of_white_pix == 0:
-                            res[i,j] = 0
-                        else:
-                            res[i,j] = number_of_white_pix/(fp_white_pix * 1.00)
-
+            if self.search_mode == 'pyramid':
+                return coverage_map_pyramid(img, template, rad, threshold, factor=self.pyramid_factor, recall_guard=self.recall_guard)
 
-                    else:
-                        res[i,j] = 0
-                    j += rad
-                i += rad
+            return coverage_map(img, template, rad, engine=self.scoring_engine)
 
-            return res
+        # Specify a threshold (TO DO: OPTION TO CHANGE?)
+        threshold = 0.3
+        #threshold = 0.5
 
         # Perform match operations.
         res = match_template(orig_img, fp_img)
 
-        # Specify a threshold (TO DO: OPTION TO CHANGE?)
-        threshold = 0.3
-        #threshold = 0.5
+        # footprint pads found and labelled once for every window of this search
+        if fp_contours is None:
+            fp_contours, fp_hierarchy = cv2.findContours(cv2.cvtColor(alpha, cv2.COLOR_BGR2GRAY), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        fp_pixels = footprint_pad_pixels(alpha, fp_contours) if self.pad_info_backend == 'labels' else None
+
+        if self.pad_prefilter:
+            signature, pad_features, pad_weights = self.get_prefilter_data(alpha, pad_map, fb, fp_contours, fp_areas)
 
         matches = 0
         matches_pad_list = []
         match_list = []
         
-        max_val = 1
         i_h,i_w = self.pcb_board.pcb_rgb.shape[:2]
         min_d = min(i_h,i_w)
         min_di = min(h,w)
 
         rad = max(int(min_di/16), int(min_d/100))
 
-        while max_val > threshold:
+        # every peak of the score map above the threshold, strongest first
+        for max_val, max_loc in find_peaks(res, threshold, rad):
 
-            # find max value of correlation image
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
-
-            if max_val > threshold:
-
-                ##check num of pads in match
+            ##check num of pads in match
 
+            # are the pads around the window able to host the footprint?
+            self.window_stats['windows'] += 1
+            can_match = not self.pad_prefilter or window_can_match((max_loc[0] + offset[0], max_loc[1] + offset[1]), (w, h), signature, pad_features, pad_weights, num_fp_pads)
+            if not can_match:
+                self.window_stats['pruned'] += 1
+                num_match_pads = 0
+            else:
                 #crop match img and invert for processing
                 if fb == 'front':
                     pcb_img = self.pcb_board.mask_rgb
@@ -671,38 +1292,101 @@ class ComponentMatching():
 
                 match_contours, hierarchy = cv2.findContours(match_inv, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
                 num_match_pads = len(match_contours)
+            
+            # filter if less than # fp pads (aka the required number of pads)
+            if can_match and num_match_pads >= num_fp_pads:
+
+                # are these the same pads as a different match?
+
+                pad_centers_list, match_pad_map, match_area_map, true_match, match_fp_contours = self.get_pad_info((max_loc[0] + offset[0], max_loc[1] + offset[1]), w, h, match_contours, alpha, fb=fb, fp_contours=fp_contours, fp_areas=fp_areas, fp_pixels=fp_pixels)
                 
-                # filter if less than # fp pads (aka the required number of pads)
-                if num_match_pads >= num_fp_pads:
+                pad_list = self.get_list_from_pad_centers(pad_centers_list, pad_map)
 
-                    # are these the same pads as a different match?
+                if true_match and (pad_list not in matches_pad_list) and (len(pad_list) >= num_fp_pads):
+                    matches_pad_list.append(pad_list)
 
-                    pad_centers_list, match_pad_map, match_area_map, true_match, fp_contours = self.get_pad_info((max_loc[0] + offset[0], max_loc[1] + offset[1]), w, h, match_contours, alpha, fb=fb)
-                    
-                    pad_list = self.get_list_from_pad_centers(pad_centers_list, pad_map)
+                    c_match = ComponentMatch(max_val, match_pad_map, pad_list, (max_loc[0] + offset[0], max_loc[1] + offset[1]), orientation)
+                    c_match.fp_contours = match_fp_contours
+                    c_match.pad_coverage = match_area_map
+                    c_match.incomplete = True
+                    c_match.fb = fb
+
+                    match_list.append(c_match)
+
+        return match_list
 
-                    if true_match and (pad_list not in matches_pad_list) and (len(pad_list) >= num_fp_pads):
-                        matches_pad_list.append(pad_list)
+    def get_template_bank(self, template=None, bank_ID='full'):
+        '''
+        gets all orientations of the footprint template, built once per footprint image and shared with every ComponentMatching object
 
-                        c_match = ComponentMatch(max_val, match_pad_map, pad_list, (max_loc[0] + offset[0], max_loc[1] + offset[1]), orientation)
-                        c_match.fp_contours = fp_contours
-                        c_match.pad_coverage = match_area_map
-                        c_match.incomplete = True
-                        c_match.fb = fb
+        Optional:
+        template (2D array) - modified footprint image to use instead of self.footprint_rgb (i.e. with pins erased)
+        bank_ID (str) - identifies the template variant in the cache (must be unique per modified template)
 
-                        match_list.append(c_match)
+        Returns:
+        bank (FootprintTemplateBank) - precomputed data for every orientation
+        '''
+        if template is None:
+            template = self.footprint_rgb
 
-                    # write black circle at max_loc in corr_img
-                    cv2.circle(res, (max_loc), radius=rad, color=0, thickness=cv2.FILLED)
+        key = None
+        if hasattr(self, 'fp_bank_key'):
+            key = (self.fp_bank_key, bank_ID)
+            with _cache_lock:
+                if key in _template_banks:
+                    return _template_banks[key]
 
-                else:
-                    #make sure to blackout location so loop doesn't get stuck
-                    cv2.circle(res, (max_loc), radius=rad, color=0, thickness=cv2.FILLED)
+        alpha = cv2.bitwise_not(template)
 
+        bank = FootprintTemplateBank()
+        for orientation in bank.orientations:
+            if orientation == 0:
+                rt_alpha = alpha
+                rt_template = template
             else:
-                break
+                rt_alpha = rotation(alpha, orientation)
+                rt_template = cv2.bitwise_not(rt_alpha)
 
-        return match_list
+            fp_alpha_img = cv2.cvtColor(rt_alpha, cv2.COLOR_BGR2GRAY)
+            o_fp_contours, hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+
+            #rotated contours are always mapped against the original (complete) footprint contours
+            if orientation == 0:
+                o_map = None
+            else:
+                o_map = self.map_pads(self.fp_contours, self.fp_alpha, o_fp_contours, rt_alpha, orientation)
+
+            bank.add_orientation(orientation, rt_template, rt_alpha, o_fp_contours, o_map)
+
+        if key is not None:
+            with _cache_lock:
+                # drop the banks of older versions of the same footprint image
+                for old_key in [old_key for old_key in _template_banks.keys() if old_key[0][0] == key[0][0] and old_key[0] != key[0]]:
+                    del _template_banks[old_key]
+                _template_banks[key] = bank
+
+        return bank
+
+    def get_pin_o_map(self, bank, pin_map, orientation):
+        '''
+        mapping between pins and the contours of a rotated footprint (memoized in the bank)
+
+        Parameters:
+        bank (FootprintTemplateBank) - template bank of the footprint
+        pin_map (array) - mapping between pin label and original footprint contours
+        orientation (int) - rotation of the footprint
+
+        Returns:
+        pin_o_map (array) - mapping between pin label and rotated contours
+        '''
+        if orientation == 0:
+            return pin_map
+
+        key = (tuple(pin_map), orientation)
+        if key not in bank.pin_cnt_maps:
+            bank.pin_cnt_maps[key] = self.map_rt_cnt_to_pins(pin_map, bank.get(orientation)['cnt_map'])
+
+        return bank.pin_cnt_maps[key]
 
     def get_matches(self):
         """
@@ -712,45 +1396,31 @@ class ComponentMatching():
             f_map (array): array of filtered component matches
         
         """
-        orientations = [0, 45, 90, 135, 180, 225, 270, 315]
+        if self.match_engine == 'geometric':
+            return self.get_geometric_matches()
+
+        bank = self.get_template_bank()
 
         pin_map, pin_centers_map = self.get_pin_mapping(self.fp_contours, self.fp_file)
         
         cm_o_arr = []
 
-        for orientation in orientations:
-            if orientation == 0:
-                alpha = self.fp_alpha
-                template = self.footprint_rgb
-            else:
-                alpha = rotation(self.fp_alpha, orientation)
-                template= cv2.bitwise_not(alpha)
-
+        for orientation in bank.orientations:
+            o_bank = bank.get(orientation)
+            alpha = o_bank['alpha']
+            template = o_bank['template']
     
-            match_list = self.find_matches(self.pcb_board.mask_rgb, template, alpha, self.pcb_board.front_pad_map, orientation)
+            match_list = self.find_matches(self.pcb_board.mask_rgb, template, alpha, self.pcb_board.front_pad_map, orientation, fp_contours=o_bank['contours'], fp_areas=o_bank['pad_areas'])
             
-            if orientation == 0:
-                self.relabel_contours(pin_map, match_list, self.pcb_board.front_pad_map)
-            else:
-                fp_alpha_img = cv2.cvtColor(alpha, cv2.COLOR_BGR2GRAY)
-                o_fp_contours, hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-                o_map = self.map_pads(self.fp_contours, self.fp_alpha, o_fp_contours, alpha, orientation)
-                pin_o_map = self.map_rt_cnt_to_pins(pin_map, o_map)
-                self.relabel_contours(pin_o_map, match_list, self.pcb_board.front_pad_map)
+            pin_o_map = self.get_pin_o_map(bank, pin_map, orientation)
+            self.relabel_contours(pin_o_map, match_list, self.pcb_board.front_pad_map)
 
             cm_o_arr.append(match_list)
 
             if self.pcb_board.double_sided:
-                matchb_list = self.find_matches(self.pcb_board.mask_rgb_back, template, alpha, self.pcb_board.back_pad_map, orientation, fb='back')
+                matchb_list = self.find_matches(self.pcb_board.mask_rgb_back, template, alpha, self.pcb_board.back_pad_map, orientation, fb='back', fp_contours=o_bank['contours'], fp_areas=o_bank['pad_areas'])
 
-                if orientation == 0:
-                    self.relabel_contours(pin_map, matchb_list, self.pcb_board.back_pad_map)
-                else:
-                    fp_alpha_img = cv2.cvtColor(alpha, cv2.COLOR_BGR2GRAY)
-                    o_fp_contours, hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-                    o_map = self.map_pads(self.fp_contours, self.fp_alpha, o_fp_contours, alpha, orientation)
-                    pin_o_map = self.map_rt_cnt_to_pins(pin_map, o_map)
-                    self.relabel_contours(pin_o_map, matchb_list, self.pcb_board.back_pad_map)
+                self.relabel_contours(pin_o_map, matchb_list, self.pcb_board.back_pad_map)
 
                 cm_o_arr.append(matchb_list)
 
@@ -763,6 +1433,59 @@ class ComponentMatching():
         
         return f_map
 
+    def get_geometric_matches(self):
+        """
+            Finds the component matches by matching the pads of the footprint file against the board pads as point sets (see geometric_match)
+            instead of sliding the rotated footprint images over the mask. Any rotation angle is found, the orientation of a match is in degrees.
+
+            Returns:
+            f_map (array): array of filtered component matches
+        """
+        geometry = load_footprint_geometry(self.fp_file)
+
+        # the footprint image is cropped around its pads, so its pads and the footprint file pads share their center
+        x, y, w, h = cv2.boundingRect(np.concatenate(self.fp_contours))
+        polygons = np.concatenate(geometry.polygons)
+        offset = (polygons.min(axis=0) + polygons.max(axis=0)) / 2 - (x + (w - 1) / 2, y + (h - 1) / 2)
+
+        sides = [('front', self.pcb_board.front_pad_map)]
+        if self.pcb_board.double_sided:
+            sides.append(('back', self.pcb_board.back_pad_map))
+
+        cm_arr = []
+        for fb, pad_map in sides:
+            pad_index = self.pcb_board.get_pad_index(fb)
+
+            match_list = []
+            for placement in find_placements(geometry, pad_index):
+                pad_centers = {}
+                pad_coverage = {}
+                for pin, pads_under, covered in zip(geometry.pins, placement['pads_under'], placement['covered']):
+                    pad_centers.setdefault(pin, [])
+                    for pad_ID in pads_under:
+                        center = pad_index.pad_centers[pad_ID]
+                        if center not in pad_centers[pin]:
+                            pad_centers[pin].append(center)
+                    pad_coverage[pin] = pad_coverage.get(pin, 0) + int(covered)
+
+                pad_list = self.get_list_from_pad_centers(list(dict.fromkeys(sum(pad_centers.values(), []))), pad_map)
+                coordinates, fp_contours = placement_contours(geometry, placement['R'], placement['t'])
+                score = float(placement['covered'].sum() / placement['total'].sum())
+
+                c_match = ComponentMatch(score, pad_centers, pad_list, coordinates, placement_orientation(placement['R']))
+                c_match.fp_contours = fp_contours
+                c_match.fp_transform = np.hstack([placement['R'], (placement['R'] @ offset + placement['t']).reshape(2, 1)]).tolist()
+                c_match.pad_coverage = pad_coverage
+                c_match.fb = fb
+                for pin, centers in pad_centers.items():
+                    c_match.pad_IDs[pin] = self.get_list_from_pad_centers(centers, pad_map)
+
+                match_list.append(c_match)
+
+            cm_arr.append(match_list)
+
+        return self.filter_matches(cm_arr)
+
     def get_incomplete_matches(self, ignore_pins):
         '''
         searches for matches that can ignore finding a connecting pad for specified pin
@@ -801,46 +1524,31 @@ class ComponentMatching():
 
         m_pin_map, m_pin_centers_map = self.get_pin_mapping(mod_fp_contours, self.fp_file)
 
-        orientations = [0, 45, 90, 135, 180, 225, 270, 315]
+        bank = self.get_template_bank(modified_template, bank_ID='ignore ' + str(sorted(ignore_pins)))
 
         cm_o_arr = []
 
-        for orientation in orientations:
-            if orientation == 0:
-                alpha = modified_alpha
-                template = modified_template
-            else:
-                alpha = rotation(modified_alpha, orientation)
-                template= cv2.bitwise_not(alpha)
+        for orientation in bank.orientations:
+            o_bank = bank.get(orientation)
+            alpha = o_bank['alpha']
+            template = o_bank['template']
     
-            match_list = self.find_matches_incomplete(self.pcb_board.mask_rgb, template, alpha, self.pcb_board.front_pad_map, orientation, mod_num_fp_pads)
+            match_list = self.find_matches_incomplete(self.pcb_board.mask_rgb, template, alpha, self.pcb_board.front_pad_map, orientation, mod_num_fp_pads, fp_contours=o_bank['contours'], fp_areas=o_bank['pad_areas'])
 
             for match in match_list:
                 match.pins_missing = ignore_pins
                 match.removed_cnts = removed_cnts
 
-            if orientation == 0:
-                self.relabel_contours(m_pin_map, match_list, self.pcb_board.front_pad_map)
-            else:
-                fp_alpha_img = cv2.cvtColor(alpha, cv2.COLOR_BGR2GRAY)
-                o_fp_contours, hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-                o_map = self.map_pads(self.fp_contours, self.fp_alpha, o_fp_contours, alpha, orientation)
-                pin_o_map = self.map_rt_cnt_to_pins(m_pin_map, o_map)
-                self.relabel_contours(pin_o_map, match_list, self.pcb_board.front_pad_map)
+            pin_o_map = self.get_pin_o_map(bank, m_pin_map, orientation)
+            self.relabel_contours(pin_o_map, match_list, self.pcb_board.front_pad_map)
 
             cm_o_arr.append(match_list)
 
             if self.pcb_board.double_sided:
-                matchb_list = self.find_matches_incomplete(self.pcb_board.mask_rgb_back, template, alpha, self.pcb_board.back_pad_map, orientation, mod_num_fp_pads, fb='back')
+                matchb_list = self.find_matches_incomplete(self.pcb_board.mask_rgb_back, template, alpha, self.pcb_board.back_pad_map, orientation, mod_num_fp_pads, fb='back', fp_contours=o_bank['contours'], fp_areas=o_bank['pad_areas'])
 
-                if orientation == 0:
-                    self.relabel_contours(pin_map, matchb_list, self.pcb_board.back_pad_map)
-                else:
-                    fp_alpha_img = cv2.cvtColor(alpha, cv2.COLOR_BGR2GRAY)
-                    o_fp_contours, hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-                    o_map = self.map_pads(self.fp_contours, self.fp_alpha, o_fp_contours, alpha, orientation)
-                    pin_o_map = self.map_rt_cnt_to_pins(pin_map, o_map)
-                    self.relabel_contours(pin_o_map, matchb_list, self.pcb_board.back_pad_map)
+                pinb_o_map = self.get_pin_o_map(bank, pin_map, orientation)
+                self.relabel_contours(pinb_o_map, matchb_list, self.pcb_board.back_pad_map)
 
                 cm_o_arr.append(matchb_list)
 
@@ -1381,30 +2089,21 @@ class ComponentMatching():
 
         cropped_search_img = mask_img[lt_coord[1]: rb_coord[1], lt_coord[0]: rb_coord[0]]
         
-        orientations = [0, 45, 90, 135, 180, 225, 270, 315]
+        bank = self.get_template_bank()
 
         pin_map, pin_centers_map = self.get_pin_mapping(self.fp_contours, self.fp_file)
 
         cm_o_arr = []
 
-        for orientation in orientations:
-            if orientation == 0:
-                alpha = self.fp_alpha
-                template = self.footprint_rgb
-            else:
-                alpha = rotation(self.fp_alpha, orientation)
-                template= cv2.bitwise_not(alpha)
+        for orientation in bank.orientations:
+            o_bank = bank.get(orientation)
+            alpha = o_bank['alpha']
+            template = o_bank['template']
     
-            match_list = self.find_matches(cropped_search_img, template, alpha, pad_map, orientation, offset=lt_coord, fb=fb)
+            match_list = self.find_matches(cropped_search_img, template, alpha, pad_map, orientation, offset=lt_coord, fb=fb, fp_contours=o_bank['contours'], fp_areas=o_bank['pad_areas'])
             
-            if orientation == 0:
-                self.relabel_contours(pin_map, match_list, pad_map)
-            else:
-                fp_alpha_img = cv2.cvtColor(alpha, cv2.COLOR_BGR2GRAY)
-                o_fp_contours, hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-                o_map = self.map_pads(self.fp_contours, self.fp_alpha, o_fp_contours, alpha, orientation)
-                pin_o_map = self.map_rt_cnt_to_pins(pin_map, o_map)
-                self.relabel_contours(pin_o_map, match_list, pad_map)
+            pin_o_map = self.get_pin_o_map(bank, pin_map, orientation)
+            self.relabel_contours(pin_o_map, match_list, pad_map)
 
             cm_o_arr.append(match_list)
 
@@ -1480,33 +2179,36 @@ class ComponentMatching():
         '''
         n_matches = []
         for match in matches:
-            match.touched_traces_dict = {}
-            match.touched_traces_list = []
-            for pin, pads in match.pad_IDs.items():
-                for pad in pads:
-                    for trace_ID, trace_info in self.pcb_board.board_connections_dict.items():
-                        if match.fb == 'front':
-                            if pad in trace_info['front pads']:
-                                if pin in match.touched_traces_dict.keys():
-                                    match.touched_traces_dict[pin].append(trace_ID)
-                                else:
-                                    match.touched_traces_dict[pin] = [trace_ID]
-                                match.touched_traces_list.append(trace_ID)
-                                break
-                        else:
-                            if pad in trace_info['back pads']:
-                                if pin in match.touched_traces_dict.keys():
-                                    match.touched_traces_dict[pin].append(trace_ID)
-                                else:
-                                    match.touched_traces_dict[pin] = [trace_ID]
-                                match.touched_traces_list.append(trace_ID)
-                                break
+            match.update_traces(self.pcb_board)
 
             if len(match.touched_traces_dict.keys()) == len(match.pad_IDs.keys()):
                 n_matches.append(match)
 
         return n_matches
 
+    def get_match_warp(self, match):
+        '''
+            Helper function for 'add_warnings_missing_pins' and 'get_images_of_match'. Places the footprint image on a match.
+
+            Parameters:
+            match (ComponentMatch object) - match to place the footprint image on
+
+            Returns:
+            M (2D array) - affine transform from the footprint image to the mask image, relative to match.coordinates
+            (tuple) - w, h size of the placed footprint image
+        '''
+        h, w = self.footprint_rgb.shape[:2]
+
+        if not hasattr(match, 'fp_transform'):
+            # raster matches are the rotated template with its top left corner at match.coordinates
+            return rotation_matrix(h, w, match.orientation)
+
+        M = np.array(match.fp_transform, dtype=np.float64)
+        M[:, 2] -= match.coordinates
+
+        corners = np.array([[0, 0], [w, 0], [0, h], [w, h]]) @ M[:, :2].T + M[:, 2]
+        return M, (int(math.ceil(corners[:, 0].max())), int(math.ceil(corners[:, 1].max())))
+
     def add_warnings_missing_pins(self, match):
         '''
             Helper function for 'get_incomplete_matches'. Adds relevant warnings for incomplete matches regarding the pins that weren't accounted for.
@@ -1516,7 +2218,7 @@ class ComponentMatching():
 
         '''
 
-        h, w = rotation(self.footprint_rgb, match.orientation).shape[:2]
+        M, (w, h) = self.get_match_warp(match)
 
         if match.fb == 'front':
             mask_img = self.pcb_board.mask_rgb
@@ -1537,7 +2239,7 @@ class ComponentMatching():
 
             mask = np.zeros(self.footprint_rgb.shape[:2], np.uint8)
             cv2.drawContours(mask, [removed_cnt], 0, (255,255,255), -1)
-            rotated_mask = rotation(mask, match.orientation)
+            rotated_mask = cv2.warpAffine(mask, M, (w, h), flags=cv2.INTER_LINEAR)
 
             # where does the solder mask image intersect with this pad
             intersection = cv2.bitwise_and(inv_match_crop, rotated_mask)
@@ -1656,6 +2358,7 @@ class ComponentMatching():
     def get_pin_mapping(self, orig_fp_contours, fp_filename):
         """
             Helper function for 'get_matches'. Uses original footprint file to create a mapping of which pin is attached to which contour in footprint.
+            Only the pads of the footprint file are read and the mapping is memoized (shared, don't modify the results).
             Parameters:
             orig_fp_contours (array): array of contours in the footprint image
             fp_filename (str): string of the footprint file 
@@ -1669,10 +2372,14 @@ class ComponentMatching():
         if not os.path.exists(fp_filename):
             name = fp_filename.split('/tests')
             fp_filename = name[0] + name[1]
-        footprint_kicad = KicadMod(filename=fp_filename)
 
-        pads = footprint_kicad._getPads()
         (h, w) = self.fp_alpha.shape[:2]
+        key = (footprint_file_key(fp_filename), h, w, tuple(cnt.tobytes() for cnt in orig_fp_contours))
+        with _cache_lock:
+            if key in _pin_mappings:
+                return _pin_mappings[key]
+
+        pads = load_pads(fp_filename)
 
         map = []
         p_no_loc = {}
@@ -1720,7 +2427,13 @@ class ComponentMatching():
                     result = cv2.pointPolygonTest(orig_fp_contours[i], (p_x, p_y), False)
                     if result == 1:
                         map.append((pad['number'], i))
-                            
+
+        with _cache_lock:
+            # drop the mappings of older versions of the same footprint file
+            for old_key in [old_key for old_key in _pin_mappings.keys() if old_key[0][0] == key[0][0] and old_key[0] != key[0]]:
+                del _pin_mappings[old_key]
+            _pin_mappings[key] = (map, p_no_loc)
+
         return map, p_no_loc
         
     def map_pads(self, orig_contours, orig_alpha, rt_contours, rt_alpha, rt_degrees):
@@ -1849,6 +2562,8 @@ class ComponentMatching():
             ff_map (array): array of matches that are further filtered
         
         """
+        center_IDs = self.get_center_IDs(pad_map)
+
         ff_map = []
         for match in f_map:
             valid_match = True
@@ -1860,7 +2575,7 @@ class ComponentMatching():
                     # is it connected to another solderable pad area?
 
                     # which pad ID does this belong to?
-                    pad_ID = list(pad_map.keys())[list(pad_map.values()).index(center)]
+                    pad_ID = center_IDs[center][0]
 
                     for trace_ID, connected_pads in trace_map.items():
                         if pad_ID in connected_pads:
@@ -1927,10 +2642,12 @@ class ComponentMatching():
             pcb_view_img (2D array): image of the match with relevant traces colored in
         
         """
+        center_IDs = self.get_center_IDs(pad_map)
+
         pcb_view_img = self.pcb_rgb.copy()
         for pad, centers in match.pad_centers.items():
             for center in centers:
-                pad_ID = list(pad_map.keys())[list(pad_map.values()).index(center)]
+                pad_ID = center_IDs[center][0]
 
                 for trace_ID, connected_pads in trace_map.items():
                     if pad_ID in connected_pads:
@@ -1940,11 +2657,10 @@ class ComponentMatching():
                 cv2.drawContours(pcb_view_img, self.mask_contours, pad_ID, (255,255,0), -1)
         
         #draw overlap in another window
-        alpha_rt = rotation(self.fp_alpha, match.orientation)
+        M, (w, h) = self.get_match_warp(match)
+        alpha_rt = cv2.warpAffine(self.fp_alpha, M, (w, h), flags=cv2.INTER_LINEAR)
         fp_alpha_img = cv2.cvtColor(alpha_rt, cv2.COLOR_BGR2GRAY)
         fp_contours, hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-
-        h, w = alpha_rt.shape[:2]
     
         loc = [match.coordinates[0], match.coordinates[1]]
         ct_img_rgb = self.pcb_rgb.copy()
@@ -1976,9 +2692,11 @@ class ComponentMatching():
         colored_pads_temp = alpha_temp.copy()
 
 
+        center_IDs = self.get_center_IDs(pad_map)
+
         for pad, centers in match.pad_centers.items():
             for center in centers:
-                pad_ID = list(pad_map.keys())[list(pad_map.values()).index(center)]
+                pad_ID = center_IDs[center][0]
                 #cv2.drawContours(alpha_temp, mask_contours, pad_ID, (255,255,255), -1)
                 cv2.drawContours(colored_pads_temp, mask_contours, pad_ID, (255,255,0), -1)
 
@@ -1,5 +1,6 @@
 from sch_reader import *
 from svg_edit import *
+from footprint_cache import prepare_footprint_png
 
 from ComponentMatch import *
 from PCB_utils import *
@@ -118,10 +119,7 @@ class NetMatching():
 				footprint_arr = footprint.split(":")
 				fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-				if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-					complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-					
-					gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+				fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 				
 				cm = ComponentMatching()
 				cm.pcb_board = self.pcb_board
@@ -158,10 +156,7 @@ class NetMatching():
 		footprint_arr = footprint.split(":")
 		fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-		if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-			complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-		
-			gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+		fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 		
 		cm = ComponentMatching()
 		cm.pcb_board = self.pcb_board
@@ -246,10 +241,7 @@ class NetMatching():
 						footprint_arr = footprint.split(":")
 						fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-						if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-							complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-
-							gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+						fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 						cm.initialize_fp_from_file(temp_dir + "/" + footprint_arr[1] + ".png", fp_parent_file + "/" + footprint_arr[1] + ".kicad_mod")
 						ignore_pads = {'front pads': [], 'back pads': []}
@@ -354,10 +346,7 @@ class NetMatching():
 				footprint_arr = footprint.split(":")
 				fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
 
-				if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-					complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-
-					gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+				fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 				cm.initialize_fp_from_file(temp_dir + "/" + footprint_arr[1] + ".png", fp_parent_file + "/" + footprint_arr[1] + ".kicad_mod")
 				
@@ -754,10 +743,7 @@ class NetMatching():
 				if len(footprint) > 0:
 					footprint_arr = footprint.split(":")
 					fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-					if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-						complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-													
-						gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+					fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 					#does this ref already exist in the match?
 					
@@ -818,10 +804,7 @@ class NetMatching():
 				if len(footprint) > 0:
 					footprint_arr = footprint.split(":")
 					fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-					if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-						complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-													
-						gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+					fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 
 				#does this ref already exist in the match?
@@ -1395,15 +1378,7 @@ class NetMatching():
 			if len(footprint) > 0:
 				footprint_arr = footprint.split(":")
 				fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-				if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-					complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-
-					if complete.returncode != 0:
-						print('did not return')
-						fp_parent_file = temp_dir + "/Footprint Libraries/KiCad.pretty"
-						complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-										
-					gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+				fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 			#exclude traces that are touched by other net match components
 			touched_traces = match['traces'] + ignore_traces
@@ -1544,14 +1519,7 @@ class NetMatching():
 				if len(footprint) > 0:
 					footprint_arr = footprint.split(":")
 					fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-					if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-						complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-						if complete.returncode != 0:
-							print('did not return')
-							fp_parent_file = temp_dir + "/Footprint Libraries/KiCad.pretty"
-							complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-										
-						gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+					fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 					#does this ref already exist in the match?
 					
@@ -1651,10 +1619,7 @@ class NetMatching():
 							if len(footprint) > 0:
 								footprint_arr = footprint.split(":")
 								fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-								if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-									complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-																
-									gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+								fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 
 							#does this ref already exist in the match?
@@ -2048,15 +2013,7 @@ class NetMatching():
 				if len(footprint) > 0:
 					footprint_arr = footprint.split(":")
 					fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-					if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-						complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-						
-						if complete.returncode != 0:
-							print('did not return')
-							fp_parent_file = temp_dir + "/Footprint Libraries/KiCad.pretty"
-							complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-										
-						gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+					fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 
 				#does this ref already exist in the match?
@@ -2955,15 +2912,7 @@ class NetMatching():
 			if len(footprint) > 0:
 				footprint_arr = footprint.split(":")
 				fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-				if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-					complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])							
-					
-					if complete.returncode != 0:
-						print('did not return')
-						fp_parent_file = temp_dir + "/Footprint Libraries/KiCad.pretty"
-						complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-					
-					gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+				fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 			
 			cm = ComponentMatching()
@@ -3118,10 +3067,7 @@ class NetMatching():
 				if len(footprint) > 0:
 					footprint_arr = footprint.split(":")
 					fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-					if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-						complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-													
-						gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+					fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 					#does this ref already exist in the match?
 					
@@ -3252,10 +3198,7 @@ class NetMatching():
 			if len(footprint) > 0:
 				footprint_arr = footprint.split(":")
 				fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-				if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-					complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-												
-					gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+				fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 
 			#does this ref already exist in the match?
@@ -4185,15 +4128,7 @@ class NetMatching():
 				if len(footprint) > 0:
 					footprint_arr = footprint.split(":")
 					fp_parent_file = footprints_dir + footprint_arr[0] + ".pretty"
-					if not os.path.isfile(temp_dir + "/" + footprint_arr[1] + ".png"):
-						complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-						
-						if complete.returncode != 0:
-							print('did not return')
-							fp_parent_file = temp_dir + "/Footprint Libraries/KiCad.pretty"
-							complete = subprocess.run([kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", temp_dir, "--fp", footprint_arr[1], "--black-and-white", "-l", "F.Cu"])
-										
-						gen_footprint_PNG(temp_dir + "/" + footprint_arr[1] + ".svg")
+					fp_file_png, fp_parent_file = prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint_arr[1])
 
 					#does this ref already exist in the match?
 					
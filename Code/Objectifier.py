@@ -25,8 +25,9 @@ __all__ = [
 
 import logging
 
-import sexpdata
-from sexpdata import car, cdr, Symbol
+from sexpdata import car, cdr, Symbol, String
+
+from sexpr import number_regex, sexp_tokens
 
 ####################################################################################################
 
@@ -39,6 +40,41 @@ def car_value(_):
 
 ####################################################################################################
 
+def sexpdata_atom(token):
+    """Convert a bare atom the way sexpdata does (t, numbers, else Symbol)"""
+    match = number_regex.fullmatch(token)
+    if match is not None:
+        return int(token) if match.group(1) is None else float(token)
+    if token == 't':
+        return True
+    if token[0] in '+-.0123456789' or token.lower() in ('inf', 'infinity', 'nan'):
+        try:
+            return int(token)
+        except ValueError:
+            try:
+                return float(token)
+            except ValueError:
+                pass
+    return Symbol(token)
+
+def sexpdata_string(token):
+    """Unescape a quoted string token the way sexpdata does"""
+    string = token[1:-1]
+    if '\\' not in string:
+        return string
+    chars = []
+    i = 0
+    while i < len(string):
+        if string[i] == '\\' and i + 1 < len(string):
+            chars.append(String.unquote(string[i:i+2]))
+            i += 2
+        else:
+            chars.append(string[i])
+            i += 1
+    return ''.join(chars)
+
+####################################################################################################
+
 class TreeMixin:
 
     ##############################################
@@ -101,6 +137,23 @@ class Node(TreeMixin):
     def __init__(self, path):
         super().__init__()
         self._path = path
+        # child name -> child nodes, None when the tree isn't indexed
+        self._child_index = None
+        # path tuple -> nodes of the whole tree, only set on an indexed root
+        self._path_index = None
+
+    ##############################################
+
+    def index_childs(self):
+        self._child_index = {}
+        for child in self._childs:
+            if isinstance(child, Node):
+                self._child_index.setdefault(child.name, []).append(child)
+
+    def append_child(self, child):
+        super().append_child(child)
+        if self._child_index is not None and isinstance(child, Node):
+            self._child_index.setdefault(child.name, []).append(child)
 
     ##############################################
 
@@ -135,6 +188,29 @@ class Node(TreeMixin):
 
     def xpath(self, path):
 
+        if self._child_index is None:
+            return self._xpath_search(path)
+
+        # indexed tree: walk the child maps (or the root's path index) instead of searching the subtree
+        if path.startswith('/'):
+            parts = path[1:].split('/')
+            if self._path_index is not None:
+                return list(self._path_index.get(tuple(parts), []))
+            nodes = [self] if self.name == parts[0] else []
+            parts = parts[1:]
+        else:
+            nodes = [self]
+            parts = path.split('/')
+
+        for part in parts:
+            nodes = [child for node in nodes for child in node._child_index.get(part, [])]
+
+        return nodes
+
+    ##############################################
+
+    def _xpath_search(self, path):
+
         DEBUG = False
 
         if path.startswith('/'):
@@ -226,13 +302,19 @@ class Objectifier:
 
     ##############################################
 
-    def __init__(self, path):
+    def __init__(self, path, index=True, sections=None):
 
         self._logger.info(f"Load {path}")
         with open(path) as fh:
-            sexpr = sexpdata.load(fh)
+            tokens = sexp_tokens(fh.read(), sections)
+
+        # path tuple -> nodes in document order, filled by _build_tree
+        self._index = index
+        self._path_index = {} if index else None
 
-        self._root = self._walk_sexpr(sexpr)
+        self._root = self._build_tree(tokens)
+        if index:
+            self._root._path_index = self._path_index
 
     ##############################################
 
@@ -279,24 +361,44 @@ class Objectifier:
 
     ##############################################
 
-    def _walk_sexpr(self, sexpr, path=[]):
-        """Perform a depth first search"""
-        if isinstance(sexpr, (str, int, float)):
-            return sexpr
-        elif isinstance(sexpr, Symbol):
-            return sexpr   # ??? .value()
-        elif isinstance(sexpr, list):
-            if isinstance(car(sexpr), int):
-                _car = car(sexpr)
+    def _build_tree(self, tokens):
+        """Build the nodes from the token list with an explicit stack"""
+        roots = []
+        stack = []
+        node = None
+        append = roots.append
+        head = False
+        for token in tokens:
+            c = token[0]
+            if head:
+                # first token of a list names its node
+                head = False
+                if c == '(' or c == ')':
+                    raise ValueError()
+                name = sexpdata_atom(token) if c != '"' else sexpdata_string(token)
+                if not isinstance(name, int):
+                    name = str(name)
+                path = node.path + [name] if node is not None else [name]
+                child = Node(path)
+                if self._index:
+                    self._path_index.setdefault(tuple(path), []).append(child)
+                append(child)
+                stack.append(node)
+                node = child
+                append = node._childs.append
+            elif c == '(':
+                head = True
+            elif c == ')':
+                if self._index:
+                    node.index_childs()
+                node = stack.pop()
+                append = node._childs.append if node is not None else roots.append
+            elif c == '"':
+                append(sexpdata_string(token))
             else:
-                _car = car(sexpr).value()
-            _cdr = cdr(sexpr)
-            path = path.copy()
-            path.append(_car)
-            node = Node(path)
-            for element in _cdr:
-                child = self._walk_sexpr(element, path)
-                node.append_child(child)
-            return node
-        else:
+                append(sexpdata_atom(token))
+
+        if head or stack or len(roots) != 1:
             raise ValueError()
+
+        return roots[0]
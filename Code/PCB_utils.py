@@ -4,13 +4,22 @@
 import cv2
 import numpy as np
 
+import copy
+import hashlib
+
 import os
+import json
+import shutil
 import subprocess
+import tempfile
 
 from svg_edit import svg_to_png_gen
 from Objectifier import Objectifier
+from document_cache import load_document
 
 from identifyHoles import *
+from footprint_cache import file_hash
+from board_raster import rasterize_board, BOARD_PX_PER_MM
 
 def gen_pad_map(contours, ignore_contours =[]):
     """
@@ -37,7 +46,37 @@ def gen_pad_map(contours, ignore_contours =[]):
     return pad_map
 
 
-def connected_pads(pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr = []):
+PAD_FEATURE_DTYPE = np.dtype([('cx', np.float64), ('cy', np.float64), ('area', np.float64), ('x', np.int32), ('y', np.int32), ('w', np.int32), ('h', np.int32), ('aspect', np.float64)])
+
+def gen_pad_features(contours):
+    """
+        Helper function for 'PadIndex'. Generates the pad-feature table of one side of the board.
+
+        Parameters:
+        contours (array): array of the pad contours of solder mask image
+
+        Returns:
+        features (array): numpy array of PAD_FEATURE_DTYPE with one row per pad (by contour ID): centroid (cx, cy), contour area,
+                          bounding box (x, y, w, h, covers every pixel of the filled pad) and aspect (long over short side of the bounding box)
+    """
+    features = np.zeros(len(contours), dtype=PAD_FEATURE_DTYPE)
+
+    for i, cnt in enumerate(contours):
+        M = cv2.moments(cnt)
+        x, y, w, h = cv2.boundingRect(cnt)
+
+        if M['m00'] > 0:
+            features[i]['cx'], features[i]['cy'] = M['m10']/M['m00'], M['m01']/M['m00']
+        else:
+            features[i]['cx'], features[i]['cy'] = x + w/2, y + h/2
+        features[i]['area'] = M['m00']
+        features[i]['x'], features[i]['y'], features[i]['w'], features[i]['h'] = x, y, w, h
+        features[i]['aspect'] = max(w, h) / min(w, h)
+
+    return features
+
+
+def connected_pads(pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr = [], contour_IDs = None):
     """
         Helper function for 'initialize_via_files'. Creates a mapping of all traces and the pads that are connected within the trace.
         Parameters:
@@ -48,6 +87,7 @@ def connected_pads(pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr
 
         Optional:
         hole_arr (array): array of holes (to deal with vias)
+        contour_IDs (array): only map these trace contours (all by default)
         
         Returns:
         traces_map (dict): dict of traces and corresponding pads within the trace.
@@ -56,8 +96,10 @@ def connected_pads(pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr
     traces_map = {}
     rows = trace_hierarchy[0].shape[0]
 
+    if contour_IDs is None:
+        contour_IDs = range(rows)
 
-    for i in range(rows):
+    for i in contour_IDs:
         #if outermost contour - pass
         if trace_hierarchy[0][i][3] == -1:
             continue
@@ -129,6 +171,681 @@ def connected_pads(pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr
     return traces_map
 
 
+class TraceLabels:
+    '''
+        Connected component label images of one copper layer. Every trace contour borders exactly one component,
+        so the component of a pixel gives the innermost trace contour around it without testing the point against every contour.
+
+        Properties include
+        copper (2D array) - 1 on copper pixels
+        copper_labels (2D array) - 4-connected component of each copper pixel (copper regions are holes of the contours), None until needed
+        copper_cnt (array) - trace contour bordering each copper component
+        bg_labels (2D array) - 8-connected component of each other pixel, None until needed
+        bg_cnt (array) - trace contour bordering each of those components
+        depths (array) - depth of each trace contour in trace_hierarchy
+    '''
+    def __init__(self, trace_contours, trace_hierarchy, trace_img):
+        self.trace_contours = trace_contours
+        self.hierarchy = trace_hierarchy[0]
+
+        # contours were found on the non-inverted image: copper (0) regions are holes (4-connected), the rest is 8-connected
+        self.copper = (trace_img == 255).astype(np.uint8)
+
+        depths = []
+        for i in range(len(trace_contours)):
+            depth = 0
+            parent = self.hierarchy[i][3]
+            while parent != -1:
+                depth += 1
+                parent = self.hierarchy[parent][3]
+            depths.append(depth)
+        self.depths = depths
+
+        # each side is only labeled once a point on it needs it
+        self.copper_labels = None
+        self.copper_cnt = None
+        self.bg_labels = None
+        self.bg_cnt = None
+
+    def copper_labels_of(self):
+        if self.copper_labels is None:
+            num_copper, self.copper_labels = cv2.connectedComponents(self.copper, connectivity=4)
+
+            # every contour borders exactly one component
+            # hole contours start just left of a pixel of their (copper) component, outer contours start on a pixel of theirs
+            self.copper_cnt = np.full(num_copper, -1)
+            for i in range(len(self.trace_contours)):
+                if self.depths[i] % 2 == 1:
+                    (x, y) = self.trace_contours[i][0][0]
+                    self.copper_cnt[self.copper_labels[y, x + 1]] = i
+
+        return self.copper_labels, self.copper_cnt
+
+    def background_labels(self):
+        if self.bg_labels is None:
+            num_bg, self.bg_labels = cv2.connectedComponents(1 - self.copper, connectivity=8)
+            self.bg_cnt = np.full(num_bg, -1)
+            for i in range(len(self.trace_contours)):
+                if self.depths[i] % 2 == 0:
+                    (x, y) = self.trace_contours[i][0][0]
+                    self.bg_cnt[self.bg_labels[y, x]] = i
+
+        return self.bg_labels, self.bg_cnt
+
+    def contours_at(self, points):
+        '''
+            Parameters:
+            points (array) - x,y pixel coordinates
+
+            Returns:
+            (array) for each point, the trace contour bordering the component of its pixel (-1 outside the image)
+        '''
+        points = np.asarray(points, dtype=int).reshape(-1, 2)
+        xs, ys = points[:, 0], points[:, 1]
+        in_image = (xs >= 0) & (ys >= 0) & (ys < self.copper.shape[0]) & (xs < self.copper.shape[1])
+        xs, ys = xs[in_image], ys[in_image]
+
+        on_copper = self.copper[ys, xs] == 1
+        cnts = np.full(len(xs), -1)
+        if on_copper.any():
+            copper_labels, copper_cnt = self.copper_labels_of()
+            cnts[on_copper] = copper_cnt[copper_labels[ys[on_copper], xs[on_copper]]]
+        if not on_copper.all():
+            bg_labels, bg_cnt = self.background_labels()
+            cnts[~on_copper] = bg_cnt[bg_labels[ys[~on_copper], xs[~on_copper]]]
+
+        contours = np.full(len(points), -1)
+        contours[in_image] = cnts
+
+        return contours
+
+    def innermost(self, point, k=None):
+        '''
+            Parameters:
+            point (tuple) - x,y pixel coordinates
+
+            Optional:
+            k (int) - contour bordering the component of point (see 'contours_at')
+
+            Returns:
+            (int) innermost trace contour point is strictly inside of (same as cv2.pointPolygonTest(cnt, point, False) == 1), -1 if none
+        '''
+        if k is None:
+            k = int(self.contours_at([point])[0])
+
+        # the pixel can be on the contour itself
+        while k != -1 and cv2.pointPolygonTest(self.trace_contours[k], point, False) != 1:
+            k = int(self.hierarchy[k][3])
+
+        return k
+
+    def containing(self, points):
+        '''
+            Parameters:
+            points (array) - x,y pixel coordinates
+
+            Returns:
+            (array) for each point, the set of trace contours the point is strictly inside of
+        '''
+        contours = []
+        for point, k in zip(points, self.contours_at(points).tolist()):
+            point = (int(point[0]), int(point[1]))
+            k = self.innermost(point, k)
+
+            within = set()
+            while k != -1:
+                if k not in within and cv2.pointPolygonTest(self.trace_contours[k], point, False) == 1:
+                    within.add(k)
+                k = int(self.hierarchy[k][3])
+            contours.append(within)
+
+        return contours
+
+
+def connected_pads_labeled(pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr = []):
+    """
+        Same result as 'connected_pads' but each pad center is looked up in connected component label images of the copper layer (see TraceLabels)
+        instead of being tested against every trace contour and its holes.
+        Parameters:
+        pad_map (dict): dict of pads and corresponding center coordinates.
+        trace_contours (array): all contours of traces in full PCB image
+        trace_hierarchy (array): hierarchical information about trace contours
+        trace_img (2D array): image of full PCB with traces (inverted)
+
+        Optional:
+        hole_arr (array): array of holes (to deal with vias)
+
+        Returns:
+        traces_map (dict): dict of traces and corresponding pads within the trace.
+
+    """
+    hierarchy = trace_hierarchy[0]
+    labels = TraceLabels(trace_contours, trace_hierarchy, trace_img)
+
+    is_empty = {}
+    contains_th = {}
+
+    pads_per_trace = {}
+    def add_pad(trace, pad):
+        if trace in pads_per_trace:
+            pads_per_trace[trace].append(pad)
+        else:
+            pads_per_trace[trace] = [pad]
+
+    for pad, pad_center in pad_map.items():
+        (cx, cy) = pad_center
+        if cx < 0 or cy < 0 or cy >= labels.copper.shape[0] or cx >= labels.copper.shape[1]:
+            continue
+
+        # innermost contour the center is strictly inside of
+        k = labels.innermost(pad_center)
+
+        if k == -1 or hierarchy[k][3] == -1:
+            continue
+
+        if hierarchy[k][2] != -1:
+            add_pad(k, pad)
+        else:
+            if k not in is_empty:
+                is_empty[k] = contour_is_empty(trace_contours[k], trace_img)
+            if is_empty[k] != 1:
+                add_pad(k, pad)
+
+            # an empty hole with a through hole/via still connects the pad to the surrounding trace
+            parent = int(hierarchy[k][3])
+            if len(hole_arr) > 0 and hierarchy[parent][3] != -1:
+                if k not in contains_th:
+                    contains_th[k] = contour_contains_throughhole(trace_contours[k], hole_arr)
+                if contains_th[k]:
+                    add_pad(parent, pad)
+
+    # same ordering as 'connected_pads' (by trace, then by pad)
+    traces_map = {}
+    for trace in sorted(pads_per_trace.keys()):
+        traces_map[trace] = pads_per_trace[trace]
+
+    return traces_map
+
+# backends for building the pad to trace maps of PCB_Board
+TRACE_BACKENDS = {'contours': connected_pads, 'labels': connected_pads_labeled}
+
+
+def classify_holes(hole_arr, mask_rgb, trace_contours, trace_hierarchy, trace_img):
+    """
+        Helper function for 'create_vias_profile'. Marks each hole as a via (in a solder mask opening or not), through hole or drill hole
+        and maps the vias & through holes to the front trace contours containing them, testing every hole against every trace contour.
+        Parameters:
+        hole_arr (array): all holes found on board (coordinates in pixels)
+        mask_rgb (2D array): front solder mask image
+        trace_contours (array): all contours of traces in full PCB image
+        trace_hierarchy (array): hierarchical information about trace contours
+        trace_img (2D array): image of full PCB with traces (inverted, unused)
+
+        Returns:
+        vias_dict (dict): front trace contour ID to {'holes': [holes]}
+    """
+    rows = trace_hierarchy[0].shape[0]
+
+    vias_dict = {}
+
+    for hole in hole_arr:
+        (x,y) = hole.coordinates
+        mask_val = mask_rgb[y][x]
+
+        
+        
+        if list(mask_val) == [255, 255, 255]:
+            hole.isVia = True
+
+
+            for i in range(rows):
+                if trace_hierarchy[0][i][3] == -1:
+                    continue
+
+                if trace_hierarchy[0][i][2] != -1:
+                    inner_cnt_ID = trace_hierarchy[0][i][2]
+                    
+                    if trace_hierarchy[0][inner_cnt_ID][2] == -1:
+                        within_trace = cv2.pointPolygonTest(trace_contours[i], (x,y), False)
+                        if within_trace == 1:
+                            found_via = False
+
+                            within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], (x,y), False)
+
+                            if within_trace == 1:
+                                
+                                found_via = True
+                                if i in vias_dict.keys():
+                                    vias_dict[i]['holes'].append(hole)
+                                else:
+                                    vias_dict[i] = {'holes': [hole]}
+
+                            if not found_via:
+                                while not found_via and trace_hierarchy[0][inner_cnt_ID][0] != -1:
+                                    inner_cnt_ID = trace_hierarchy[0][inner_cnt_ID][0]
+
+                                    if trace_hierarchy[0][inner_cnt_ID][2] == -1:
+                                        within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], (x,y), False)
+
+                                        if within_trace == 1:
+                                            
+                                            if i in vias_dict.keys():
+                                                vias_dict[i]['holes'].append(hole)
+                                            else:
+                                                vias_dict[i] = {'holes': [hole]}
+                                            found_via = True
+
+
+        else:
+            hole.isVia = False
+
+            for i in range(rows):
+                if trace_hierarchy[0][i][3] == -1:
+                    inner_cnt_ID = trace_hierarchy[0][i][2]
+                    within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], (x,y), False)
+                    
+                    if within_trace == 1:
+                        hole.isThroughHole = True
+
+                    while trace_hierarchy[0][inner_cnt_ID][0] != -1:
+                        inner_cnt_ID = trace_hierarchy[0][inner_cnt_ID][0]
+                        
+                        within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], (x,y), False)
+                        if within_trace == 1:
+                            hole.isThroughHole = True
+                            if inner_cnt_ID in vias_dict.keys():
+                                vias_dict[inner_cnt_ID]['holes'].append(hole)
+                            else:
+                                vias_dict[inner_cnt_ID] = {'holes': [hole]}
+                            break
+
+                    if not hasattr(hole, 'isThroughHole') or not hole.isThroughHole:
+                        hole.isDrillHole = True
+                    continue
+
+                if trace_hierarchy[0][i][2] != -1:
+                    if trace_hierarchy[0][i][3] != 0:
+                        inner_cnt_ID = trace_hierarchy[0][i][2]
+                        within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], (x,y), False)
+                        if within_trace == 1:
+                            hole.isThroughHole = True
+                            if i in vias_dict.keys():
+                                vias_dict[i]['holes'].append(hole)
+                            else:
+                                vias_dict[i] = {'holes': [hole]}
+
+                        while trace_hierarchy[0][inner_cnt_ID][0] != -1:
+                            inner_cnt_ID = trace_hierarchy[0][inner_cnt_ID][0]
+                            within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], (x,y), False)
+                            if within_trace == 1:
+                                hole.isThroughHole = True
+                                if i in vias_dict.keys():
+                                    vias_dict[i]['holes'].append(hole)
+                                else:
+                                    vias_dict[i] = {'holes': [hole]}
+                                break
+
+                        
+
+                        if not hasattr(hole, 'isThroughHole') or not hole.isThroughHole:
+                            hole.isDrillHole = True
+                    
+            if not hasattr(hole, 'isThroughHole') or not hole.isThroughHole:
+                hole.isDrillHole = True
+            else:
+                #add this through hole to the via dict
+                for i in range(rows):
+                    if trace_hierarchy[0][i][3] == -1:
+                        continue
+
+                    if trace_hierarchy[0][i][2] != -1:
+                        inner_cnt_ID = trace_hierarchy[0][i][2]
+                        
+                        if trace_hierarchy[0][inner_cnt_ID][2] == -1:
+                            within_trace = cv2.pointPolygonTest(trace_contours[i], (x,y), False)
+                            if within_trace == 1:
+
+                                if i in vias_dict.keys():
+
+                                    if hole not in vias_dict[i]['holes']:
+                                        vias_dict[i]['holes'].append(hole)
+
+                                    
+                                else:
+                                    vias_dict[i] = {'holes': [hole]}
+
+    return vias_dict
+
+
+def map_vias(hole_arr, trace_contours, trace_hierarchy, trace_img):
+    """
+        Helper function for 'create_vias_maps'. Maps the vias & through holes (already classified by 'classify_holes') to the front trace contours containing them.
+        Parameters:
+        hole_arr (array): all holes found on board (coordinates in pixels)
+        trace_contours (array): all contours of traces in full PCB image
+        trace_hierarchy (array): hierarchical information about trace contours
+        trace_img (2D array): image of full PCB with traces (inverted, unused)
+
+        Returns:
+        vias_dict (dict): front trace contour ID to {'holes': [holes]}
+    """
+    rows = trace_hierarchy[0].shape[0]
+
+    vias_dict = {}
+
+    for hole in hole_arr:
+        if hole.isVia:
+            for i in range(rows):
+                if trace_hierarchy[0][i][3] == -1:
+                    continue
+
+                if trace_hierarchy[0][i][2] != -1:
+                    inner_cnt_ID = trace_hierarchy[0][i][2]
+                    
+                    if trace_hierarchy[0][inner_cnt_ID][2] == -1:
+                        within_trace = cv2.pointPolygonTest(trace_contours[i], hole.coordinates, False)
+                        if within_trace == 1:
+                            found_via = False
+
+                            within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], hole.coordinates, False)
+
+                            if within_trace == 1:
+                                
+                                found_via = True
+                                if i in vias_dict.keys():
+                                    vias_dict[i]['holes'].append(hole)
+                                else:
+                                    vias_dict[i] = {'holes': [hole]}
+
+                            if not found_via:
+                                while not found_via and trace_hierarchy[0][inner_cnt_ID][0] != -1:
+                                    inner_cnt_ID = trace_hierarchy[0][inner_cnt_ID][0]
+
+                                    if trace_hierarchy[0][inner_cnt_ID][2] == -1:
+                                        within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], hole.coordinates, False)
+
+                                        if within_trace == 1:
+                                            
+                                            if i in vias_dict.keys():
+                                                vias_dict[i]['holes'].append(hole)
+                                            else:
+                                                vias_dict[i] = {'holes': [hole]}
+                                                found_via = True
+        elif hasattr(hole, 'isThroughHole') and hole.isThroughHole:
+            for i in range(rows):
+                if trace_hierarchy[0][i][3] == -1:
+                    continue
+
+                if trace_hierarchy[0][i][2] != -1:
+                    inner_cnt_ID = trace_hierarchy[0][i][2]
+
+                    if trace_hierarchy[0][inner_cnt_ID][2] == -1:
+                        within_trace = cv2.pointPolygonTest(trace_contours[i], hole.coordinates, False)
+                        if within_trace == 1:
+                            found_th = False
+
+                            within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], hole.coordinates, False)
+
+                            if within_trace == 1:
+
+                                found_th = True
+
+                                if i in vias_dict.keys():
+                                    vias_dict[i]['holes'].append(hole)
+                                else:
+                                    vias_dict[i] = {'holes': [hole]}
+                            
+                            if not found_th:
+                                while not found_th and trace_hierarchy[0][inner_cnt_ID][0] != -1:
+                                    inner_cnt_ID = trace_hierarchy[0][inner_cnt_ID][0]
+
+                                    if trace_hierarchy[0][inner_cnt_ID][2] == -1:
+                                        within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], hole.coordinates, False)
+
+                                        if within_trace == 1:
+                                            
+                                            if i in vias_dict.keys():
+                                                vias_dict[i]['holes'].append(hole)
+                                            else:
+                                                vias_dict[i] = {'holes': [hole]}
+                                                found_th = True
+
+    return vias_dict
+
+
+def map_back_traces(vias_dict, trace_contours, trace_hierarchy, trace_img):
+    """
+        Helper function for 'create_vias_profile' and 'create_vias_maps'. Maps the back trace contours to the front traces they connect to through the holes of vias_dict.
+        Parameters:
+        vias_dict (dict): front trace contour ID to {'holes': [holes]}
+        trace_contours (array): all contours of the back traces
+        trace_hierarchy (array): hierarchical information about the back trace contours
+        trace_img (2D array): image of the back traces (inverted, unused)
+
+        Returns:
+        connected_traces_back_dict (dict): back trace contour ID to front trace contour IDs (once per shared hole)
+    """
+    connected_traces_back_dict = {}
+
+    for trace_fID in vias_dict.keys():
+        holes = vias_dict[trace_fID]['holes']
+
+        rows = trace_hierarchy[0].shape[0]
+        for hole in holes:
+            
+            for i in range(rows):
+                if trace_hierarchy[0][i][3] == -1:
+                    continue
+
+                if trace_hierarchy[0][i][2] != -1:
+                    inner_cnt_ID = trace_hierarchy[0][i][2]
+
+                    found_via = False
+                    
+                    while trace_hierarchy[0][inner_cnt_ID][0] != -1:
+                        if trace_hierarchy[0][inner_cnt_ID][2] == -1:
+                            within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], hole.coordinates, False)
+                            if within_trace == 1:
+                                found_via = True
+                                
+                                if i in connected_traces_back_dict.keys():
+
+                                    connected_traces_back_dict[i].append(trace_fID)
+                                else:
+                                    connected_traces_back_dict[i] = [trace_fID]
+
+                                break
+                        inner_cnt_ID = trace_hierarchy[0][inner_cnt_ID][0]
+
+
+                    if not found_via:
+                        #check last one
+                        if trace_hierarchy[0][inner_cnt_ID][2] == -1:
+                            within_trace = cv2.pointPolygonTest(trace_contours[inner_cnt_ID], hole.coordinates, False)
+                            if within_trace == 1:
+                                found_via = True
+                                
+                                if i in connected_traces_back_dict.keys():
+
+                                    connected_traces_back_dict[i].append(trace_fID)
+                                else:
+                                    connected_traces_back_dict[i] = [trace_fID]
+
+    return connected_traces_back_dict
+
+
+def empty_inner_contour(hierarchy, within, i):
+    """
+        Returns:
+        (bool) True if some inner contour of trace contour i the via rule checks (its first inner contour, or later ones without children) is in within
+    """
+    first_inner = hierarchy[i][2]
+    for inner_cnt in within:
+        if hierarchy[inner_cnt][3] == i and (inner_cnt == first_inner or hierarchy[inner_cnt][2] == -1):
+            return True
+
+    return False
+
+
+def via_traces(hierarchy, within):
+    """
+        Returns:
+        (array) trace contours (ascending) a via / through hole strictly inside the contours of within belongs to:
+        the hole is inside the trace contour and inside one of its empty inner contours, and the first inner contour of the trace is empty
+    """
+    traces = []
+    for i in sorted(within):
+        if hierarchy[i][3] == -1 or hierarchy[i][2] == -1 or hierarchy[hierarchy[i][2]][2] != -1:
+            continue
+        if empty_inner_contour(hierarchy, within, i):
+            traces.append(i)
+
+    return traces
+
+
+def classify_holes_labeled(hole_arr, mask_rgb, trace_contours, trace_hierarchy, trace_img):
+    """
+        Same result as 'classify_holes' (same vias_dict and hole flags), but the trace contours around each hole are looked up
+        in the label images of TraceLabels in one pass instead of testing every hole against every trace contour.
+        Parameters:
+        hole_arr (array): all holes found on board (coordinates in pixels)
+        mask_rgb (2D array): front solder mask image
+        trace_contours (array): all contours of traces in full PCB image
+        trace_hierarchy (array): hierarchical information about trace contours
+        trace_img (2D array): image of full PCB with traces (inverted)
+
+        Returns:
+        vias_dict (dict): front trace contour ID to {'holes': [holes]}
+    """
+    hierarchy = trace_hierarchy[0]
+    rows = hierarchy.shape[0]
+
+    labels = TraceLabels(trace_contours, trace_hierarchy, trace_img)
+    holes_within = labels.containing([hole.coordinates for hole in hole_arr])
+
+    # trace contours 'classify_holes' checks the inner contours of for holes outside the mask openings (in order):
+    # outermost contours, where a hole in a later inner contour is added to that inner contour,
+    # and contours with inner contours that are not inside contour 0, where a hole in any inner contour is added to the contour
+    checked = [i for i in range(rows) if hierarchy[i][3] == -1 or (hierarchy[i][2] != -1 and hierarchy[i][3] != 0)]
+    inner_cnts = {}
+    inner_of = {}
+    for i in checked:
+        # (an outermost contour without inner contours starts from the last contour, as the index -1 does in 'classify_holes')
+        inner_cnt = hierarchy[i][2] if hierarchy[i][2] != -1 else rows - 1
+        inner_cnts[i] = {}
+        while inner_cnt != -1:
+            inner_cnts[i][inner_cnt] = len(inner_cnts[i])
+            inner_of.setdefault(inner_cnt, []).append(i)
+            inner_cnt = hierarchy[inner_cnt][0]
+
+    vias_dict = {}
+    def add_hole(trace, hole):
+        if trace in vias_dict.keys():
+            vias_dict[trace]['holes'].append(hole)
+        else:
+            vias_dict[trace] = {'holes': [hole]}
+
+    for hole, within in zip(hole_arr, holes_within):
+        (x,y) = hole.coordinates
+        mask_val = mask_rgb[y][x]
+
+        if list(mask_val) == [255, 255, 255]:
+            hole.isVia = True
+
+            for i in via_traces(hierarchy, within):
+                add_hole(i, hole)
+            continue
+
+        hole.isVia = False
+        is_th = hasattr(hole, 'isThroughHole') and hole.isThroughHole
+
+        found = sorted(set(i for inner_cnt in within for i in inner_of.get(inner_cnt, [])))
+        # the drill hole flag is set once the first checked contour is done without the hole being a through hole
+        if len(checked) > 0 and not is_th and (len(found) == 0 or found[0] != checked[0]):
+            hole.isDrillHole = True
+
+        for i in found:
+            found_inner = sorted((inner_cnts[i][inner_cnt], inner_cnt) for inner_cnt in within if inner_cnt in inner_cnts[i])
+            is_th = True
+            if found_inner[0][0] == 0 and hierarchy[i][3] != -1:
+                add_hole(i, hole)
+
+            later_inner = [inner_cnt for position, inner_cnt in found_inner if position > 0]
+            if len(later_inner) > 0:
+                add_hole(later_inner[0] if hierarchy[i][3] == -1 else i, hole)
+
+        if is_th:
+            hole.isThroughHole = True
+
+            #add this through hole to the via dict
+            for i in sorted(within):
+                if hierarchy[i][3] == -1 or hierarchy[i][2] == -1 or hierarchy[hierarchy[i][2]][2] != -1:
+                    continue
+                if i not in vias_dict.keys():
+                    vias_dict[i] = {'holes': [hole]}
+                elif hole not in vias_dict[i]['holes']:
+                    vias_dict[i]['holes'].append(hole)
+        else:
+            hole.isDrillHole = True
+
+    return vias_dict
+
+
+def map_vias_labeled(hole_arr, trace_contours, trace_hierarchy, trace_img):
+    """
+        Same result as 'map_vias', with the trace contours around each hole looked up in the label images of TraceLabels.
+    """
+    hierarchy = trace_hierarchy[0]
+
+    holes = [hole for hole in hole_arr if hole.isVia or (hasattr(hole, 'isThroughHole') and hole.isThroughHole)]
+    labels = TraceLabels(trace_contours, trace_hierarchy, trace_img)
+
+    vias_dict = {}
+    for hole, within in zip(holes, labels.containing([hole.coordinates for hole in holes])):
+        for i in via_traces(hierarchy, within):
+            if i in vias_dict.keys():
+                vias_dict[i]['holes'].append(hole)
+            else:
+                vias_dict[i] = {'holes': [hole]}
+
+    return vias_dict
+
+
+def map_back_traces_labeled(vias_dict, trace_contours, trace_hierarchy, trace_img):
+    """
+        Same result as 'map_back_traces', with the back trace contours around each hole looked up in the label images of TraceLabels.
+    """
+    hierarchy = trace_hierarchy[0]
+
+    holes = {}
+    for trace_fID in vias_dict.keys():
+        for hole in vias_dict[trace_fID]['holes']:
+            holes[id(hole)] = hole
+    holes = list(holes.values())
+
+    labels = TraceLabels(trace_contours, trace_hierarchy, trace_img)
+
+    # a hole connects the back trace contours (not outermost) it lies in an empty inner contour of
+    hole_back_traces = {}
+    for hole, within in zip(holes, labels.containing([hole.coordinates for hole in holes])):
+        hole_back_traces[id(hole)] = sorted(set(int(hierarchy[inner_cnt][3]) for inner_cnt in within if hierarchy[inner_cnt][2] == -1 and hierarchy[inner_cnt][3] != -1 and hierarchy[hierarchy[inner_cnt][3]][3] != -1))
+
+    connected_traces_back_dict = {}
+    for trace_fID in vias_dict.keys():
+        for hole in vias_dict[trace_fID]['holes']:
+            for i in hole_back_traces[id(hole)]:
+                if i in connected_traces_back_dict.keys():
+                    connected_traces_back_dict[i].append(trace_fID)
+                else:
+                    connected_traces_back_dict[i] = [trace_fID]
+
+    return connected_traces_back_dict
+
+# backends for classifying the holes of double sided boards and mapping them to the trace contours of PCB_Board
+HOLE_BACKENDS = {'contours': {'classify': classify_holes, 'vias': map_vias, 'back': map_back_traces},
+                 'labels': {'classify': classify_holes_labeled, 'vias': map_vias_labeled, 'back': map_back_traces_labeled}}
+
+
 def contour_is_empty(contour, trace_img):
     """
         Helper function for 'connected_pads'. Checks to make sure contour is empty (there are no additional features to account for).
@@ -146,9 +863,11 @@ def contour_is_empty(contour, trace_img):
     cx = int(M['m10']/M['m00'])
     cy = int(M['m01']/M['m00'])
 
-    mask = np.zeros(trace_img.shape,np.uint8)
-    cv2.drawContours(mask,[contour],0,255,-1)
-    mean_val = cv2.mean(trace_img,mask = mask)
+    # only the bounding rect of the contour can be inside the mask
+    x, y, w, h = cv2.boundingRect(contour)
+    mask = np.zeros((h, w),np.uint8)
+    cv2.drawContours(mask,[contour],0,255,-1, offset=(-x, -y))
+    mean_val = cv2.mean(trace_img[y:y+h, x:x+w],mask = mask)
 
     is_empty = (mean_val[0] <= 100)
 
@@ -187,6 +906,367 @@ def contour_contains_throughhole(contour, hole_arr):
 
     return contains_th
 
+def contour_key(trace_contours, trace_hierarchy, i):
+    """
+        Helper function for 'ContourProfileCache'. Key of a trace contour that changes whenever anything its profile depends on changes
+        (its points, if it is outermost, the points of its inner contours and if those have inner contours themselves).
+        Parameters:
+        trace_contours (array): all contours of traces in full PCB image
+        trace_hierarchy (array): hierarchical information about trace contours
+        i (int): ID of the trace contour
+
+        Returns:
+        (str): key of the contour
+    """
+    hierarchy = trace_hierarchy[0]
+
+    sha = hashlib.sha1(str((len(trace_contours[i]), hierarchy[i][3] == -1)).encode())
+    sha.update(trace_contours[i].tobytes())
+
+    inner_cnt = hierarchy[i][2]
+    while inner_cnt != -1:
+        sha.update(str((len(trace_contours[inner_cnt]), hierarchy[inner_cnt][2] == -1)).encode())
+        sha.update(trace_contours[inner_cnt].tobytes())
+        inner_cnt = hierarchy[inner_cnt][0]
+
+    return sha.hexdigest()
+
+
+def contour_holes(trace_contours, trace_hierarchy, i, hole_arr, hole_IDs, within_contour=False):
+    """
+        Helper function for 'ContourProfileCache'. Finds the holes that lie within an empty inner contour (no children) of a trace contour,
+        as done per trace contour by the via mapping of 'create_updated_vias_profile'.
+        Parameters:
+        trace_contours (array): all contours of traces in full PCB image
+        trace_hierarchy (array): hierarchical information about trace contours
+        i (int): ID of the trace contour
+        hole_arr (array): all holes found on board
+        hole_IDs (array): indices of the holes in hole_arr to check
+
+        Optional:
+        within_contour (boolean): front side rule, the hole must also be within the trace contour and the first inner contour must be empty
+
+        Returns:
+        holes (array): indices of the holes found (in hole_IDs order)
+    """
+    hierarchy = trace_hierarchy[0]
+    if hierarchy[i][3] == -1 or hierarchy[i][2] == -1:
+        return []
+
+    if within_contour and hierarchy[hierarchy[i][2]][2] != -1:
+        return []
+
+    empty_inner_cnts = []
+    inner_cnt = hierarchy[i][2]
+    while inner_cnt != -1:
+        if hierarchy[inner_cnt][2] == -1:
+            empty_inner_cnts.append(inner_cnt)
+        inner_cnt = hierarchy[inner_cnt][0]
+
+    # the inner contours lie within the bounding rect of the trace contour
+    x, y, w, h = cv2.boundingRect(trace_contours[i])
+
+    holes = []
+    for hole_ID in hole_IDs:
+        (hx, hy) = hole_arr[hole_ID].coordinates
+        if hx < x or hy < y or hx >= x + w or hy >= y + h:
+            continue
+
+        if within_contour and cv2.pointPolygonTest(trace_contours[i], hole_arr[hole_ID].coordinates, False) != 1:
+            continue
+
+        for inner_cnt in empty_inner_cnts:
+            if cv2.pointPolygonTest(trace_contours[inner_cnt], hole_arr[hole_ID].coordinates, False) == 1:
+                holes.append(hole_ID)
+                break
+
+    return holes
+
+
+class ContourProfileCache:
+    '''
+        Per trace contour results of a board profile (pads connected within the trace, holes within its empty inner contours), keyed by 'contour_key'.
+        After trace cuts only the trace contours the cuts changed have to be processed again, the rest reuse their results.
+
+        Properties include
+        entries (dict) - 'front'/'back' dicts of contour key to {'pads': [...], 'holes': [...]} (each filled when first needed)
+        base_keys (dict) - 'front'/'back' sets of the contour keys of the last full profile (always kept by 'prune')
+    '''
+    def __init__(self):
+        self.entries = {'front': {}, 'back': {}}
+        self.base_keys = {'front': set(), 'back': set()}
+        self.current_keys = {}
+
+    def keys(self, fb, trace_contours, trace_hierarchy):
+        '''
+            Returns:
+            (array) contour key of each trace contour (computed once per set of contours)
+        '''
+        if fb not in self.current_keys or self.current_keys[fb][0] is not trace_contours:
+            keys = [contour_key(trace_contours, trace_hierarchy, i) for i in range(len(trace_contours))]
+            self.current_keys[fb] = (trace_contours, keys)
+
+        return self.current_keys[fb][1]
+
+    def set_base(self, fb, trace_contours, trace_hierarchy, trace_map):
+        '''
+            replaces the entries of one side with the trace map of a full profile
+        '''
+        keys = self.keys(fb, trace_contours, trace_hierarchy)
+
+        self.entries[fb] = {}
+        for i, key in enumerate(keys):
+            self.entries[fb][key] = {'pads': list(trace_map.get(i, []))}
+        self.base_keys[fb] = set(keys)
+
+    def trace_map(self, fb, pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr = []):
+        '''
+            Returns:
+            traces_map (dict) - same as 'connected_pads', only trace contours without an entry are processed
+        '''
+        keys = self.keys(fb, trace_contours, trace_hierarchy)
+        entries = self.entries[fb]
+
+        new_IDs = [i for i, key in enumerate(keys) if 'pads' not in entries.get(key, {})]
+        new_map = connected_pads(pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr = hole_arr, contour_IDs = new_IDs)
+        for i in new_IDs:
+            entries.setdefault(keys[i], {})['pads'] = new_map.get(i, [])
+
+        traces_map = {}
+        for i, key in enumerate(keys):
+            if len(entries[key]['pads']) > 0:
+                traces_map[i] = list(entries[key]['pads'])
+
+        return traces_map
+
+    def holes(self, fb, trace_contours, trace_hierarchy, hole_arr, hole_IDs):
+        '''
+            Returns:
+            (array) for each trace contour, the indices of the holes found by 'contour_holes' (front side rule on the front)
+        '''
+        keys = self.keys(fb, trace_contours, trace_hierarchy)
+        entries = self.entries[fb]
+
+        contours_holes = []
+        for i, key in enumerate(keys):
+            entry = entries.setdefault(key, {})
+            if 'holes' not in entry:
+                entry['holes'] = contour_holes(trace_contours, trace_hierarchy, i, hole_arr, hole_IDs, within_contour = (fb == 'front'))
+            contours_holes.append(entry['holes'])
+
+        return contours_holes
+
+    def prune(self):
+        '''
+            drops the entries that are neither in the last full profile nor in the current one
+        '''
+        for fb, entries in self.entries.items():
+            keep = set(self.base_keys[fb])
+            if fb in self.current_keys:
+                keep.update(self.current_keys[fb][1])
+            self.entries[fb] = {key: entry for key, entry in entries.items() if key in keep}
+
+
+def gen_center_ID_map(pad_map):
+    '''
+        Reverse of pad_map (pad center to pad IDs)
+
+        Parameters:
+        pad_map (dict): dict of pads and corresponding center coordinates.
+
+        Returns:
+        center_IDs (dict): dict of pad centers and the pad IDs (in pad_map order) with that center
+    '''
+    center_IDs = {}
+    for pad_ID, center in pad_map.items():
+        center_IDs.setdefault(center, []).append(pad_ID)
+
+    return center_IDs
+
+class PadIndex:
+    '''
+        Lookup structure for the pads of one side of the board.
+        labels is a raster where each pixel strictly inside a pad holds that pad's ID (-1 elsewhere, including pad outlines), 
+        so a point lookup gives the same answer as cv2.pointPolygonTest(pad_cnt, point, False) == 1 over all pads.
+
+        Properties include
+        pad_contours (array) - contours of the pads in the solder mask image
+        pad_map (dict) - each pad with corresponding pad center
+        pad_centers (dict) - center of each of pad_contours
+        labels (2D array) - pad ID of each pixel
+        center_IDs (dict) - pad center to pad IDs
+        features (array) - pad-feature table (see gen_pad_features)
+    '''
+    def __init__(self, pad_contours, shape, pad_map):
+        self.pad_contours = pad_contours
+        self.pad_map = pad_map
+        self.pad_centers = gen_pad_map(pad_contours)
+        self.features = gen_pad_features(pad_contours)
+
+        self.labels = np.full(shape[:2], -1, np.int32)
+        for i in range(len(pad_contours)):
+            cv2.drawContours(self.labels, pad_contours, i, i, -1)
+        # contour pixels are on the pad edge (not inside for pointPolygonTest)
+        cv2.drawContours(self.labels, pad_contours, -1, -1, 1)
+
+        self.center_IDs = gen_center_ID_map(pad_map)
+
+    def pad_at(self, point):
+        '''
+            Parameters:
+            point (tuple) - x,y coordinates on the board image
+
+            Returns:
+            (int) ID of the pad containing point, -1 if none
+        '''
+        (x, y) = point
+        if y < 0 or x < 0 or y >= self.labels.shape[0] or x >= self.labels.shape[1]:
+            return -1
+
+        return int(self.labels[y, x])
+
+    def for_pad_map(self, pad_map):
+        '''
+            Returns:
+            (PadIndex) index sharing this pad raster but using a different pad_map
+        '''
+        pad_index = copy.copy(self)
+        pad_index.pad_map = pad_map
+        pad_index.center_IDs = gen_center_ID_map(pad_map)
+
+        return pad_index
+
+    def IDs_at_center(self, center):
+        '''
+            Returns:
+            (array) pad IDs with center as their center
+        '''
+        return self.center_IDs.get(center, [])
+
+
+class PadTraceIndex:
+    '''
+        Reverse index of a board_connections_dict (pad to the connections it belongs to).
+
+        Properties include
+        board_connections_dict (dict) - the connections this index was built from
+        pad_traces (dict) - 'front'/'back' dicts of pad ID to connection IDs containing the pad (in board_connections_dict order)
+        trace_pads (dict) - connection ID to 'front'/'back' sets of its pads
+    '''
+    def __init__(self, board_connections_dict):
+        self.board_connections_dict = board_connections_dict
+        self.pad_traces = {'front': {}, 'back': {}}
+        self.trace_pads = {}
+
+        for trace_ID, trace_info in board_connections_dict.items():
+            self.trace_pads[trace_ID] = {}
+            for fb in ['front', 'back']:
+                pads = set(trace_info[fb + ' pads'])
+                self.trace_pads[trace_ID][fb] = pads
+                for pad in pads:
+                    self.pad_traces[fb].setdefault(pad, []).append(trace_ID)
+
+    def traces_of_pad(self, pad, fb='front'):
+        '''
+            Returns:
+            (array) IDs of the connections that include pad
+        '''
+        return self.pad_traces[fb].get(pad, [])
+
+    def has_pad(self, trace_ID, pad, fb='front'):
+        '''
+            Returns:
+            (bool) if connection trace_ID includes pad
+        '''
+        return pad in self.trace_pads[trace_ID][fb]
+
+
+class BoardSnapshot:
+    '''
+        Trace state of a PCB_Board at one point of the intervention search (see 'integrate_trace_cuts', 'revert', 'revert_original').
+        Only references are kept: trace images are never modified in place (a trace cut draws on a new copy of the layer it cuts), so
+        snapshots and board copies share every layer that has not been cut since.
+
+        Properties include
+        state (dict) - attribute name to value for each attribute in BoardSnapshot.attributes the board has
+    '''
+    attributes = ['pcb_rgb', 'trace_contours', 'trace_hierarchy', 'front_pad_map', 'board_connections_dict',
+                  'pcb_rgb_back', 'trace_back_contours', 'trace_back_hierarchy', 'back_pad_map']
+
+    def __init__(self, pcb_board):
+        self.state = {}
+        for attr in self.attributes:
+            if hasattr(pcb_board, attr):
+                self.state[attr] = getattr(pcb_board, attr)
+
+    def restore(self, pcb_board):
+        for attr, val in self.state.items():
+            setattr(pcb_board, attr, val)
+
+
+def draw_trace_cuts(pcb_rgb, trace_cut_cnts):
+    """
+        Removes the copper under trace cuts from a trace image
+        Parameters:
+        pcb_rgb (image): trace image (not modified)
+        trace_cut_cnts (array): contours of the trace cuts
+
+        Returns:
+        (image): new trace image, pcb_rgb itself if there are no cuts
+    """
+    if len(trace_cut_cnts) == 0:
+        return pcb_rgb
+
+    new_pcb_rgb = pcb_rgb.copy()
+    for trace_cut_cnt in trace_cut_cnts:
+        cv2.drawContours(new_pcb_rgb, [trace_cut_cnt], 0, (255, 255, 255), -1)
+
+    return new_pcb_rgb
+
+
+# bump when the saved board profile layout or the profile algorithms change
+BOARD_PROFILE_VERSION = 1
+
+def board_cache_dir(temp_dir):
+    '''
+        Returns:
+        (str) directory of the board profile cache in temp_dir (or $PROTOPCB_BOARD_CACHE if set)
+    '''
+    return os.environ.get('PROTOPCB_BOARD_CACHE', temp_dir + "/board_cache")
+
+def board_profile_key(input_files, trace_backend, hole_backend):
+    '''
+        Parameters:
+        input_files (array) - paths of the files a board profile is derived from ('' for unused ones)
+        trace_backend (str) - trace backend of the board
+        hole_backend (str) - hole backend of the board
+
+        Returns:
+        (str) key of the profile (sha1 of the file contents, backends and profile version)
+    '''
+    hashes = [file_hash(file) if file != '' else '' for file in input_files]
+    key_str = '|'.join(hashes + ['trace:' + trace_backend, 'hole:' + hole_backend, str(BOARD_PROFILE_VERSION)])
+
+    return hashlib.sha1(key_str.encode()).hexdigest()
+
+def pack_contours(contours):
+    '''
+        Returns:
+        points (array) - points of all contours, concatenated
+        lengths (array) - number of points of each contour
+    '''
+    if len(contours) == 0:
+        return np.zeros((0, 1, 2), np.int32), np.zeros(0, np.int64)
+
+    return np.concatenate(contours), np.array([len(cnt) for cnt in contours], np.int64)
+
+def unpack_contours(points, lengths):
+    '''
+        Returns:
+        (tuple) contours (views into points) in the layout of cv2.findContours
+    '''
+    return tuple(np.split(points, np.cumsum(lengths)[:-1])) if len(lengths) > 0 else ()
+
 
 def generate_pngs_from_dir(dir_path, output_dir):
     '''
@@ -237,7 +1317,7 @@ def get_board_bounds(pcb_file):
 
     '''
 
-    pcb = Objectifier(pcb_file)
+    pcb = load_document(pcb_file)
 
     root = pcb.root
 
@@ -526,253 +1606,87 @@ def get_board_bounds(pcb_file):
     return (minX, minY), width, height
 
 
-def is_board_fb(pcb_file):
-    '''
-        Checks if pcb board contains relevant features on both front and back
-
-        Parameters:
-        pcb_file (str): design file of PCB
-
-        Returns:
-        (bool) True if board is double sided
-
-    '''
-    pcb = Objectifier(pcb_file)
-
-    root = pcb.root
-
-    double = False
-
-    for node in root.xpath('/kicad_pcb/footprint'):
-        layer = node.xpath('layer')[0].first_child
-        if layer == 'B.Cu':
-            double = True
-            break
-
-    return double
-
-
-
-
-class PCB_Board:
-    '''
-        class representation of the PCB Board being searched on. Organizes information derived from copper layer images & drill file information.
-
-    '''
-
-    def __init__(self, kicad_pcb_file):
-        '''
-            initialization for PCB Board object
-
-            Parameters:
-            kicad_pcb_file (str) - file of pcb design file (.kicad_pcb)
-        '''
-        self.pcb_file = kicad_pcb_file
-        self.double_sided = is_board_fb(kicad_pcb_file)
-
-        
-    def create_vias_profile(self, hole_arr):
-        '''
-            initialization for PCB Board object
-
-            Parameters:
-            kicad_pcb_file (str) - file of pcb design file (.kicad_pcb)
-        '''
-        
-        tl_coords, width, height = get_board_bounds(self.pcb_file)
-
-        rows = self.trace_hierarchy[0].shape[0]
-
-        vias_dict = {}
-
-        for hole in hole_arr:
-            (x,y) = hole.coordinates
-
-            y = ((abs(y) - tl_coords[1])/ height) * self.pcb_rgb.shape[0] 
-            x = ((x - tl_coords[0])/ width) * self.pcb_rgb.shape[1]  
-            x, y = (abs(round(x)), abs(round(y)))
-
-            mask_val = self.mask_rgb[y][x]
-
-            hole.coordinates = (x,y)
-
-            
-            
-            if list(mask_val) == [255, 255, 255]:
-                hole.isVia = True
-
-
-                for i in range(rows):
-                    if self.trace_hierarchy[0][i][3] == -1:
-                        continue
-
-                    if self.trace_hierarchy[0][i][2] != -1:
-                        inner_cnt_ID = self.trace_hierarchy[0][i][2]
-                        
-                        if self.trace_hierarchy[0][inner_cnt_ID][2] == -1:
-                            within_trace = cv2.pointPolygonTest(self.trace_contours[i], (x,y), False)
-                            if within_trace == 1:
-                                found_via = False
-
-                                within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], (x,y), False)
-
-                                if within_trace == 1:
-                                    
-                                    found_via = True
-                                    if i in vias_dict.keys():
-                                        vias_dict[i]['holes'].append(hole)
-                                    else:
-                                        vias_dict[i] = {'holes': [hole]}
-
-                                if not found_via:
-                                    while not found_via and self.trace_hierarchy[0][inner_cnt_ID][0] != -1:
-                                        inner_cnt_ID = self.trace_hierarchy[0][inner_cnt_ID][0]
-
-                                        if self.trace_hierarchy[0][inner_cnt_ID][2] == -1:
-                                            within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], (x,y), False)
-
-                                            if within_trace == 1:
-                                                
-                                                if i in vias_dict.keys():
-                                                    vias_dict[i]['holes'].append(hole)
-                                                else:
-                                                    vias_dict[i] = {'holes': [hole]}
-                                                found_via = True
-
-
-            else:
-                hole.isVia = False
-
-                for i in range(rows):
-                    if self.trace_hierarchy[0][i][3] == -1:
-                        inner_cnt_ID = self.trace_hierarchy[0][i][2]
-                        within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], (x,y), False)
-                        
-                        if within_trace == 1:
-                            hole.isThroughHole = True
-
-                        while self.trace_hierarchy[0][inner_cnt_ID][0] != -1:
-                            inner_cnt_ID = self.trace_hierarchy[0][inner_cnt_ID][0]
-                            
-                            within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], (x,y), False)
-                            if within_trace == 1:
-                                hole.isThroughHole = True
-                                if inner_cnt_ID in vias_dict.keys():
-                                    vias_dict[inner_cnt_ID]['holes'].append(hole)
-                                else:
-                                    vias_dict[inner_cnt_ID] = {'holes': [hole]}
-                                break
+def is_board_fb(pcb_file):
+    '''
+        Checks if pcb board contains relevant features on both front and back
 
-                        if not hasattr(hole, 'isThroughHole') or not hole.isThroughHole:
-                            hole.isDrillHole = True
-                        continue
+        Parameters:
+        pcb_file (str): design file of PCB
 
-                    if self.trace_hierarchy[0][i][2] != -1:
-                        if self.trace_hierarchy[0][i][3] != 0:
-                            inner_cnt_ID = self.trace_hierarchy[0][i][2]
-                            within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], (x,y), False)
-                            if within_trace == 1:
-                                hole.isThroughHole = True
-                                if i in vias_dict.keys():
-                                    vias_dict[i]['holes'].append(hole)
-                                else:
-                                    vias_dict[i] = {'holes': [hole]}
+        Returns:
+        (bool) True if board is double sided
 
-                            while self.trace_hierarchy[0][inner_cnt_ID][0] != -1:
-                                inner_cnt_ID = self.trace_hierarchy[0][inner_cnt_ID][0]
-                                within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], (x,y), False)
-                                if within_trace == 1:
-                                    hole.isThroughHole = True
-                                    if i in vias_dict.keys():
-                                        vias_dict[i]['holes'].append(hole)
-                                    else:
-                                        vias_dict[i] = {'holes': [hole]}
-                                    break
+    '''
+    pcb = load_document(pcb_file)
 
-                            
+    root = pcb.root
 
-                            if not hasattr(hole, 'isThroughHole') or not hole.isThroughHole:
-                                hole.isDrillHole = True
-                        
-                if not hasattr(hole, 'isThroughHole') or not hole.isThroughHole:
-                    hole.isDrillHole = True
-                else:
-                    #add this through hole to the via dict
-                    for i in range(rows):
-                        if self.trace_hierarchy[0][i][3] == -1:
-                            continue
+    double = False
 
-                        if self.trace_hierarchy[0][i][2] != -1:
-                            inner_cnt_ID = self.trace_hierarchy[0][i][2]
-                            
-                            if self.trace_hierarchy[0][inner_cnt_ID][2] == -1:
-                                within_trace = cv2.pointPolygonTest(self.trace_contours[i], (x,y), False)
-                                if within_trace == 1:
+    for node in root.xpath('/kicad_pcb/footprint'):
+        layer = node.xpath('layer')[0].first_child
+        if layer == 'B.Cu':
+            double = True
+            break
 
-                                    if i in vias_dict.keys():
+    return double
 
-                                        if hole not in vias_dict[i]['holes']:
-                                            vias_dict[i]['holes'].append(hole)
 
-                                        
-                                    else:
-                                        vias_dict[i] = {'holes': [hole]}
 
-        self.hole_arr = hole_arr
 
+class PCB_Board:
+    '''
+        class representation of the PCB Board being searched on. Organizes information derived from copper layer images & drill file information.
 
-        ## now create mapping to backside using vias info
+    '''
 
-        connected_traces_back_dict = {}
-        vias_dict_back = {}
+    def __init__(self, kicad_pcb_file, trace_backend='contours', hole_backend='contours'):
+        '''
+            initialization for PCB Board object
 
-        for trace_fID in vias_dict.keys():
-            holes = vias_dict[trace_fID]['holes']
+            Parameters:
+            kicad_pcb_file (str) - file of pcb design file (.kicad_pcb)
 
-            rows = self.trace_back_hierarchy[0].shape[0]
-            temp = self.pcb_rgb_back.copy()
-            for hole in holes:
-                
-                for i in range(rows):
-                    if self.trace_back_hierarchy[0][i][3] == -1:
-                        continue
+            Optional:
+            trace_backend (str) - how pads are assigned to traces ('contours' or 'labels', see TRACE_BACKENDS)
+            hole_backend (str) - how holes are classified and assigned to traces on double sided boards ('contours' or 'labels', see HOLE_BACKENDS)
+        '''
+        if trace_backend not in TRACE_BACKENDS:
+            raise ValueError(f"unknown trace backend '{trace_backend}', expected one of {list(TRACE_BACKENDS.keys())}")
+        if hole_backend not in HOLE_BACKENDS:
+            raise ValueError(f"unknown hole backend '{hole_backend}', expected one of {list(HOLE_BACKENDS.keys())}")
 
-                    if self.trace_back_hierarchy[0][i][2] != -1:
-                        inner_cnt_ID = self.trace_back_hierarchy[0][i][2]
+        self.pcb_file = kicad_pcb_file
+        self.trace_backend = trace_backend
+        self.hole_backend = hole_backend
+        self.double_sided = is_board_fb(kicad_pcb_file)
 
-                        found_via = False
-                        
-                        while self.trace_back_hierarchy[0][inner_cnt_ID][0] != -1:
-                            if self.trace_back_hierarchy[0][inner_cnt_ID][2] == -1:
-                                within_trace = cv2.pointPolygonTest(self.trace_back_contours[inner_cnt_ID], hole.coordinates, False)
-                                if within_trace == 1:
-                                    found_via = True
-                                    
-                                    if i in connected_traces_back_dict.keys():
+        
+    def create_vias_profile(self, hole_arr):
+        '''
+            initialization for PCB Board object
 
-                                        connected_traces_back_dict[i].append(trace_fID)
-                                    else:
-                                        connected_traces_back_dict[i] = [trace_fID]
+            Parameters:
+            kicad_pcb_file (str) - file of pcb design file (.kicad_pcb)
+        '''
+        
+        tl_coords, width, height = get_board_bounds(self.pcb_file)
 
-                                    break
-                            inner_cnt_ID = self.trace_back_hierarchy[0][inner_cnt_ID][0]
+        hole_xs, hole_ys = drillToPixels([hole.coordinates[0] for hole in hole_arr], [hole.coordinates[1] for hole in hole_arr], tl_coords, width, height, self.pcb_rgb.shape)
 
+        for hole, x, y in zip(hole_arr, hole_xs.tolist(), hole_ys.tolist()):
+            hole.coordinates = (x,y)
 
-                        if not found_via:
-                            #check last one
-                            if self.trace_back_hierarchy[0][inner_cnt_ID][2] == -1:
-                                within_trace = cv2.pointPolygonTest(self.trace_back_contours[inner_cnt_ID], hole.coordinates, False)
-                                if within_trace == 1:
-                                    found_via = True
-                                    
-                                    if i in connected_traces_back_dict.keys():
+        t_inv_img_grey = cv2.bitwise_not(cv2.cvtColor(self.pcb_rgb, cv2.COLOR_BGR2GRAY))
+        vias_dict = HOLE_BACKENDS[self.hole_backend]['classify'](hole_arr, self.mask_rgb, self.trace_contours, self.trace_hierarchy, t_inv_img_grey)
 
-                                        connected_traces_back_dict[i].append(trace_fID)
-                                    else:
-                                        connected_traces_back_dict[i] = [trace_fID]
+        self.hole_arr = hole_arr
 
 
+        ## now create mapping to backside using vias info
 
+        tb_inv_img_grey = cv2.bitwise_not(cv2.cvtColor(self.pcb_rgb_back, cv2.COLOR_BGR2GRAY))
+        connected_traces_back_dict = HOLE_BACKENDS[self.hole_backend]['back'](vias_dict, self.trace_back_contours, self.trace_back_hierarchy, tb_inv_img_grey)
 
         trace_index = 0
         board_connections_dict = {}
@@ -869,13 +1783,13 @@ class PCB_Board:
         t_inv_img_grey = cv2.bitwise_not(t_img_grey)
 
         front_pad_map = gen_pad_map(self.mask_contours, f_pads_ignore)
-        front_trace_map = connected_pads(front_pad_map, self.trace_contours, self.trace_hierarchy, t_inv_img_grey, hole_arr = self.hole_arr)
+        front_trace_map = self.create_trace_map('front', front_pad_map, t_inv_img_grey, hole_arr = self.hole_arr)
 
         tb_img_grey = cv2.cvtColor(self.pcb_rgb_back, cv2.COLOR_BGR2GRAY)
         tb_inv_img_grey = cv2.bitwise_not(tb_img_grey)
 
         back_pad_map = gen_pad_map(self.mask_back_contours, b_pads_ignore)
-        back_trace_map = connected_pads(back_pad_map, self.trace_back_contours, self.trace_back_hierarchy, tb_inv_img_grey, hole_arr = self.hole_arr)
+        back_trace_map = self.create_trace_map('back', back_pad_map, tb_inv_img_grey, hole_arr = self.hole_arr)
 
         
         for trace_index in board_connections_dict.keys():
@@ -909,147 +1823,79 @@ class PCB_Board:
         self.board_connections_dict = board_connections_dict
         self.front_pad_map = front_pad_map
         self.back_pad_map = back_pad_map
+        self.create_pad_indices()
 
 
         
     
-    def create_updated_vias_profile(self):
-
-        rows = self.trace_hierarchy[0].shape[0]
-
-        vias_dict = {}
-
-        for hole in self.hole_arr:
-            if hole.isVia:
-                for i in range(rows):
-                    if self.trace_hierarchy[0][i][3] == -1:
-                        continue
-
-                    if self.trace_hierarchy[0][i][2] != -1:
-                        inner_cnt_ID = self.trace_hierarchy[0][i][2]
-                        
-                        if self.trace_hierarchy[0][inner_cnt_ID][2] == -1:
-                            within_trace = cv2.pointPolygonTest(self.trace_contours[i], hole.coordinates, False)
-                            if within_trace == 1:
-                                found_via = False
-
-                                within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], hole.coordinates, False)
-
-                                if within_trace == 1:
-                                    
-                                    found_via = True
-                                    if i in vias_dict.keys():
-                                        vias_dict[i]['holes'].append(hole)
-                                    else:
-                                        vias_dict[i] = {'holes': [hole]}
-
-                                if not found_via:
-                                    while not found_via and self.trace_hierarchy[0][inner_cnt_ID][0] != -1:
-                                        inner_cnt_ID = self.trace_hierarchy[0][inner_cnt_ID][0]
-
-                                        if self.trace_hierarchy[0][inner_cnt_ID][2] == -1:
-                                            within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], hole.coordinates, False)
-
-                                            if within_trace == 1:
-                                                
-                                                if i in vias_dict.keys():
-                                                    vias_dict[i]['holes'].append(hole)
-                                                else:
-                                                    vias_dict[i] = {'holes': [hole]}
-                                                    found_via = True
-            elif hasattr(hole, 'isThroughHole') and hole.isThroughHole:
-                for i in range(rows):
-                    if self.trace_hierarchy[0][i][3] == -1:
-                        continue
-
-                    if self.trace_hierarchy[0][i][2] != -1:
-                        inner_cnt_ID = self.trace_hierarchy[0][i][2]
+    def create_vias_maps(self):
+        '''
+            Helper function for 'create_updated_vias_profile'. Maps the vias & through holes to the front traces containing them and the back traces to the front traces they connect to.
 
-                        if self.trace_hierarchy[0][inner_cnt_ID][2] == -1:
-                            within_trace = cv2.pointPolygonTest(self.trace_contours[i], hole.coordinates, False)
-                            if within_trace == 1:
-                                found_th = False
+            Returns:
+            vias_dict (dict) - front trace contour ID to {'holes': [holes]}
+            connected_traces_back_dict (dict) - back trace contour ID to front trace contour IDs (once per shared hole)
+        '''
 
-                                within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], hole.coordinates, False)
+        t_inv_img_grey = cv2.bitwise_not(cv2.cvtColor(self.pcb_rgb, cv2.COLOR_BGR2GRAY))
+        vias_dict = HOLE_BACKENDS[self.hole_backend]['vias'](self.hole_arr, self.trace_contours, self.trace_hierarchy, t_inv_img_grey)
 
-                                if within_trace == 1:
+        ## now create mapping to backside using vias info
 
-                                    found_th = True
+        tb_inv_img_grey = cv2.bitwise_not(cv2.cvtColor(self.pcb_rgb_back, cv2.COLOR_BGR2GRAY))
+        connected_traces_back_dict = HOLE_BACKENDS[self.hole_backend]['back'](vias_dict, self.trace_back_contours, self.trace_back_hierarchy, tb_inv_img_grey)
 
-                                    if i in vias_dict.keys():
-                                        vias_dict[i]['holes'].append(hole)
-                                    else:
-                                        vias_dict[i] = {'holes': [hole]}
-                                
-                                if not found_th:
-                                    while not found_th and self.trace_hierarchy[0][inner_cnt_ID][0] != -1:
-                                        inner_cnt_ID = self.trace_hierarchy[0][inner_cnt_ID][0]
+        return vias_dict, connected_traces_back_dict
 
-                                        if self.trace_hierarchy[0][inner_cnt_ID][2] == -1:
-                                            within_trace = cv2.pointPolygonTest(self.trace_contours[inner_cnt_ID], hole.coordinates, False)
+    def create_incremental_vias_maps(self):
+        '''
+            Helper function for 'create_updated_vias_profile'. Same result as 'create_vias_maps', only the trace contours changed since the last profile are tested against the holes.
+        '''
+        hole_IDs = [hole_ID for hole_ID, hole in enumerate(self.hole_arr) if hole.isVia or (hasattr(hole, 'isThroughHole') and hole.isThroughHole)]
 
-                                            if within_trace == 1:
-                                                
-                                                if i in vias_dict.keys():
-                                                    vias_dict[i]['holes'].append(hole)
-                                                else:
-                                                    vias_dict[i] = {'holes': [hole]}
-                                                    found_th = True
+        front_holes = self.contour_profile_cache.holes('front', self.trace_contours, self.trace_hierarchy, self.hole_arr, hole_IDs)
+        back_holes = self.contour_profile_cache.holes('back', self.trace_back_contours, self.trace_back_hierarchy, self.hole_arr, hole_IDs)
 
+        # holes were checked in hole_arr order, each against all front traces
+        vias_pairs = sorted([(hole_ID, i) for i in range(len(front_holes)) for hole_ID in front_holes[i]])
 
+        vias_dict = {}
+        for hole_ID, i in vias_pairs:
+            if i in vias_dict.keys():
+                vias_dict[i]['holes'].append(self.hole_arr[hole_ID])
+            else:
+                vias_dict[i] = {'holes': [self.hole_arr[hole_ID]]}
 
-        ## now create mapping to backside using vias info
+        hole_back_traces = {}
+        for i in range(len(back_holes)):
+            for hole_ID in back_holes[i]:
+                if hole_ID in hole_back_traces.keys():
+                    hole_back_traces[hole_ID].append(i)
+                else:
+                    hole_back_traces[hole_ID] = [i]
 
         connected_traces_back_dict = {}
-        vias_dict_back = {}
-
         for trace_fID in vias_dict.keys():
-            holes = vias_dict[trace_fID]['holes']
-
-            rows = self.trace_back_hierarchy[0].shape[0]
-            temp = self.pcb_rgb_back.copy()
-            for hole in holes:
-                
-                for i in range(rows):
-                    if self.trace_back_hierarchy[0][i][3] == -1:
-                        continue
-
-                    if self.trace_back_hierarchy[0][i][2] != -1:
-                        inner_cnt_ID = self.trace_back_hierarchy[0][i][2]
-
-                        found_via = False
-                        
-                        while self.trace_back_hierarchy[0][inner_cnt_ID][0] != -1:
-                            if self.trace_back_hierarchy[0][inner_cnt_ID][2] == -1:
-                                within_trace = cv2.pointPolygonTest(self.trace_back_contours[inner_cnt_ID], hole.coordinates, False)
-                                if within_trace == 1:
-                                    found_via = True
-                                    
-                                    if i in connected_traces_back_dict.keys():
-
-                                        connected_traces_back_dict[i].append(trace_fID)
-                                    else:
-                                        connected_traces_back_dict[i] = [trace_fID]
-
-                                    break
-                            inner_cnt_ID = self.trace_back_hierarchy[0][inner_cnt_ID][0]
-
-
-                        if not found_via:
-                            #check last one
-                            if self.trace_back_hierarchy[0][inner_cnt_ID][2] == -1:
-                                within_trace = cv2.pointPolygonTest(self.trace_back_contours[inner_cnt_ID], hole.coordinates, False)
-                                if within_trace == 1:
-                                    found_via = True
-                                    
-                                    if i in connected_traces_back_dict.keys():
-
-                                        connected_traces_back_dict[i].append(trace_fID)
-                                    else:
-                                        connected_traces_back_dict[i] = [trace_fID]
+            for hole_ID in front_holes[trace_fID]:
+                for i in hole_back_traces.get(hole_ID, []):
+                    if i in connected_traces_back_dict.keys():
+                        connected_traces_back_dict[i].append(trace_fID)
+                    else:
+                        connected_traces_back_dict[i] = [trace_fID]
 
+        return vias_dict, connected_traces_back_dict
 
+    def create_updated_vias_profile(self, incremental=False):
+        '''
+            rebuilds the profile of a double sided board from its current trace contours (holes were already classified by 'create_vias_profile')
 
+            Optional:
+            incremental (bool) - only process the trace contours changed since the last profile (see ContourProfileCache)
+        '''
+        if incremental:
+            vias_dict, connected_traces_back_dict = self.create_incremental_vias_maps()
+        else:
+            vias_dict, connected_traces_back_dict = self.create_vias_maps()
 
         trace_index = 0
         board_connections_dict = {}
@@ -1124,13 +1970,13 @@ class PCB_Board:
         t_inv_img_grey = cv2.bitwise_not(t_img_grey)
 
         front_pad_map = gen_pad_map(self.mask_contours, f_pads_ignore)
-        front_trace_map = connected_pads(front_pad_map, self.trace_contours, self.trace_hierarchy, t_inv_img_grey, hole_arr = self.hole_arr)
+        front_trace_map = self.create_trace_map('front', front_pad_map, t_inv_img_grey, hole_arr = self.hole_arr, incremental = incremental)
 
         tb_img_grey = cv2.cvtColor(self.pcb_rgb_back, cv2.COLOR_BGR2GRAY)
         tb_inv_img_grey = cv2.bitwise_not(tb_img_grey)
 
         back_pad_map = gen_pad_map(self.mask_back_contours, b_pads_ignore)
-        back_trace_map = connected_pads(back_pad_map, self.trace_back_contours, self.trace_back_hierarchy, tb_inv_img_grey, hole_arr = self.hole_arr)
+        back_trace_map = self.create_trace_map('back', back_pad_map, tb_inv_img_grey, hole_arr = self.hole_arr, incremental = incremental)
 
 
         for trace_index in board_connections_dict.keys():
@@ -1164,16 +2010,23 @@ class PCB_Board:
         self.board_connections_dict = board_connections_dict
         self.front_pad_map = front_pad_map
         self.back_pad_map = back_pad_map
+        self.create_pad_indices()
 
         
         
-    def create_profile(self):
+    def create_profile(self, incremental=False):
+        '''
+            builds the profile of a board without vias (each trace is its own connection)
+
+            Optional:
+            incremental (bool) - only process the trace contours changed since the last profile (see ContourProfileCache)
+        '''
 
         t_img_grey = cv2.cvtColor(self.pcb_rgb, cv2.COLOR_BGR2GRAY)
         t_inv_img_grey = cv2.bitwise_not(t_img_grey)
 
         front_pad_map = gen_pad_map(self.mask_contours)
-        front_trace_map = connected_pads(front_pad_map, self.trace_contours, self.trace_hierarchy, t_inv_img_grey)
+        front_trace_map = self.create_trace_map('front', front_pad_map, t_inv_img_grey, incremental = incremental)
         self.front_pad_map = front_pad_map
 
         board_connections_dict = {}
@@ -1187,7 +2040,7 @@ class PCB_Board:
             tb_inv_img_grey = cv2.bitwise_not(tb_img_grey)
 
             back_pad_map = gen_pad_map(self.mask_back_contours)
-            back_trace_map = connected_pads(back_pad_map, self.trace_back_contours, self.trace_back_hierarchy, tb_inv_img_grey)
+            back_trace_map = self.create_trace_map('back', back_pad_map, tb_inv_img_grey, incremental = incremental)
             self.back_pad_map = back_pad_map
 
             trace_index = len(board_connections_dict.keys())
@@ -1196,16 +2049,179 @@ class PCB_Board:
                 trace_index += 1
 
         self.board_connections_dict = board_connections_dict
+        self.create_pad_indices()
+
+    def create_trace_map(self, fb, pad_map, trace_img, hole_arr = [], incremental=False):
+        '''
+            maps the pads of one side to its trace contours (see TRACE_BACKENDS)
+
+            Parameters:
+            fb (str) - 'front' or 'back'
+            pad_map (dict) - dict of pads and corresponding center coordinates
+            trace_img (2D array) - inverted grey image of the traces
+
+            Optional:
+            hole_arr (array) - array of holes (to deal with vias)
+            incremental (bool) - reuse the results of trace contours unchanged since the last profile, otherwise the result becomes the new base of contour_profile_cache
+
+            Returns:
+            trace_map (dict) - dict of traces and corresponding pads within the trace
+        '''
+        if fb == 'front':
+            trace_contours, trace_hierarchy = self.trace_contours, self.trace_hierarchy
+        else:
+            trace_contours, trace_hierarchy = self.trace_back_contours, self.trace_back_hierarchy
+
+        if incremental:
+            return self.contour_profile_cache.trace_map(fb, pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr = hole_arr)
+
+        trace_map = TRACE_BACKENDS[self.trace_backend](pad_map, trace_contours, trace_hierarchy, trace_img, hole_arr = hole_arr)
+
+        if not hasattr(self, 'contour_profile_cache'):
+            self.contour_profile_cache = ContourProfileCache()
+        self.contour_profile_cache.set_base(fb, trace_contours, trace_hierarchy, trace_map)
+
+        return trace_map
+
+    def create_pad_indices(self):
+        '''
+            builds the PadIndex of each side (the pad raster is only redrawn if the mask contours changed)
+        '''
+        sides = ['front']
+        if self.double_sided:
+            sides.append('back')
+
+        for fb in sides:
+            if fb == 'front':
+                pad_contours, pad_map, mask_img = self.mask_contours, self.front_pad_map, self.mask_rgb
+            else:
+                pad_contours, pad_map, mask_img = self.mask_back_contours, self.back_pad_map, self.mask_rgb_back
+
+            pad_index = getattr(self, fb + '_pad_index', None)
+            if pad_index is None or pad_index.pad_contours is not pad_contours:
+                pad_index = PadIndex(pad_contours, mask_img.shape, pad_map)
+            elif pad_index.pad_map != pad_map:
+                pad_index = pad_index.for_pad_map(pad_map)
+
+            setattr(self, fb + '_pad_index', pad_index)
+
+    def get_pad_trace_index(self):
+        '''
+            Returns:
+            (PadTraceIndex) reverse index of board_connections_dict, rebuilt whenever board_connections_dict is replaced (new profile, trace cuts, revert)
+        '''
+        if not hasattr(self, 'pad_trace_index') or self.pad_trace_index.board_connections_dict is not self.board_connections_dict:
+            self.pad_trace_index = PadTraceIndex(self.board_connections_dict)
+
+        return self.pad_trace_index
+
+    def get_pad_index(self, fb='front'):
+        '''
+            Optional:
+            fb (str) - designate front or back of the board
+
+            Returns:
+            (PadIndex) pad index of that side of the board
+        '''
+        if not hasattr(self, fb + '_pad_index'):
+            self.create_pad_indices()
+
+        return getattr(self, fb + '_pad_index')
+
+    def get_pad_features(self, fb='front'):
+        '''
+            Optional:
+            fb (str) - designate front or back of the board
+
+            Returns:
+            (array) pad-feature table of that side of the board, indexed by pad ID (see gen_pad_features)
+        '''
+        return self.get_pad_index(fb).features
+
+    def find_pad_index(self, pad_map):
+        '''
+            Parameters:
+            pad_map (dict) - each pad with corresponding pad center
+
+            Returns:
+            (PadIndex) pad index built for pad_map, None if pad_map isn't one of this board's pad maps
+        '''
+        sides = ['front']
+        if self.double_sided:
+            sides.append('back')
+
+        for fb in sides:
+            pad_index = self.get_pad_index(fb)
+            if pad_map is pad_index.pad_map or pad_map == pad_index.pad_map:
+                return pad_index
+
+        return None
 
                     
 
-    def initialize_via_files(self, mask_front, trace_front, mask_back = '', trace_back = '', drill=''):
-        self.pcb_rgb = cv2.imread(trace_front)
-        self.mask_rgb = cv2.imread(mask_front)
+    def initialize_via_files(self, mask_front, trace_front, mask_back = '', trace_back = '', drill='', cache_dir=None):
+        '''
+            reads the board images (and drill file) and builds the board profile
+
+            Parameters:
+            mask_front (str) - front solder mask image
+            trace_front (str) - front traces image
+
+            Optional:
+            mask_back (str) - back solder mask image (double sided boards)
+            trace_back (str) - back traces image (double sided boards)
+            drill (str) - drill file (double sided boards)
+            cache_dir (str) - directory of saved profiles (see 'save_profile'); the profile is loaded from there if these exact input files were profiled before
+        '''
+        if cache_dir is not None:
+            profile_dir = cache_dir + "/" + board_profile_key([self.pcb_file, mask_front, trace_front, mask_back, trace_back, drill], self.trace_backend, self.hole_backend)
+            if os.path.isdir(profile_dir):
+                self.load_profile(profile_dir, mask_front, trace_front, mask_back, trace_back)
+                return
 
         if self.double_sided:
-            self.pcb_rgb_back = cv2.imread(trace_back)
-            self.mask_rgb_back = cv2.imread(mask_back)
+            self.initialize_via_images(cv2.imread(mask_front), cv2.imread(trace_front), cv2.imread(mask_back), cv2.imread(trace_back), getHolesFromDRL(drill))
+        else:
+            self.initialize_via_images(cv2.imread(mask_front), cv2.imread(trace_front))
+
+        if cache_dir is not None:
+            self.save_profile(profile_dir)
+
+    def initialize_via_board(self, px_per_mm=BOARD_PX_PER_MM):
+        '''
+            draws the board layers straight from the .kicad_pcb (see board_raster) and builds the board profile,
+            no kicad-cli exports, images or drill file needed
+
+            Optional:
+            px_per_mm (float) - resolution of the board images
+        '''
+        layers = ['F.Mask', 'F.Cu', 'B.Mask', 'B.Cu'] if self.double_sided else ['F.Mask', 'F.Cu']
+        images, holes_arr = rasterize_board(self.pcb_file, layers, px_per_mm)
+
+        if self.double_sided:
+            self.initialize_via_images(images['F.Mask'], images['F.Cu'], images['B.Mask'], images['B.Cu'], holes_arr)
+        else:
+            self.initialize_via_images(images['F.Mask'], images['F.Cu'])
+
+    def initialize_via_images(self, mask_rgb, pcb_rgb, mask_rgb_back=None, pcb_rgb_back=None, holes_arr=[]):
+        '''
+            builds the board profile from the board images (BGR arrays, black on white)
+
+            Parameters:
+            mask_rgb (2D array) - front solder mask image
+            pcb_rgb (2D array) - front traces image
+
+            Optional:
+            mask_rgb_back (2D array) - back solder mask image (double sided boards)
+            pcb_rgb_back (2D array) - back traces image (double sided boards)
+            holes_arr (array) - Hole objects of the drill holes (double sided boards, see getHolesFromDRL)
+        '''
+        self.pcb_rgb = pcb_rgb
+        self.mask_rgb = mask_rgb
+
+        if self.double_sided:
+            self.pcb_rgb_back = pcb_rgb_back
+            self.mask_rgb_back = mask_rgb_back
 
 
         m_img_grey = cv2.cvtColor(self.mask_rgb, cv2.COLOR_BGR2GRAY)
@@ -1227,57 +2243,191 @@ class PCB_Board:
             tb_inv_img_grey = cv2.bitwise_not(tb_img_grey)
             self.trace_back_contours, self.trace_back_hierarchy = cv2.findContours(tb_img_grey, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
 
-            holes_arr = getHolesFromDRL(drill)
-            
             if len(holes_arr) > 0:
                 self.create_vias_profile(holes_arr)
             else:
                 self.create_profile()
         else:
             self.create_profile()
-    
-    def integrate_trace_cuts(self, trace_cuts_dict):
 
+    def save_profile(self, profile_dir):
+        '''
+            saves the derived state of the board (contours, hierarchies, pad maps, board_connections_dict, holes).
+            Arrays are stored as .npy files (memory mapped when loaded), the rest as profile.json.
+            The profile directory is written under a temporary name and renamed into place, concurrent writers never see half written profiles.
 
-        if not hasattr(self, 'pcb_rgb_original'):
-            self.trace_cuts = True
-            self.pcb_rgb_original = self.pcb_rgb.copy()
-            self.trace_contours_original = self.trace_contours
-            self.trace_hierarchy_original = self.trace_hierarchy
-            self.front_pad_map_original = self.front_pad_map
-            self.board_connections_dict_original = self.board_connections_dict
+            Parameters:
+            profile_dir (str) - directory to save the profile in
+        '''
+        sides = ['front']
+        if self.double_sided:
+            sides.append('back')
 
-            if not hasattr(self, 'pcb_rgb_back_original') and self.double_sided:
-                self.pcb_rgb_back_original = self.pcb_rgb_back.copy()
-                self.trace_back_contours_original = self.trace_back_contours
-                self.trace_back_hierarchy_original = self.trace_back_hierarchy
-                self.back_pad_map_original = self.back_pad_map
+        arrays = {}
+        for name in ['mask_contours', 'trace_contours', 'mask_back_contours', 'trace_back_contours']:
+            if hasattr(self, name):
+                arrays[name + '_points'], arrays[name + '_lengths'] = pack_contours(getattr(self, name))
+        for name in ['trace_hierarchy', 'trace_back_hierarchy']:
+            if hasattr(self, name):
+                arrays[name] = getattr(self, name)
 
+        hole_arr = getattr(self, 'hole_arr', [])
+        hole_IDs = {id(hole): hole_ID for hole_ID, hole in enumerate(hole_arr)}
 
-        self.trace_cuts = True
-        self.pcb_rgb_previous = self.pcb_rgb.copy()
-        self.trace_contours_previous = self.trace_contours
-        self.trace_hierarchy_previous = self.trace_hierarchy
-        self.front_pad_map_previous = self.front_pad_map
-        self.board_connections_dict_previous = self.board_connections_dict
+        holes = []
+        for hole in hole_arr:
+            hole_info = {'diameter': float(hole.diameter), 'isPlated': hole.isPlated, 'isVia': bool(hole.isVia), 'coordinates': [int(c) for c in hole.coordinates]}
+            for attr in ['isThroughHole', 'isDrillHole']:
+                if hasattr(hole, attr):
+                    hole_info[attr] = bool(getattr(hole, attr))
+            holes.append(hole_info)
+
+        connections = []
+        for trace_ID, connection in self.board_connections_dict.items():
+            connection_info = {}
+            for key, val in connection.items():
+                if key == 'holes':
+                    connection_info[key] = [hole_IDs[id(hole)] for hole in val]
+                else:
+                    connection_info[key] = [int(v) for v in val]
+            connections.append([int(trace_ID), connection_info])
 
+        profile = {'version': BOARD_PROFILE_VERSION, 'double_sided': self.double_sided, 'trace_backend': self.trace_backend,
+                   'holes': holes, 'has_hole_arr': hasattr(self, 'hole_arr'), 'board_connections_dict': connections}
+
+        for fb in sides:
+            pad_map = getattr(self, fb + '_pad_map')
+            profile[fb + '_pad_map'] = [[int(pad), int(cx), int(cy)] for pad, (cx, cy) in pad_map.items()]
+
+            # pads per trace contour, to seed contour_profile_cache
+            cache = self.contour_profile_cache
+            if fb == 'front':
+                trace_contours, trace_hierarchy = self.trace_contours, self.trace_hierarchy
+            else:
+                trace_contours, trace_hierarchy = self.trace_back_contours, self.trace_back_hierarchy
+            keys = cache.keys(fb, trace_contours, trace_hierarchy)
+            profile[fb + '_trace_map'] = [[i, cache.entries[fb][key]['pads']] for i, key in enumerate(keys) if len(cache.entries[fb].get(key, {}).get('pads', [])) > 0]
+
+        parent_dir = os.path.dirname(os.path.abspath(profile_dir))
+        os.makedirs(parent_dir, exist_ok=True)
+        profile_tmp = tempfile.mkdtemp(dir=parent_dir, prefix='.tmp-')
+
+        for name, arr in arrays.items():
+            np.save(profile_tmp + "/" + name + ".npy", np.ascontiguousarray(arr))
+        with open(profile_tmp + "/profile.json", 'w') as f:
+            json.dump(profile, f)
+
+        try:
+            os.rename(profile_tmp, profile_dir)
+        except OSError:
+            #profile was saved by a different process first
+            shutil.rmtree(profile_tmp, ignore_errors=True)
+
+    def load_profile(self, profile_dir, mask_front, trace_front, mask_back = '', trace_back = ''):
+        '''
+            restores the state saved by 'save_profile' (same result as 'initialize_via_files' on the inputs the profile was saved from)
+
+            Parameters:
+            profile_dir (str) - directory the profile was saved in
+            mask_front (str) - front solder mask image
+            trace_front (str) - front traces image
+
+            Optional:
+            mask_back (str) - back solder mask image (double sided boards)
+            trace_back (str) - back traces image (double sided boards)
+        '''
+        with open(profile_dir + "/profile.json", 'r') as f:
+            profile = json.load(f)
+
+        def load_array(name):
+            return np.load(profile_dir + "/" + name + ".npy", mmap_mode='r')
+
+        def load_contours(name):
+            return unpack_contours(load_array(name + '_points'), load_array(name + '_lengths'))
+
+        self.pcb_rgb = cv2.imread(trace_front)
+        self.mask_rgb = cv2.imread(mask_front)
+        self.mask_contours = load_contours('mask_contours')
+        self.trace_contours = load_contours('trace_contours')
+        self.trace_hierarchy = load_array('trace_hierarchy')
+
+        if self.double_sided:
+            self.pcb_rgb_back = cv2.imread(trace_back)
+            self.mask_rgb_back = cv2.imread(mask_back)
+            self.mask_back_contours = load_contours('mask_back_contours')
+            self.trace_back_contours = load_contours('trace_back_contours')
+            self.trace_back_hierarchy = load_array('trace_back_hierarchy')
+
+        hole_arr = []
+        for hole_info in profile['holes']:
+            hole = Hole(diameter=hole_info['diameter'], isPlated=hole_info['isPlated'], isVia=hole_info['isVia'], coordinates=tuple(hole_info['coordinates']))
+            for attr in ['isThroughHole', 'isDrillHole']:
+                if attr in hole_info:
+                    setattr(hole, attr, hole_info[attr])
+            hole_arr.append(hole)
+        if profile['has_hole_arr']:
+            self.hole_arr = hole_arr
+
+        board_connections_dict = {}
+        for trace_ID, connection_info in profile['board_connections_dict']:
+            connection = {}
+            for key, val in connection_info.items():
+                if key == 'holes':
+                    connection[key] = [hole_arr[hole_ID] for hole_ID in val]
+                else:
+                    connection[key] = val
+            board_connections_dict[trace_ID] = connection
+        self.board_connections_dict = board_connections_dict
+
+        self.contour_profile_cache = ContourProfileCache()
+        sides = ['front']
         if self.double_sided:
-            self.pcb_rgb_back_previous = self.pcb_rgb_back.copy()
-            self.trace_back_contours_previous = self.trace_back_contours
-            self.trace_back_hierarchy_previous = self.trace_back_hierarchy
-            self.back_pad_map_previous = self.back_pad_map
+            sides.append('back')
+
+        for fb in sides:
+            setattr(self, fb + '_pad_map', {pad: (cx, cy) for pad, cx, cy in profile[fb + '_pad_map']})
+
+            if fb == 'front':
+                trace_contours, trace_hierarchy = self.trace_contours, self.trace_hierarchy
+            else:
+                trace_contours, trace_hierarchy = self.trace_back_contours, self.trace_back_hierarchy
+            self.contour_profile_cache.set_base(fb, trace_contours, trace_hierarchy, {i: pads for i, pads in profile[fb + '_trace_map']})
+
+        self.create_pad_indices()
+    
+    def snapshot(self):
+        '''
+            Returns:
+            (BoardSnapshot) current trace state of the board (shares the layers, nothing is copied)
+        '''
+        return BoardSnapshot(self)
+
+    def restore(self, snapshot):
+        '''
+            sets the trace state of the board back to snapshot
+
+            Parameters:
+            snapshot (BoardSnapshot) - state returned by 'snapshot'
+        '''
+        snapshot.restore(self)
 
+    def integrate_trace_cuts(self, trace_cuts_dict):
+        '''
+            removes copper under the trace cuts and updates the board profile. Only the layers with cuts are copied.
 
-        new_pcb_rgb = self.pcb_rgb.copy()
+            Parameters:
+            trace_cuts_dict (dict) - {'front cuts': [contours], 'back cuts': [contours]}
+        '''
+        if not hasattr(self, 'original_snapshot'):
+            self.original_snapshot = self.snapshot()
 
+        self.trace_cuts = True
+        self.previous_snapshot = self.snapshot()
 
-        for trace_cut_cnt in trace_cuts_dict['front cuts']:
-            cv2.drawContours(new_pcb_rgb, [trace_cut_cnt], 0, (255, 255, 255), -1)
+        new_pcb_rgb = draw_trace_cuts(self.pcb_rgb, trace_cuts_dict['front cuts'])
 
         if self.double_sided:
-            new_pcb_rgb_back = self.pcb_rgb_back.copy()
-            for trace_cut_cnt in trace_cuts_dict['back cuts']:
-                cv2.drawContours(new_pcb_rgb_back, [trace_cut_cnt], 0, (255, 255, 255), -1)
+            new_pcb_rgb_back = draw_trace_cuts(self.pcb_rgb_back, trace_cuts_dict['back cuts'])
 
             self.update_profile(new_pcb_rgb, new_pcb_rgb_back)
         else:
@@ -1287,111 +2437,97 @@ class PCB_Board:
 
         self.trace_cuts = True
 
-        if not hasattr(self, 'pcb_rgb_previous'):
+        if not hasattr(self, 'previous_snapshot'):
             return 
 
-        self.pcb_rgb = self.pcb_rgb_previous.copy()
-        self.trace_contours = self.trace_contours_previous
-        self.trace_hierarchy = self.trace_hierarchy_previous
-        self.front_pad_map = self.front_pad_map_previous
-        self.board_connections_dict = self.board_connections_dict_previous
-
-        if self.double_sided:
-            self.pcb_rgb_back = self.pcb_rgb_back_previous.copy()
-            self.trace_back_contours = self.trace_back_contours_previous
-            self.trace_back_hierarchy = self.trace_back_hierarchy_previous
-            self.back_pad_map = self.back_pad_map_previous
+        self.restore(self.previous_snapshot)
 
     def revert_original(self):
         self.trace_cuts = False
-        self.pcb_rgb = self.pcb_rgb_original.copy()
+        self.restore(self.original_snapshot)
 
-        self.trace_contours = self.trace_contours_original
-        self.trace_hierarchy = self.trace_hierarchy_original
-        self.front_pad_map = self.front_pad_map_original
-        self.board_connections_dict = self.board_connections_dict_original
 
-        if self.double_sided:
-            self.pcb_rgb_back = self.pcb_rgb_back_original.copy()
-            self.trace_back_contours = self.trace_back_contours_original
-            self.trace_back_hierarchy = self.trace_back_hierarchy_original
-            self.back_pad_map = self.back_pad_map_original
+    def update_profile(self, pcb_rgb, pcb_rgb_back = [], incremental=True):
+        '''
+            rebuilds the profile after the trace images changed (e.g. trace cuts)
 
+            Parameters:
+            pcb_rgb (image) - new front trace image
 
-    def update_profile(self, pcb_rgb, pcb_rgb_back = []):
-        self.pcb_rgb = pcb_rgb
-        
-        t_img_grey = cv2.cvtColor(self.pcb_rgb, cv2.COLOR_BGR2GRAY)
-        self.trace_contours, self.trace_hierarchy = cv2.findContours(t_img_grey, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
+            Optional:
+            pcb_rgb_back (image) - new back trace image (double sided boards)
+            incremental (bool) - only recompute the connectivity of the trace contours the change touched, reusing the results of the others
+        '''
+        if not hasattr(self, 'contour_profile_cache'):
+            incremental = False
+
+        # a layer passed unchanged (same array) keeps its contours
+        if pcb_rgb is not self.pcb_rgb:
+            self.pcb_rgb = pcb_rgb
+
+            t_img_grey = cv2.cvtColor(self.pcb_rgb, cv2.COLOR_BGR2GRAY)
+            self.trace_contours, self.trace_hierarchy = cv2.findContours(t_img_grey, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
 
 
         if len(pcb_rgb_back) != 0:
-            self.pcb_rgb_back = pcb_rgb_back
+            if pcb_rgb_back is not self.pcb_rgb_back:
+                self.pcb_rgb_back = pcb_rgb_back
 
-            tb_img_grey = cv2.cvtColor(self.pcb_rgb_back, cv2.COLOR_BGR2GRAY)
-            self.trace_back_contours, self.trace_back_hierarchy = cv2.findContours(tb_img_grey, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
+                tb_img_grey = cv2.cvtColor(self.pcb_rgb_back, cv2.COLOR_BGR2GRAY)
+                self.trace_back_contours, self.trace_back_hierarchy = cv2.findContours(tb_img_grey, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
 
-            self.create_updated_vias_profile()
+            self.create_updated_vias_profile(incremental=incremental)
 
         else:
-            self.create_profile()
+            self.create_profile(incremental=incremental)
 
-    def copy_self(self):
+        if incremental:
+            self.contour_profile_cache.prune()
 
-        new_pcb = PCB_Board(self.pcb_file)
+    def copy_self(self):
+        '''
+            Returns:
+            (PCB_Board) board with the same state. Layer images, contours and snapshots are shared (they are never modified in place)
+        '''
+        new_pcb = PCB_Board(self.pcb_file, trace_backend=self.trace_backend, hole_backend=self.hole_backend)
         
         new_pcb.board_connections_dict = self.board_connections_dict
+        if hasattr(self, 'pad_trace_index'):
+            new_pcb.pad_trace_index = self.pad_trace_index
+        if hasattr(self, 'contour_profile_cache'):
+            new_pcb.contour_profile_cache = self.contour_profile_cache
 
-        new_pcb.pcb_rgb = self.pcb_rgb.copy()
-        new_pcb.mask_rgb = self.mask_rgb.copy()
+        new_pcb.pcb_rgb = self.pcb_rgb
+        new_pcb.mask_rgb = self.mask_rgb
         new_pcb.mask_contours = self.mask_contours
         new_pcb.trace_contours = self.trace_contours
         new_pcb.trace_hierarchy = self.trace_hierarchy
         new_pcb.front_pad_map = self.front_pad_map.copy()
+        if hasattr(self, 'front_pad_index'):
+            new_pcb.front_pad_index = self.front_pad_index
 
         #self.double_sided = False
         #CHANGE BACK
 
         if self.double_sided:
             new_pcb.hole_arr = self.hole_arr
-            new_pcb.pcb_rgb_back = self.pcb_rgb_back.copy()
-            new_pcb.mask_rgb_back = self.mask_rgb_back.copy()
+            new_pcb.pcb_rgb_back = self.pcb_rgb_back
+            new_pcb.mask_rgb_back = self.mask_rgb_back
             new_pcb.trace_back_contours = self.trace_back_contours
             new_pcb.trace_back_hierarchy = self.trace_back_hierarchy
             new_pcb.mask_back_contours = self.mask_back_contours
             new_pcb.back_pad_map = self.back_pad_map.copy()
+            if hasattr(self, 'back_pad_index'):
+                new_pcb.back_pad_index = self.back_pad_index
 
         if hasattr(self, 'trace_cuts'):
             new_pcb.trace_cuts = self.trace_cuts
 
+        if hasattr(self, 'original_snapshot'):
+            new_pcb.original_snapshot = self.original_snapshot
 
-        if hasattr(self, 'pcb_rgb_original'):
-            new_pcb.pcb_rgb_original = self.pcb_rgb_original.copy()
-            new_pcb.trace_contours_original = self.trace_contours_original
-            new_pcb.trace_hierarchy_original = self.trace_hierarchy_original
-            new_pcb.front_pad_map_original = self.front_pad_map_original
-            new_pcb.board_connections_dict_original = self.board_connections_dict_original
-
-            if hasattr(self, 'pcb_rgb_back_original') and self.double_sided:
-                new_pcb.pcb_rgb_back_original = self.pcb_rgb_back_original.copy()
-                new_pcb.trace_back_contours_original = self.trace_back_contours_original
-                new_pcb.trace_back_hierarchy_original = self.trace_back_hierarchy_original
-                new_pcb.back_pad_map_original = self.back_pad_map_original
-
-        if hasattr(self, 'pcb_rgb_previous'):
-            new_pcb.pcb_rgb_previous = self.pcb_rgb_previous.copy()
-            new_pcb.trace_contours_previous = self.trace_contours_previous
-            new_pcb.trace_hierarchy_previous = self.trace_hierarchy_previous
-            new_pcb.front_pad_map_previous = self.front_pad_map_previous
-            new_pcb.board_connections_dict_previous = self.board_connections_dict_previous
-
-            if self.double_sided:
-                new_pcb.pcb_rgb_back_previous = self.pcb_rgb_back_previous.copy()
-                new_pcb.trace_back_contours_previous = self.trace_back_contours_previous
-                new_pcb.trace_back_hierarchy_previous = self.trace_back_hierarchy_previous
-                new_pcb.back_pad_map_previous = self.back_pad_map_previous
-
-
+        if hasattr(self, 'previous_snapshot'):
+            new_pcb.previous_snapshot = self.previous_snapshot
 
         return new_pcb
 
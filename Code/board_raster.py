@@ -0,0 +1,306 @@
+"""
+    Holds the in-process board layer rasterizer.
+    Draws the mask and copper layers of a .kicad_pcb (pads, tracks, arcs, vias, filled zones and graphic items) straight from the board file,
+    in place of the kicad-cli svg export + svg_to_png_gen round trip, and lists the drill holes of the board in the layout of getHolesFromDRL
+"""
+
+import cv2
+import numpy as np
+
+import sexpr
+from kicad_mod import KicadMod
+from identifyHoles import Hole
+from footprint_raster import on_layer, pad_shape, hole_shape, place, transform, circle, three_point_arc, outline_bounds, draw_outlines
+
+
+BOARD_PX_PER_MM = 300 / 25.4 * 4 # svg_to_png_gen renders at 300 dpi with scale 4
+BOARD_SUPERSAMPLE = 2 # boards are much larger than footprints, keeps the supersampled image of a 10cm board under 100MB
+
+BOARD_LAYERS = ['F.Mask', 'F.Cu', 'B.Mask', 'B.Cu']
+BOARD_SECTIONS = ['setup', 'footprint', 'segment', 'arc', 'via', 'zone', 'gr_line', 'gr_rect', 'gr_circle', 'gr_arc', 'gr_poly']
+
+def child(item, name):
+    '''
+        Returns:
+        (array) first list in item starting with name, None if there is none
+    '''
+    for sub in item:
+        if isinstance(sub, list) and len(sub) > 0 and sub[0] == name:
+            return sub
+
+    return None
+
+def children(item, name):
+    return [sub for sub in item if isinstance(sub, list) and len(sub) > 0 and sub[0] == name]
+
+def value(item, name, default=None):
+    '''
+        Returns:
+        second element of the first list in item starting with name (e.g. value(segment, 'width'))
+    '''
+    sub = child(item, name)
+    if sub is None or len(sub) < 2:
+        return default
+
+    return sub[1]
+
+def point(item, name):
+    sub = child(item, name)
+
+    return np.array(sub[1:3], dtype=np.float64)
+
+def stroke_width(item):
+    stroke = child(item, 'stroke')
+    if stroke is not None:
+        return value(stroke, 'width', 0)
+
+    return value(item, 'width', 0)
+
+def poly_points(pts):
+    '''
+        Returns:
+        (array) [x, y] points of a pts list (arcs are broken into segments)
+    '''
+    points = []
+    for pt in pts[1:]:
+        if pt[0] == 'xy':
+            points.append(pt[1:3])
+        elif pt[0] == 'arc':
+            points += list(three_point_arc(point(pt, 'start'), point(pt, 'mid'), point(pt, 'end')))
+
+    return np.array(points, dtype=np.float64)
+
+def graphic_outlines(item):
+    '''
+        outline of a graphic item (gr_line, gr_rect, gr_circle, gr_arc, gr_poly or their fp_ counterparts)
+
+        Returns:
+        polygons (array) - filled outlines
+        strokes (array) - (points, width, closed) outlines drawn with a width
+    '''
+    kind = item[0].split('_')[-1]
+    width = stroke_width(item)
+    fill = value(item, 'fill', 'none' if kind != 'poly' else 'solid')
+    filled = fill in ['solid', 'yes']
+
+    if kind == 'line':
+        return [], [(np.array([point(item, 'start'), point(item, 'end')]), width, False)]
+    elif kind == 'arc':
+        return [], [(three_point_arc(point(item, 'start'), point(item, 'mid'), point(item, 'end')), width, False)]
+    elif kind == 'rect':
+        (x1, y1), (x2, y2) = point(item, 'start'), point(item, 'end')
+        outline = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]])
+    elif kind == 'circle':
+        center = point(item, 'center')
+        outline = circle(center[0], center[1], np.linalg.norm(point(item, 'end') - center))
+    elif kind == 'poly':
+        outline = poly_points(child(item, 'pts'))
+    else:
+        return [], []
+
+    polygons = [outline] if filled else []
+    strokes = [(outline, width, True)] if width > 0 or not filled else []
+
+    return polygons, strokes
+
+class BoardLayers():
+    '''
+        outlines (in board mm) of the layers of a .kicad_pcb
+
+        Properties include
+        layers (dict) - layer name -> {'polygons': filled outlines, 'strokes': (points, width, closed) outlines}
+        holes (array) - drill hole outlines
+        hole_arr (array) - Hole objects of the drill holes, coordinates in mm with y negated (as read from the drill file by getHolesFromDRL)
+        edges (dict) - outlines of Edge.Cuts in the same layout as layers
+    '''
+    def __init__(self, pcb_file, layers=BOARD_LAYERS):
+        self.pcb_file = pcb_file
+        self.layers = {layer: {'polygons': [], 'strokes': []} for layer in layers}
+        self.edges = {'polygons': [], 'strokes': []}
+        self.holes = []
+        self.hole_arr = []
+
+        with open(pcb_file) as f:
+            board = sexpr.read_sexp(f.read(), sections=BOARD_SECTIONS)
+
+        setup = child(board, 'setup')
+        self.mask_margin = value(setup, 'pad_to_mask_clearance', 0) if setup is not None else 0
+
+        for item in board[1:]:
+            if not isinstance(item, list) or len(item) == 0:
+                continue
+
+            if item[0] == 'footprint':
+                self.add_footprint(item)
+            elif item[0] in ['segment', 'arc']:
+                self.add_track(item)
+            elif item[0] == 'via':
+                self.add_via(item)
+            elif item[0] == 'zone':
+                self.add_zone(item)
+            elif item[0].startswith('gr_'):
+                self.add_graphic(item, value(item, 'layer'))
+
+        self.hole_arr.sort(key=lambda hole: (hole.diameter, hole.coordinates))
+
+    def add(self, layer, polygons, strokes):
+        if layer == 'Edge.Cuts':
+            target = self.edges
+        elif layer in self.layers:
+            target = self.layers[layer]
+        else:
+            return
+
+        target['polygons'] += polygons
+        target['strokes'] += [stroke for stroke in strokes if stroke[1] > 0]
+
+    def add_graphic(self, item, layer, x=0, y=0, orientation=0):
+        if layer != 'Edge.Cuts' and layer not in self.layers:
+            return
+
+        polygons, strokes = graphic_outlines(item)
+        polygons = [transform(polygon, x, y, orientation) for polygon in polygons]
+        strokes = [(transform(points, x, y, orientation), width, closed) for points, width, closed in strokes]
+
+        self.add(layer, polygons, strokes)
+
+    def add_hole(self, outline, diameter, x, y, plated):
+        self.holes.append(outline)
+        self.hole_arr.append(Hole(diameter=diameter, isPlated=plated, isVia=False, coordinates=(float(x), -float(y))))
+
+    def add_footprint(self, item):
+        at = child(item, 'at')
+        fx, fy = at[1], at[2]
+        fa = at[3] if len(at) > 3 else 0
+
+        for sub in item:
+            if isinstance(sub, list) and len(sub) > 0 and sub[0] in ['fp_line', 'fp_rect', 'fp_circle', 'fp_arc', 'fp_poly']:
+                self.add_graphic(sub, value(sub, 'layer'), fx, fy, fa)
+
+        # only the pads are handed to KicadMod, its lookups search the whole list
+        fp = KicadMod(data=[item[0], item[1]] + children(item, 'pad'))
+        fp_mask_margin = value(item, 'solder_mask_margin', 0)
+        for pad in fp.pads:
+            # pad positions are relative to the footprint, pad orientations already include the footprint's
+            (x, y), = transform([[pad['pos']['x'], pad['pos']['y']]], fx, fy, fa)
+            pad['pos'] = {'x': x, 'y': y, 'orientation': pad['pos']['orientation']}
+
+            polygons, strokes = pad_shape(pad)
+            polygons = [place(polygon, pad) for polygon in polygons]
+            strokes = [(place(points, pad), width, closed) for points, width, closed in strokes]
+
+            for layer in self.layers.keys():
+                if not on_layer(pad['layers'], layer):
+                    continue
+
+                if layer.endswith('.Mask'):
+                    margin = self.pad_mask_margin(pad, fp_mask_margin)
+                    if margin > 0:
+                        # solder mask openings are the pad grown by the margin
+                        self.add(layer, polygons, strokes + [(polygon, 2 * margin, True) for polygon in polygons] + [(points, width + 2 * margin, closed) for points, width, closed in strokes])
+                        continue
+
+                self.add(layer, polygons, strokes)
+
+            hole = hole_shape(pad)
+            if hole is not None:
+                drill = pad['drill']
+                offset = [[drill['offset']['x'], drill['offset']['y']]] if drill.get('offset', {}) != {} else [[0, 0]]
+                (hx, hy), = place(offset, pad)
+                self.add_hole(place(hole, pad), min(drill['size']['x'], drill['size']['y']), hx, hy, str(pad['type']) != 'np_thru_hole')
+
+    def pad_mask_margin(self, pad, fp_mask_margin):
+        '''
+            Returns:
+            (float) solder mask margin of the pad (pad, else footprint, else board setting)
+        '''
+        if pad['solder_mask_margin'] != {} and pad['solder_mask_margin'] != 0:
+            return pad['solder_mask_margin']
+        if fp_mask_margin != 0:
+            return fp_mask_margin
+
+        return self.mask_margin
+
+    def add_track(self, item):
+        if item[0] == 'arc':
+            points = three_point_arc(point(item, 'start'), point(item, 'mid'), point(item, 'end'))
+        else:
+            points = np.array([point(item, 'start'), point(item, 'end')])
+
+        self.add(value(item, 'layer'), [], [(points, value(item, 'width', 0), False)])
+
+    def add_via(self, item):
+        (x, y) = point(item, 'at')
+        size = value(item, 'size')
+        drill = value(item, 'drill')
+
+        layers = child(item, 'layers')[1:]
+        for layer in self.layers.keys():
+            # vias are tented, they only show on copper layers
+            if layer.endswith('.Cu') and on_layer(layers, layer):
+                self.add(layer, [circle(x, y, size / 2)], [])
+
+        self.add_hole(circle(x, y, drill / 2), drill, x, y, True)
+
+    def add_zone(self, item):
+        # fills of older boards are drawn with an outline of min_thickness
+        thickness = value(item, 'min_thickness', 0) if value(item, 'filled_areas_thickness') != 'no' else 0
+
+        for filled_polygon in children(item, 'filled_polygon'):
+            outline = poly_points(child(filled_polygon, 'pts'))
+            strokes = [(outline, thickness, True)] if thickness > 0 else []
+            self.add(value(filled_polygon, 'layer'), [outline], strokes)
+
+    def frame(self):
+        '''
+            area of the board images (the Edge.Cuts bounds, like kicad-cli's board area page size)
+
+            Returns:
+            origin (array) - [x, y] mm at the top left corner of the images
+            size (array) - [w, h] mm of the images
+        '''
+        top_left, bottom_right = outline_bounds(self.edges['polygons'], self.edges['strokes'])
+        if top_left is None:
+            outlines = [(layer['polygons'], layer['strokes']) for layer in self.layers.values()]
+            top_left, bottom_right = outline_bounds(sum([polygons for polygons, strokes in outlines], []), sum([strokes for polygons, strokes in outlines], []))
+
+        return top_left, bottom_right - top_left
+
+    def rasterize(self, px_per_mm=BOARD_PX_PER_MM, supersample=BOARD_SUPERSAMPLE):
+        '''
+            Parameters:
+            px_per_mm (float) - resolution of the images
+
+            Returns:
+            (dict) layer name -> BGR image of the layer (black on white, drill holes white on copper layers)
+        '''
+        origin, size = self.frame()
+        w, h = (size * px_per_mm).astype(int)
+
+        images = {}
+        for layer, outlines in self.layers.items():
+            # drill holes are cleared from the copper plots only
+            holes = self.holes if layer.endswith('.Cu') else []
+            img = draw_outlines(outlines['polygons'], outlines['strokes'], holes, origin, w, h, px_per_mm, supersample)
+            images[layer] = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+        return images
+
+def rasterize_board(pcb_file, layers=BOARD_LAYERS, px_per_mm=BOARD_PX_PER_MM):
+    '''
+        draws the layers of a board the way gui.generatePCBimg exports them (kicad-cli svg export + svg_to_png_gen)
+
+        Parameters:
+        pcb_file (str) - .kicad_pcb file path
+
+        Optional:
+        layers (array) - names of the layers to draw
+        px_per_mm (float) - resolution of the images
+
+        Returns:
+        images (dict) - layer name -> BGR image of the layer
+        hole_arr (array) - Hole objects of the drill holes (as returned by getHolesFromDRL)
+    '''
+    board = BoardLayers(pcb_file, layers)
+
+    return board.rasterize(px_per_mm), board.hole_arr
@@ -0,0 +1,111 @@
+"""
+    Holds the in-process cache of parsed KiCad documents (Objectifier trees).
+    Entries are keyed by path, mtime and size, so each design file is tokenized once per process
+    and parsed again only after it changes on disk
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from Objectifier import Objectifier
+
+
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024 # bytes
+TREE_BYTES_PER_FILE_BYTE = 25 # measured size of an indexed Objectifier tree relative to its .kicad_pcb
+
+class DocumentCache():
+    '''
+        Least recently used cache of parsed documents.
+        The memory of a tree is estimated from the size of its file, and the least recently used trees are dropped once the estimate exceeds max_memory.
+        Trees are shared between callers and must not be modified.
+
+        Properties include
+        max_memory (int) - maximum estimated memory of the cached trees in bytes
+        entries (OrderedDict) - (path, mtime, size) -> Objectifier, least recently used first
+        memory (int) - estimated memory of the cached trees in bytes
+    '''
+    def __init__(self, max_memory=DEFAULT_MAX_MEMORY):
+        self.max_memory = max_memory
+        self.entries = OrderedDict()
+        self.memory = 0
+        self._lock = threading.Lock()
+
+    def key(self, path):
+        '''
+            Returns:
+            (tuple) cache key of the file as it is on disk
+        '''
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, path):
+        '''
+            parsed document, parsing the file on a miss
+
+            Parameters:
+            path (str) - path to a s-expression file (.kicad_pcb, .kicad_sch, .net)
+
+            Returns:
+            (Objectifier) parsed document
+        '''
+        key = self.key(path)
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        document = Objectifier(path)
+
+        with self._lock:
+            if key not in self.entries:
+                # drop older versions of the same file
+                for old_key in [old_key for old_key in self.entries.keys() if old_key[0] == key[0]]:
+                    self._remove(old_key)
+
+                self.entries[key] = document
+                self.memory += key[2] * TREE_BYTES_PER_FILE_BYTE
+                self.evict()
+
+        return document
+
+    def _remove(self, key):
+        del self.entries[key]
+        self.memory -= key[2] * TREE_BYTES_PER_FILE_BYTE
+
+    def evict(self):
+        '''
+            removes least recently used documents until the estimate fits in max_memory (the newest document is always kept)
+        '''
+        while self.memory > self.max_memory and len(self.entries) > 1:
+            self._remove(next(iter(self.entries)))
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.memory = 0
+
+# cache shared in process
+_document_cache = DocumentCache()
+
+def get_document_cache():
+    '''
+        Returns:
+        (DocumentCache) cache shared in process (size set by $PROTOPCB_DOCUMENT_CACHE_MB if set)
+    '''
+    if 'PROTOPCB_DOCUMENT_CACHE_MB' in os.environ:
+        _document_cache.max_memory = int(os.environ['PROTOPCB_DOCUMENT_CACHE_MB']) * 1024 * 1024
+
+    return _document_cache
+
+def load_document(path):
+    '''
+        Parameters:
+        path (str) - path to a s-expression file (.kicad_pcb, .kicad_sch, .net)
+
+        Returns:
+        (Objectifier) parsed document, shared with every other caller until the file changes
+    '''
+    return get_document_cache().get(path)
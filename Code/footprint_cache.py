@@ -0,0 +1,386 @@
+"""
+    Holds the on-disk footprint image cache.
+    Rendered footprint images (kicad-cli svg export + gen_footprint_PNG, or footprint_raster if opted in) are stored
+    keyed by library, footprint name, .kicad_mod contents, render scale and renderer (kicad-cli version)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from svg_edit import gen_footprint_PNG
+from footprint_raster import write_footprint_png
+
+
+DEFAULT_MAX_CACHE_SIZE = 512 * 1024 * 1024 # bytes
+RENDER_SCALE = 4
+RENDERERS = ['raster', 'kicad-cli']
+DEFAULT_RENDERER = 'kicad-cli'
+RASTER_VERSION = 'footprint_raster 1'
+
+def file_hash(file):
+    '''
+        sha1 of a file's contents
+
+        Parameters:
+        file (str) - path to file
+
+        Returns:
+        (str) hex digest
+    '''
+    sha = hashlib.sha1()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+class FootprintCache():
+    '''
+        Content addressed cache of footprint images.
+        Each entry is a directory (named by its key) holding footprint.png and meta.json.
+        Entries are built in a private temp directory and renamed into place, so concurrent writers never see half written entries.
+        Entry directory mtimes are refreshed on every hit and the least recently used entries are evicted once the cache exceeds max_size.
+
+        Properties include
+        cache_dir (str) - directory holding the entries
+        kicad_cli (str) - path to access kicad command line interface tool
+        max_size (int) - maximum size of the cache in bytes
+        scale (int) - render scale passed to svg2png (300 dpi * scale for the rasterizer)
+        renderer (str) - 'kicad-cli' (default) exports the pads with KiCad, 'raster' draws them in process
+            (opt-in with renderer='raster' or PROTOPCB_FP_RENDERER=raster)
+    '''
+    def __init__(self, cache_dir, kicad_cli, max_size=DEFAULT_MAX_CACHE_SIZE, scale=RENDER_SCALE, renderer=None):
+        if renderer is None:
+            renderer = os.environ.get('PROTOPCB_FP_RENDERER', DEFAULT_RENDERER)
+        if renderer not in RENDERERS:
+            raise ValueError(f"unknown footprint renderer '{renderer}', expected one of {RENDERERS}")
+
+        self.cache_dir = cache_dir
+        self.kicad_cli = kicad_cli
+        self.max_size = max_size
+        self.scale = scale
+        self.renderer = renderer
+        self._cli_version = None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def cli_version(self):
+        '''
+            version of kicad-cli (renders can differ between versions), looked up once
+        '''
+        if self._cli_version is None:
+            try:
+                complete = subprocess.run([self.kicad_cli, "version"], capture_output=True, text=True)
+                self._cli_version = complete.stdout.strip()
+            except OSError:
+                self._cli_version = ''
+
+        return self._cli_version
+
+    def renderer_version(self):
+        '''
+            identifies the renderer output (kicad-cli version or rasterizer version)
+        '''
+        if self.renderer == 'raster':
+            return RASTER_VERSION
+
+        return self.cli_version()
+
+    def px_per_mm(self):
+        return 300 / 25.4 * self.scale
+
+    def key(self, fp_parent_file, footprint):
+        '''
+            Parameters:
+            fp_parent_file (str) - path to .pretty library
+            footprint (str) - footprint name in library
+
+            Returns:
+            (str) cache key, None if the footprint file doesn't exist
+        '''
+        fp_file = fp_parent_file + "/" + footprint + ".kicad_mod"
+        if not os.path.isfile(fp_file):
+            return None
+
+        key_str = '|'.join([os.path.abspath(fp_parent_file), footprint, file_hash(fp_file), str(self.scale), self.renderer_version()])
+
+        return hashlib.sha1(key_str.encode()).hexdigest()
+
+    def entry_dir(self, key):
+        return self.cache_dir + "/" + key
+
+    def lookup(self, fp_parent_file, footprint):
+        '''
+            Returns:
+            (str) directory of the cached entry, None if not cached
+        '''
+        key = self.key(fp_parent_file, footprint)
+        if key is None:
+            return None
+
+        entry = self.entry_dir(key)
+        try:
+            os.utime(entry)
+        except OSError:
+            return None
+
+        return entry
+
+    def _install(self, key, fp_parent_file, footprint, png_file):
+        '''
+            moves a rendered png into a new entry (no-op if another writer already added it)
+        '''
+        entry_tmp = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+
+        shutil.move(png_file, entry_tmp + "/footprint.png")
+
+        meta = {'library': os.path.abspath(fp_parent_file), 'footprint': footprint, 'scale': self.scale, 'renderer': self.renderer_version()}
+        with open(entry_tmp + "/meta.json", 'w') as f:
+            json.dump(meta, f)
+
+        entry = self.entry_dir(key)
+        try:
+            os.rename(entry_tmp, entry)
+        except OSError:
+            #entry was completed by a different process first
+            shutil.rmtree(entry_tmp, ignore_errors=True)
+
+        return entry
+
+    def render(self, fp_parent_file, footprint):
+        '''
+            renders the footprint (with the rasterizer or kicad-cli) and stores it
+
+            Returns:
+            (str) directory of the new entry, None if the footprint could not be rendered
+        '''
+        key = self.key(fp_parent_file, footprint)
+        if key is None:
+            return None
+
+        build_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.build-')
+        try:
+            if self.renderer == 'raster':
+                png_file = write_footprint_png(fp_parent_file + "/" + footprint + ".kicad_mod", build_dir + "/" + footprint + ".png", self.px_per_mm())
+            else:
+                try:
+                    complete = subprocess.run([self.kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", build_dir, "--fp", footprint, "--black-and-white", "-l", "F.Cu"])
+                except OSError:
+                    #kicad-cli is not installed or can't be run
+                    return None
+                svg_file = build_dir + "/" + footprint + ".svg"
+                if complete.returncode != 0 or not os.path.isfile(svg_file):
+                    return None
+
+                gen_footprint_PNG(svg_file, scale=self.scale)
+                png_file = svg_file[:-3] + "png"
+
+            entry = self._install(key, fp_parent_file, footprint, png_file)
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+        self.evict()
+
+        return entry
+
+    def get(self, fp_parent_file, footprint):
+        '''
+            cached entry for footprint, rendering it on a miss
+
+            Parameters:
+            fp_parent_file (str) - path to .pretty library
+            footprint (str) - footprint name in library
+
+            Returns:
+            (str) directory of the entry, None if the footprint could not be found or rendered
+        '''
+        entry = self.lookup(fp_parent_file, footprint)
+        if entry is None:
+            entry = self.render(fp_parent_file, footprint)
+
+        return entry
+
+    def export_png(self, fp_parent_file, footprint, temp_dir):
+        '''
+            places the footprint image at temp_dir/<footprint>.png (where the matching code reads it).
+            An image that is already there is kept as is (nothing is rendered) unless the cache wrote it and its entry has changed since.
+            The hash of each image the cache writes is kept next to it in temp_dir/.<footprint>.png.sha1
+
+            Returns:
+            (str) path of the png, None if there is no png and the footprint could not be found or rendered
+        '''
+        png_file = temp_dir + "/" + footprint + ".png"
+        hash_file = temp_dir + "/." + footprint + ".png.sha1"
+
+        png_hash = None
+        if os.path.isfile(png_file):
+            png_hash = file_hash(png_file)
+            try:
+                with open(hash_file, 'r') as f:
+                    written_hash = f.read().strip()
+            except OSError:
+                written_hash = None
+
+            # images the cache didn't write (or that were edited since) are never replaced
+            if png_hash != written_hash:
+                return png_file
+
+        entry = self.get(fp_parent_file, footprint)
+        if entry is None:
+            return None
+
+        entry_png = entry + "/footprint.png"
+        entry_hash = file_hash(entry_png)
+
+        # an image that is already in place is left untouched
+        if png_hash == entry_hash:
+            return png_file
+
+        fd, tmp_file = tempfile.mkstemp(dir=temp_dir, suffix='.png')
+        os.close(fd)
+        shutil.copyfile(entry_png, tmp_file)
+        os.replace(tmp_file, png_file)
+
+        with open(hash_file, 'w') as f:
+            f.write(entry_hash)
+
+        return png_file
+
+    def prewarm(self, fp_parent_file):
+        '''
+            renders every footprint of a .pretty library that isn't cached yet (with a single kicad-cli call for the kicad-cli renderer)
+
+            Parameters:
+            fp_parent_file (str) - path to .pretty library
+
+            Returns:
+            (int) number of footprints added
+        '''
+        missing = {}
+        for file in sorted(os.listdir(fp_parent_file)):
+            if file.endswith('.kicad_mod'):
+                footprint = file[:-len('.kicad_mod')]
+                if self.lookup(fp_parent_file, footprint) is None:
+                    missing[footprint] = self.key(fp_parent_file, footprint)
+
+        if len(missing) == 0:
+            return 0
+
+        added = 0
+        build_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.build-')
+        try:
+            if self.renderer == 'kicad-cli':
+                try:
+                    subprocess.run([self.kicad_cli, "fp", "export", "svg", fp_parent_file, "-o", build_dir, "--black-and-white", "-l", "F.Cu"])
+                except OSError:
+                    #kicad-cli is not installed or can't be run
+                    return 0
+
+            for footprint, key in missing.items():
+                png_file = build_dir + "/" + footprint + ".png"
+                try:
+                    if self.renderer == 'raster':
+                        write_footprint_png(fp_parent_file + "/" + footprint + ".kicad_mod", png_file, self.px_per_mm())
+                    else:
+                        svg_file = build_dir + "/" + footprint + ".svg"
+                        if not os.path.isfile(svg_file):
+                            continue
+                        gen_footprint_PNG(svg_file, scale=self.scale)
+                except Exception as e:
+                    print(f'could not render {footprint}: {e}')
+                    continue
+
+                self._install(key, fp_parent_file, footprint, png_file)
+                added += 1
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+        self.evict()
+
+        return added
+
+    def evict(self):
+        '''
+            removes least recently used entries until the cache fits in max_size
+        '''
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('.'):
+                continue
+            entry = self.entry_dir(name)
+            try:
+                size = sum(os.path.getsize(entry + "/" + file) for file in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, entry))
+            except OSError:
+                continue
+            total_size += size
+
+        entries.sort()
+        for mtime, size, entry in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+# caches shared in process, keyed by cache directory and kicad-cli path
+_footprint_caches = {}
+_footprint_caches_lock = threading.Lock()
+
+def get_footprint_cache(temp_dir, kicad_cli):
+    '''
+        Returns:
+        (FootprintCache) cache stored in temp_dir/footprint_cache (or $PROTOPCB_FP_CACHE if set)
+    '''
+    cache_dir = os.environ.get('PROTOPCB_FP_CACHE', temp_dir + "/footprint_cache")
+    with _footprint_caches_lock:
+        if (cache_dir, kicad_cli) not in _footprint_caches:
+            _footprint_caches[(cache_dir, kicad_cli)] = FootprintCache(cache_dir, kicad_cli)
+
+        return _footprint_caches[(cache_dir, kicad_cli)]
+
+def prepare_footprint_png(temp_dir, kicad_cli, fp_parent_file, footprint):
+    '''
+        Puts the image of a footprint at temp_dir/<footprint>.png, rendering it only if it isn't cached (an image placed there by other means is used as is).
+        Falls back to the KiCad.pretty library in temp_dir if the footprint can't be rendered from fp_parent_file.
+
+        Parameters:
+        temp_dir (str) - directory where to output temp image files
+        kicad_cli (str) - path to access kicad command line interface tool
+        fp_parent_file (str) - path to .pretty library
+        footprint (str) - footprint name in library
+
+        Returns:
+        fp_file_png (str) - path of the footprint image
+        fp_parent_file (str) - path of the .pretty library the footprint was found in
+    '''
+    cache = get_footprint_cache(temp_dir, kicad_cli)
+
+    fp_file_png = cache.export_png(fp_parent_file, footprint, temp_dir)
+    if fp_file_png is None:
+        print('did not return')
+        fp_parent_file = temp_dir + "/Footprint Libraries/KiCad.pretty"
+        fp_file_png = cache.export_png(fp_parent_file, footprint, temp_dir)
+
+    if fp_file_png is None:
+        #not renderable, leave any image already placed in temp_dir
+        fp_file_png = temp_dir + "/" + footprint + ".png"
+
+    return fp_file_png, fp_parent_file
+
+if __name__ == '__main__':
+    import sys
+
+    # python footprint_cache.py <kicad-cli> <temp dir> <library.pretty> [<library.pretty> ...]
+    if len(sys.argv) < 4:
+        print('usage: footprint_cache.py <kicad-cli> <temp dir> <library.pretty> [<library.pretty> ...]')
+        sys.exit(1)
+
+    cache = get_footprint_cache(sys.argv[2], sys.argv[1])
+    for library in sys.argv[3:]:
+        print(library, cache.prewarm(library), 'footprints added')
@@ -0,0 +1,362 @@
+"""
+    Holds the in-process footprint rasterizer.
+    Draws the front copper pads of a .kicad_mod (as parsed by KicadMod._getPads) straight into an image,
+    equivalent to the kicad-cli svg export + gen_footprint_PNG pipeline but without KiCad or temp files
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+from kicad_mod import load_pads
+
+
+FOOTPRINT_PX_PER_MM = 300 / 25.4 * 4 # gen_footprint_PNG renders at 300 dpi with scale 4
+MARGIN = 0.1 # mm of white around the pads (as in gen_footprint_PNG)
+ARC_SEGMENTS = 16 # segments per quarter circle
+SHIFT = 8 # fractional bits of the pixel coordinates passed to cv2
+SUPERSAMPLE = 4 # pads are drawn at this multiple of the resolution and area averaged down (anti-aliasing by pixel coverage)
+
+def on_layer(layers, layer):
+    '''
+        Parameters:
+        layers (array) - layer names of a pad or via (may use the '*.Cu' and 'F&B.Cu' wildcards)
+        layer (str) - layer name, e.g. 'F.Cu'
+
+        Returns:
+        (bool) True if layer is one of layers
+    '''
+    kind = layer.split('.')[-1]
+    layers = [str(name) for name in layers]
+
+    return layer in layers or '*.' + kind in layers or 'F&B.' + kind in layers
+
+def is_front_copper(pad):
+    '''
+        Returns:
+        (bool) True if the pad has copper on the front layer
+    '''
+    return on_layer(pad['layers'], 'F.Cu')
+
+def arc_points(cx, cy, r, start_angle, end_angle, segments=ARC_SEGMENTS):
+    '''
+        points along an arc (angles in degrees, segments per quarter circle)
+
+        Returns:
+        (array) [x, y] points
+    '''
+    n = max(2, int(math.ceil(abs(end_angle - start_angle) / 90 * segments)) + 1)
+    angles = np.radians(np.linspace(start_angle, end_angle, n))
+
+    return np.stack([cx + r * np.cos(angles), cy + r * np.sin(angles)], axis=1)
+
+def rounded_rect(sx, sy, r):
+    '''
+        outline of a sx by sy rectangle centered on the origin with corner radius r
+
+        Returns:
+        (array) [x, y] points
+    '''
+    r = min(r, sx / 2, sy / 2)
+    if r <= 0:
+        return np.array([[-sx / 2, -sy / 2], [sx / 2, -sy / 2], [sx / 2, sy / 2], [-sx / 2, sy / 2]])
+
+    hx = sx / 2 - r
+    hy = sy / 2 - r
+
+    return np.concatenate([arc_points(hx, hy, r, 0, 90), arc_points(-hx, hy, r, 90, 180), arc_points(-hx, -hy, r, 180, 270), arc_points(hx, -hy, r, 270, 360)])
+
+def chamfered_rect(sx, sy, r, c, corners):
+    '''
+        outline of a sx by sy rectangle centered on the origin, corners cut by c and the other corners rounded with radius r
+
+        Parameters:
+        corners (array) - chamfered corners ('top_left', 'top_right', 'bottom_left', 'bottom_right')
+
+        Returns:
+        (array) [x, y] points
+    '''
+    r = min(r, sx / 2, sy / 2)
+    c = min(c, sx / 2, sy / 2)
+
+    points = []
+    # corners in the order of rounded_rect, with the angle of their first edge
+    for name, px, py, angle in [('bottom_right', 1, 1, 0), ('bottom_left', -1, 1, 90), ('top_left', -1, -1, 180), ('top_right', 1, -1, 270)]:
+        corner = np.array([px * sx / 2, py * sy / 2])
+        first = np.array([math.cos(math.radians(angle)), math.sin(math.radians(angle))]).round()
+        second = np.array([math.cos(math.radians(angle + 90)), math.sin(math.radians(angle + 90))]).round()
+
+        if name in corners and c > 0:
+            points += [corner - c * second, corner - c * first]
+        elif r > 0:
+            points += list(arc_points(*(corner - r * first - r * second), r, angle, angle + 90))
+        else:
+            points.append(corner)
+
+    return np.array(points)
+
+def circle(cx, cy, r):
+    return arc_points(cx, cy, r, 0, 360, ARC_SEGMENTS * 2)[:-1]
+
+def three_point_arc(start, mid, end, segments=ARC_SEGMENTS):
+    '''
+        points along the arc through start, mid and end (each an [x, y])
+
+        Returns:
+        (array) [x, y] points
+    '''
+    (x1, y1), (x2, y2), (x3, y3) = start, mid, end
+    d = 2 * (x1 * (y2 - y3) + x2 * (y3 - y1) + x3 * (y1 - y2))
+    if abs(d) < 1e-12:
+        return np.array([start, end])
+
+    ux = ((x1**2 + y1**2) * (y2 - y3) + (x2**2 + y2**2) * (y3 - y1) + (x3**2 + y3**2) * (y1 - y2)) / d
+    uy = ((x1**2 + y1**2) * (x3 - x2) + (x2**2 + y2**2) * (x1 - x3) + (x3**2 + y3**2) * (x2 - x1)) / d
+    r = math.hypot(x1 - ux, y1 - uy)
+
+    a1 = math.degrees(math.atan2(y1 - uy, x1 - ux))
+    a2 = math.degrees(math.atan2(y2 - uy, x2 - ux))
+    a3 = math.degrees(math.atan2(y3 - uy, x3 - ux))
+
+    # sweep from start to end through mid
+    sweep = (a3 - a1) % 360
+    if (a2 - a1) % 360 > sweep:
+        sweep -= 360
+
+    return arc_points(ux, uy, r, a1, a1 + sweep, segments)
+
+def pad_shape(pad):
+    '''
+        outline of the copper of a pad, centered on the pad and not rotated
+
+        Returns:
+        polygons (array) - filled outlines ([x, y] point arrays)
+        strokes (array) - (points, width, closed) outlines drawn with a width (custom pad primitives)
+    '''
+    sx = pad['size']['x']
+    sy = pad['size']['y']
+    shape = pad['shape']
+
+    polygons = []
+    strokes = []
+
+    if shape == 'circle':
+        polygons.append(circle(0, 0, sx / 2))
+    elif shape == 'oval':
+        polygons.append(rounded_rect(sx, sy, min(sx, sy) / 2))
+    elif shape == 'roundrect':
+        rratio = pad['roundrect_rratio'] if pad['roundrect_rratio'] != {} else 0.25
+        if pad.get('chamfer'):
+            polygons.append(chamfered_rect(sx, sy, rratio * min(sx, sy), pad['chamfer_ratio'] * min(sx, sy), pad['chamfer']))
+        else:
+            polygons.append(rounded_rect(sx, sy, rratio * min(sx, sy)))
+    elif shape == 'trapezoid' and pad['rect_delta'] != {}:
+        dx = pad['rect_delta'][0] / 2
+        dy = pad['rect_delta'][1] / 2
+        polygons.append(np.array([[-sx / 2 - dy, sy / 2 + dx], [-sx / 2 + dy, -sy / 2 - dx], [sx / 2 - dy, -sy / 2 + dx], [sx / 2 + dy, sy / 2 - dx]]))
+    elif shape == 'custom':
+        if pad.get('options', {}).get('anchor') == 'circle':
+            polygons.append(circle(0, 0, sx / 2))
+        else:
+            polygons.append(rounded_rect(sx, sy, 0))
+
+        for primitive in pad.get('primitives', []):
+            width = primitive['width'] if primitive['width'] != {} else 0
+            if primitive['type'] == 'gr_poly':
+                pts = np.array([[pt['x'], pt['y']] for pt in primitive['pts']])
+                polygons.append(pts)
+                if width > 0:
+                    strokes.append((pts, width, True))
+            elif primitive['type'] == 'gr_line':
+                pts = np.array([[primitive['start']['x'], primitive['start']['y']], [primitive['end']['x'], primitive['end']['y']]])
+                strokes.append((pts, width, False))
+            elif primitive['type'] == 'gr_arc':
+                pts = three_point_arc([primitive['start']['x'], primitive['start']['y']], [primitive['mid']['x'], primitive['mid']['y']], [primitive['end']['x'], primitive['end']['y']])
+                strokes.append((pts, width, False))
+            elif primitive['type'] == 'gr_circle':
+                cx = primitive['center']['x']
+                cy = primitive['center']['y']
+                r = math.hypot(primitive['end']['x'] - cx, primitive['end']['y'] - cy)
+                if width > 0:
+                    strokes.append((circle(cx, cy, r), width, True))
+                else:
+                    polygons.append(circle(cx, cy, r))
+    else:
+        polygons.append(rounded_rect(sx, sy, 0))
+
+    return polygons, strokes
+
+def hole_shape(pad):
+    '''
+        outline of the drill hole of a pad, centered on the pad and not rotated
+
+        Returns:
+        (array) [x, y] points, None if the pad has no hole
+    '''
+    drill = pad['drill']
+    if drill == {} or drill.get('size', {}) == {}:
+        return None
+
+    dx = drill['size']['x']
+    dy = drill['size']['y']
+    ox = drill['offset']['x'] if drill.get('offset', {}) != {} else 0
+    oy = drill['offset']['y'] if drill.get('offset', {}) != {} else 0
+
+    if drill['shape'] == 'oval':
+        outline = rounded_rect(dx, dy, min(dx, dy) / 2)
+    else:
+        outline = circle(0, 0, dx / 2)
+
+    return outline + [ox, oy]
+
+def transform(points, x, y, orientation):
+    '''
+        rotates points by orientation (degrees, KiCad orientations are counter-clockwise with y pointing down) and moves them by (x, y)
+    '''
+    angle = math.radians(orientation)
+    c = math.cos(angle)
+    s = math.sin(angle)
+    points = np.asarray(points, dtype=np.float64)
+
+    rx = points[:, 0] * c + points[:, 1] * s
+    ry = -points[:, 0] * s + points[:, 1] * c
+
+    return np.stack([rx + x, ry + y], axis=1)
+
+def place(points, pad):
+    '''
+        moves points from pad to footprint coordinates
+    '''
+    return transform(points, pad['pos']['x'], pad['pos']['y'], pad['pos']['orientation'])
+
+def footprint_outlines(pads):
+    '''
+        copper and hole outlines of the front copper pads in footprint coordinates (mm)
+
+        Returns:
+        polygons (array) - filled copper outlines
+        strokes (array) - (points, width, closed) copper outlines drawn with a width
+        holes (array) - drill hole outlines
+    '''
+    polygons = []
+    strokes = []
+    holes = []
+    for pad in pads:
+        if not is_front_copper(pad):
+            continue
+
+        pad_polygons, pad_strokes = pad_shape(pad)
+        polygons += [place(polygon, pad) for polygon in pad_polygons]
+        strokes += [(place(points, pad), width, closed) for points, width, closed in pad_strokes]
+
+        hole = hole_shape(pad)
+        if hole is not None:
+            holes.append(place(hole, pad))
+
+    return polygons, strokes, holes
+
+def outline_bounds(polygons, strokes):
+    '''
+        Returns:
+        top_left (array) - [x, y] minimum of the outlines (strokes include their width)
+        bottom_right (array) - [x, y] maximum of the outlines, None, None if there are no outlines
+    '''
+    # (points, half width) of everything drawn
+    extents = [(polygon, 0) for polygon in polygons] + [(points, width / 2) for points, width, closed in strokes]
+    if len(extents) == 0:
+        return None, None
+
+    top_left = np.min([points.min(axis=0) - half_width for points, half_width in extents], axis=0)
+    bottom_right = np.max([points.max(axis=0) + half_width for points, half_width in extents], axis=0)
+
+    return top_left, bottom_right
+
+def draw_outlines(polygons, strokes, holes, origin, w, h, px_per_mm, supersample=SUPERSAMPLE):
+    '''
+        draws outlines black on white, holes are cleared back to white
+
+        Parameters:
+        polygons (array) - filled outlines ([x, y] point arrays in mm)
+        strokes (array) - (points, width, closed) outlines drawn with a width
+        holes (array) - outlines filled white over the rest
+        origin (array) - [x, y] mm at the top left corner of the image
+        w, h (int) - size of the image
+        px_per_mm (float) - resolution of the image
+
+        Optional:
+        supersample (int) - outlines are drawn at this multiple of the resolution and area averaged down
+
+        Returns:
+        (2D array) grey image
+    '''
+    scale = px_per_mm * supersample
+
+    def to_px(points):
+        # cv2 fills the pixels whose centers are inside, centers sit at half pixels of the scaled coordinates
+        return np.round(((points - origin) * scale - 0.5) * (1 << SHIFT)).astype(np.int32).reshape(-1, 1, 2)
+
+    img = np.full((h * supersample, w * supersample), 255, np.uint8)
+
+    # one fillPoly call per outline, overlapping outlines passed together would cancel out (even-odd fill)
+    for polygon in polygons:
+        cv2.fillPoly(img, [to_px(polygon)], 0, cv2.LINE_8, SHIFT)
+
+    for points, width, closed in strokes:
+        thickness = max(1, int(round(width * scale)))
+        cv2.polylines(img, [to_px(points)], closed, 0, thickness, cv2.LINE_8, SHIFT)
+
+    for hole in holes:
+        cv2.fillPoly(img, [to_px(hole)], 255, cv2.LINE_8, SHIFT)
+
+    if supersample > 1:
+        img = cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+
+    return img
+
+def rasterize_pads(pads, px_per_mm=FOOTPRINT_PX_PER_MM):
+    '''
+        draws the front copper of the pads (black on white), cropped to the copper with a MARGIN border
+
+        Parameters:
+        pads (array) - pads as parsed by KicadMod._getPads
+
+        Optional:
+        px_per_mm (float) - resolution of the image
+
+        Returns:
+        (2D array) BGR image of the footprint, same layout as the gen_footprint_PNG output
+    '''
+    polygons, strokes, holes = footprint_outlines(pads)
+
+    top_left, bottom_right = outline_bounds(polygons, strokes)
+    if top_left is None:
+        return np.full((1, 1, 3), 255, np.uint8)
+
+    origin = top_left - MARGIN
+    w, h = ((bottom_right - top_left + 2 * MARGIN) * px_per_mm).astype(int)
+
+    img = draw_outlines(polygons, strokes, holes, origin, w, h, px_per_mm)
+
+    return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+def rasterize_footprint(fp_file, px_per_mm=FOOTPRINT_PX_PER_MM):
+    '''
+        Parameters:
+        fp_file (str) - path to .kicad_mod file
+
+        Optional:
+        px_per_mm (float) - resolution of the image
+
+        Returns:
+        (2D array) BGR image of the footprint's front copper pads
+    '''
+    return rasterize_pads(load_pads(fp_file), px_per_mm)
+
+def write_footprint_png(fp_file, png_file, px_per_mm=FOOTPRINT_PX_PER_MM):
+    '''
+        rasterizes a footprint into png_file (in place of kicad-cli + gen_footprint_PNG)
+    '''
+    cv2.imwrite(png_file, rasterize_footprint(fp_file, px_per_mm))
+
+    return png_file
@@ -0,0 +1,299 @@
+"""
+    Holds the geometric component matcher.
+    Matches the pad polygons of a .kicad_mod (as parsed by KicadMod._getPads) against the pad contours of the solder mask image as point sets:
+    candidate placements come from board pad pairs at the distance of a footprint pad pair, and are verified against the board's pad raster.
+    Works at any rotation angle and scales with the number of pads instead of the image area
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+from kicad_mod import load_pads
+from footprint_raster import FOOTPRINT_PX_PER_MM, SHIFT, is_front_copper, pad_shape, place
+
+
+MIN_PAD_COVERAGE = 0.5 # fraction of each footprint pad that has to land on its board pad (as in ComponentMatching.get_pad_info)
+CENTER_TOLERANCE = 0.2 # allowed pad center offset, as a fraction of the smallest pad side
+
+class FootprintGeometry():
+    '''
+        pads of a footprint in pixels (footprint origin at 0, 0)
+
+        Properties include
+        pins (array) - pad number of each pad
+        polygons (array) - outline of each pad
+        centers (2D array) - [x, y] centroid of each pad outline
+        areas (array) - area of each pad outline
+        tolerance (float) - allowed distance between a pad center and the center of the board pad it lands on
+    '''
+    def __init__(self, pads, px_per_mm=FOOTPRINT_PX_PER_MM):
+        self.pins = []
+        self.polygons = []
+        centers = []
+        self.areas = []
+        min_side = None
+
+        for pad in pads:
+            if not is_front_copper(pad):
+                continue
+
+            polygons, strokes = pad_shape(pad)
+            if len(polygons) == 0:
+                continue
+
+            # the anchor shape of custom pads is the first polygon
+            polygon = place(polygons[0], pad) * px_per_mm
+            M = cv2.moments(polygon.astype(np.float32))
+            if M['m00'] <= 0:
+                continue
+
+            self.pins.append(pad['number'])
+            self.polygons.append(polygon)
+            centers.append((M['m10']/M['m00'], M['m01']/M['m00']))
+            self.areas.append(M['m00'])
+
+            side = min(pad['size']['x'], pad['size']['y']) * px_per_mm
+            min_side = side if min_side is None else min(min_side, side)
+
+        self.centers = np.array(centers, dtype=np.float64).reshape(-1, 2)
+        self.areas = np.array(self.areas, dtype=np.float64)
+        self.tolerance = max(2.0, CENTER_TOLERANCE * min_side) if min_side is not None else 2.0
+
+    def reference_pair(self):
+        '''
+            Returns:
+            (tuple) indices of the two closest pads (pitch pair, fewest board pad pairs at that distance), None for less than two pads
+        '''
+        if len(self.centers) < 2:
+            return None
+
+        distances = np.linalg.norm(self.centers[:, np.newaxis] - self.centers[np.newaxis], axis=2)
+        distances[np.eye(len(self.centers), dtype=bool)] = np.inf
+        a, b = np.unravel_index(np.argmin(distances), distances.shape)
+
+        return int(a), int(b)
+
+def load_footprint_geometry(fp_file, px_per_mm=FOOTPRINT_PX_PER_MM):
+    '''
+        Parameters:
+        fp_file (str) - path to .kicad_mod file
+
+        Returns:
+        (FootprintGeometry) front copper pads of the footprint in pixels
+    '''
+    return FootprintGeometry(load_pads(fp_file), px_per_mm)
+
+def pairs_at_distance(points, distance, tolerance):
+    '''
+        all pairs of points whose distance is within tolerance of distance, from a hash grid of the points (cell size distance + tolerance,
+        so only neighbouring cells are compared)
+
+        Parameters:
+        points (2D array) - [x, y] points
+        distance (float) - distance between the points of a pair
+        tolerance (float) - allowed difference to distance
+
+        Returns:
+        (2D array) [i, j] index pairs, both orders of each pair
+    '''
+    if len(points) < 2:
+        return np.zeros((0, 2), np.int64)
+
+    cell = distance + tolerance
+    cells = np.floor(points / cell).astype(np.int64)
+
+    grid = {}
+    for i, key in enumerate(map(tuple, cells)):
+        grid.setdefault(key, []).append(i)
+    grid = {key: np.array(indices) for key, indices in grid.items()}
+
+    pairs = []
+    for (cx, cy), indices in grid.items():
+        neighbours = [grid[(cx + dx, cy + dy)] for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (cx + dx, cy + dy) in grid]
+        neighbours = np.concatenate(neighbours)
+
+        d = np.linalg.norm(points[indices][:, np.newaxis] - points[neighbours][np.newaxis], axis=2)
+        i, j = np.nonzero(np.abs(d - distance) <= tolerance)
+        pairs.append(np.stack([indices[i], neighbours[j]], axis=1))
+
+    return np.concatenate(pairs)
+
+def rigid_transform(src, dst):
+    '''
+        least squares rotation and translation (no scaling or mirroring) taking src points onto dst points
+
+        Returns:
+        R (2D array) - 2x2 rotation matrix
+        t (array) - translation
+    '''
+    src_mean = src.mean(axis=0)
+    dst_mean = dst.mean(axis=0)
+
+    H = (src - src_mean).T @ (dst - dst_mean)
+    angle = math.atan2(H[0, 1] - H[1, 0], H[0, 0] + H[1, 1])
+    R = np.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+
+    return R, dst_mean - src_mean @ R.T
+
+def pads_at(labels, points):
+    '''
+        Returns:
+        (array) pad ID of labels at each [x, y] of points (-1 outside the image)
+    '''
+    px = np.rint(points[..., 0]).astype(np.int64)
+    py = np.rint(points[..., 1]).astype(np.int64)
+    inside = (px >= 0) & (py >= 0) & (px < labels.shape[1]) & (py < labels.shape[0])
+
+    IDs = np.full(px.shape, -1, np.int64)
+    IDs[inside] = labels[py[inside], px[inside]]
+
+    return IDs
+
+def pad_coverage(labels, polygon):
+    '''
+        Parameters:
+        labels (2D array) - pad ID of each pixel (PadIndex.labels)
+        polygon (2D array) - [x, y] outline on the board image
+
+        Returns:
+        covered (dict) - board pad ID -> pixels of the outline on that pad
+        total (int) - pixels of the outline
+    '''
+    x0, y0 = np.floor(polygon.min(axis=0)).astype(int) - 1
+    x1, y1 = np.ceil(polygon.max(axis=0)).astype(int) + 2
+
+    mask = np.zeros((y1 - y0, x1 - x0), np.uint8)
+    points = np.round((polygon - [x0, y0]) * (1 << SHIFT)).astype(np.int32).reshape(-1, 1, 2)
+    cv2.fillPoly(mask, [points], 1, cv2.LINE_8, SHIFT)
+
+    # parts of the outline off the image are never covered
+    crop = np.full(mask.shape, -1, labels.dtype)
+    cx0, cy0 = max(x0, 0), max(y0, 0)
+    cx1, cy1 = min(x1, labels.shape[1]), min(y1, labels.shape[0])
+    if cx1 > cx0 and cy1 > cy0:
+        crop[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0] = labels[cy0:cy1, cx0:cx1]
+
+    pad_IDs, counts = np.unique(crop[(mask > 0) & (crop >= 0)], return_counts=True)
+
+    return {int(pad_ID): int(count) for pad_ID, count in zip(pad_IDs, counts)}, int(np.count_nonzero(mask))
+
+def valid_assignment(pins, pad_IDs):
+    '''
+        Returns:
+        (bool) True if every pad landed on a board pad and no board pad is shared by pads of different pins
+    '''
+    if np.any(pad_IDs < 0):
+        return False
+
+    owners = {}
+    for pin, pad_ID in zip(pins, pad_IDs):
+        if owners.setdefault(int(pad_ID), pin) != pin:
+            return False
+
+    return True
+
+def find_placements(geometry, pad_index, min_coverage=MIN_PAD_COVERAGE):
+    '''
+        finds every placement of the footprint on one side of the board
+
+        Parameters:
+        geometry (FootprintGeometry) - footprint pads
+        pad_index (PadIndex) - pads of the board side
+
+        Optional:
+        min_coverage (float) - fraction of each footprint pad that has to land on its board pad
+
+        Returns:
+        placements (array) - dicts with 'R' and 't' (footprint to board transform), 'pad_IDs' (board pad under the center of each footprint pad),
+                             'pads_under' (board pads under each footprint pad), 'covered' and 'total' (pixels of each footprint pad on board pads / in total),
+                             ordered by score
+    '''
+    num_pads = len(geometry.centers)
+    features = pad_index.features
+    if num_pads == 0 or len(features) == 0:
+        return []
+
+    board_centers = np.stack([features['cx'], features['cy']], axis=1)
+
+    # candidate transforms: the reference pair of footprint pads onto every board pad pair at the same distance
+    pair = geometry.reference_pair()
+    if pair is None:
+        angles = np.zeros(len(board_centers))
+        translations = board_centers - geometry.centers[0]
+    else:
+        a, b = pair
+        distance = np.linalg.norm(geometry.centers[b] - geometry.centers[a])
+        board_pairs = pairs_at_distance(board_centers, distance, 2 * geometry.tolerance)
+        if len(board_pairs) == 0:
+            return []
+
+        fp_vector = geometry.centers[b] - geometry.centers[a]
+        board_vectors = board_centers[board_pairs[:, 1]] - board_centers[board_pairs[:, 0]]
+        angles = np.arctan2(board_vectors[:, 1], board_vectors[:, 0]) - math.atan2(fp_vector[1], fp_vector[0])
+
+        cos, sin = np.cos(angles), np.sin(angles)
+        ax, ay = geometry.centers[a]
+        translations = board_centers[board_pairs[:, 0]] - np.stack([cos * ax - sin * ay, sin * ax + cos * ay], axis=1)
+
+    # every footprint pad center has to land on a board pad (all candidates at once)
+    cos, sin = np.cos(angles)[:, np.newaxis], np.sin(angles)[:, np.newaxis]
+    fx, fy = geometry.centers[:, 0], geometry.centers[:, 1]
+    predicted = np.stack([cos * fx - sin * fy + translations[:, 0:1], sin * fx + cos * fy + translations[:, 1:2]], axis=2)
+    hits = pads_at(pad_index.labels, predicted)
+
+    candidates = {}
+    for row in np.flatnonzero(np.all(hits >= 0, axis=1)):
+        candidates.setdefault(tuple(hits[row]), row)
+
+    placements = {}
+    for hit, row in candidates.items():
+        pad_IDs = np.array(hit)
+        if not valid_assignment(geometry.pins, pad_IDs):
+            continue
+
+        # refine on all pad centers, then check the assignment again
+        R, t = rigid_transform(geometry.centers, board_centers[pad_IDs])
+        pad_IDs = pads_at(pad_index.labels, geometry.centers @ R.T + t)
+        if not valid_assignment(geometry.pins, pad_IDs) or tuple(pad_IDs) in placements:
+            continue
+
+        # every board pad under a footprint pad belongs to its pin, a board pad under pads of two pins would short them
+        pads_under = []
+        covered = []
+        total = []
+        owners = {}
+        for pin, polygon in zip(geometry.pins, geometry.polygons):
+            pad_covered, pad_total = pad_coverage(pad_index.labels, polygon @ R.T + t)
+            if pad_total == 0 or sum(pad_covered.values()) < min_coverage * pad_total:
+                break
+            if any(owners.setdefault(pad_ID, pin) != pin for pad_ID in pad_covered):
+                break
+            pads_under.append(sorted(pad_covered.keys()))
+            covered.append(sum(pad_covered.values()))
+            total.append(pad_total)
+        else:
+            placements[tuple(pad_IDs)] = {'R': R, 't': t, 'pad_IDs': pad_IDs, 'pads_under': pads_under, 'covered': np.array(covered), 'total': np.array(total)}
+
+    return sorted(placements.values(), key=lambda placement: -placement['covered'].sum() / placement['total'].sum())
+
+def placement_orientation(R):
+    '''
+        Returns:
+        (float) rotation of a placement in degrees, counter-clockwise on the image like the orientations of ComponentMatching.get_matches
+    '''
+    return round(-math.degrees(math.atan2(R[1, 0], R[0, 0])) % 360, 2) % 360
+
+def placement_contours(geometry, R, t):
+    '''
+        Returns:
+        coordinates (tuple) - x, y top left corner of the placed footprint on the board image
+        contours (array) - pad outlines relative to coordinates (draw with offset=coordinates like the contours of raster matches)
+    '''
+    polygons = [polygon @ R.T + t for polygon in geometry.polygons]
+    x0, y0 = np.floor(np.min([polygon.min(axis=0) for polygon in polygons], axis=0)).astype(int)
+
+    contours = tuple(np.round(polygon - [x0, y0]).astype(np.int32).reshape(-1, 1, 2) for polygon in polygons)
+
+    return (int(x0), int(y0)), contours
@@ -5,6 +5,7 @@ import subprocess
 from svg_edit import *
 import cv2
 from Objectifier import Objectifier
+from document_cache import load_document
 
 '''
 
@@ -109,6 +110,10 @@ IMAGE RELATED METHODS
 def svg_to_png(svg_file):
 	cairosvg.svg2png(url=svg_file, write_to=svg_file[:-3] + "png", scale=4, background_color="white")
 
+# same image as svg_to_png, returned as a BGR array instead of written next to the svg
+def svg_to_image(svg_file):
+	return svg_to_array(svg_file, scale=4, dpi=96)
+
 
 # displays an image using opencv, good for testing
 def displayImage(title, image):
@@ -158,7 +163,7 @@ def get_board_bounds(pcb_file):
 
     '''
 
-    pcb = Objectifier(pcb_file)
+    pcb = load_document(pcb_file)
 
     root = pcb.root
 
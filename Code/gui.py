@@ -8,12 +8,13 @@ from pathlib import Path
 from PIL import Image
 from PIL import ImageTk
 
-from sch_reader import get_starting_symbol, get_connections, get_ordered_components_list, get_symbol
+from sch_reader import get_starting_symbol, get_connections, get_ordered_components_list, get_symbol, Netlist
 from svg_edit import svg_to_png_gen, gen_footprint_PNG, gen_sch_PNG
+from footprint_cache import prepare_footprint_png
 
 from ComponentMatch import *
 from CircuitMatch import CircuitMatching
-from PCB_utils import PCB_Board
+from PCB_utils import PCB_Board, board_cache_dir
 
 import subprocess
 import threading
@@ -327,17 +328,12 @@ class KiCad_CLI_Thread(threading.Thread):
         self.queue = queue
         self.sp_args = sp_args
     def run(self):
-        subprocess.run(self.sp_args)
-
         if self.sp_args[1] == 'fp' and self.sp_args[2] == 'export' and self.sp_args[3] == 'svg':
-            try:
-                gen_footprint_PNG(self.sp_args[6] + "/" + self.sp_args[8] + ".svg")
-                self.queue.put_nowait('file generated')
-            except:
-                self.sp_args[4] = ''
-                subprocess.run(self.sp_args)
-                gen_footprint_PNG(self.sp_args[6] + "/" + self.sp_args[8] + ".svg")
-                self.queue.put_nowait('file generated')
+            #footprint images go through the footprint cache (only rendered if not cached)
+            prepare_footprint_png(self.sp_args[6], self.sp_args[0], self.sp_args[4], self.sp_args[8])
+            self.queue.put_nowait('file generated')
+        else:
+            subprocess.run(self.sp_args)
 
         if self.sp_args[1] == 'pcb' and self.sp_args[2] == 'export' and self.sp_args[3] == 'svg':
             if len(self.sp_args[8]) > 8: 
@@ -396,10 +392,11 @@ class ComponentMatching_Thread(threading.Thread):
         
         self.cm.pcb_board = self.pcb
 
+        cache_dir = board_cache_dir(os.path.dirname(self.cm_init_files[0]))
         if len(self.cm_init_files) == 4:
-            self.pcb.initialize_via_files(self.cm_init_files[0], self.cm_init_files[3])
+            self.pcb.initialize_via_files(self.cm_init_files[0], self.cm_init_files[3], cache_dir=cache_dir)
         else:
-            self.pcb.initialize_via_files(self.cm_init_files[0], self.cm_init_files[3], self.cm_init_files[4], self.cm_init_files[5], self.cm_init_files[6])
+            self.pcb.initialize_via_files(self.cm_init_files[0], self.cm_init_files[3], self.cm_init_files[4], self.cm_init_files[5], self.cm_init_files[6], cache_dir=cache_dir)
         
         matches = self.cm.get_matches()
         
@@ -435,8 +432,9 @@ class CircuitMatching_Thread(threading.Thread):
 
         self.queue.put_nowait('processing net list')
 
-        net_arr = get_connections(output + '/' + 'sch.net')
-        sorted_refs, footprint_dict = get_ordered_components_list(output + '/' + 'sch.net')
+        netlist = Netlist(output + '/' + 'sch.net')
+        net_arr = netlist.get_connections()
+        sorted_refs, footprint_dict = netlist.get_ordered_components_list()
 
         self.queue.put_nowait('running circuit matching')
 
@@ -451,7 +449,7 @@ class CircuitMatching_Thread(threading.Thread):
                 drill_file_name = t_str
 
         #drill_file_name = self.pcb.pcb_file.split('/')[-1].split('.')[0]
-        self.pcb.initialize_via_files(output + '/' + 'mask.png', output + '/' + 'traces.png', output + '/' + 'mask_back.png', output + '/' + 'traces_back.png', output + '/' + drill_file_name + '.drl')
+        self.pcb.initialize_via_files(output + '/' + 'mask.png', output + '/' + 'traces.png', output + '/' + 'mask_back.png', output + '/' + 'traces_back.png', output + '/' + drill_file_name + '.drl', cache_dir=board_cache_dir(output))
 
         cir_m = CircuitMatching(sorted_refs, footprint_dict, net_arr)
         cir_m.pcb_board = self.pcb
@@ -42,43 +42,179 @@ def findViasFromDrlFile(file):
 
 
 
-# INPUT: full path to a DRL file (PTH or NPTH)
-# OUTPUT: list of Hole objects that correspond to each hole on the drill file
-def getHolesFromDRL(file):
+# numpy layout of the holes read by getHoleArrayFromDRL, one row per hit (coordinates and diameters in mm, y as written in the drill file)
+# x, y is the hole center (the middle of a slot), sx, sy -> ex, ey the slot ends (the center for round holes)
+DRILL_DTYPE = np.dtype([('x', np.float64), ('y', np.float64), ('diameter', np.float64), ('plated', np.bool_), ('is_slot', np.bool_),
+                        ('sx', np.float64), ('sy', np.float64), ('ex', np.float64), ('ey', np.float64)])
+
+DRILL_TOOL = re.compile(r'T(\d+)(?:[FSB][\d.]+)*C([\d.]+)')
+DRILL_COORDINATES = re.compile(r'(?:X([+-]?[\d.]+))?(?:Y([+-]?[\d.]+))?')
+
+
+# INPUT: excellon number, decimal places, zero suppression ('leading' or 'trailing') and total digits of the file's number format
+# OUTPUT: the number as a float (in file units)
+def parseDrillNumber(s, decimals, suppression, digits):
+    if '.' in s:
+        return float(s)
+
+    sign = -1 if s[0] == '-' else 1
+    s = s.lstrip('+-')
+    if suppression == 'trailing':
+        s = s.ljust(digits, '0')
+
+    return sign * int(s) / 10**decimals
+
+
+# INPUT: full path to a DRL file (PTH, NPTH or both)
+# OUTPUT: numpy array of DRILL_DTYPE with every hit of the file (drill hits and slots, see DRILL_DTYPE)
+# reads the excellon files written by KiCad (decimal or zero suppressed numbers, G85 and routed slots) without building a Python object per hit
+# holes are plated unless the file or their tool is marked NonPlated by the KiCad attribute comments
+def getHoleArrayFromDRL(file):
+
+    with open(file) as f:
+        lines = f.read().splitlines()
+
+    to_mm = 1.0
+    decimals, suppression, digits = 3, 'leading', 6
+    format_read = False
+    file_plated = True
+    tool_plated = None
+    tools = {}
+
+    rows = []
+    tool = None
+    in_header = False
+    plunged = False
+    x = y = 0.0
+    start = (x, y)
+
+    for line in lines:
+        line = line.strip()
+        if len(line) == 0:
+            continue
+
+        if line[0] == ';':
+            if 'TF.FileFunction,NonPlated' in line:
+                file_plated = False
+            elif 'TA.AperFunction,NonPlated' in line:
+                tool_plated = False
+            elif 'TA.AperFunction,Plated' in line:
+                tool_plated = True
+            elif 'FORMAT={' in line and ':' in line.split('{')[1].split('/')[0] and '-' not in line.split('{')[1].split('/')[0]:
+                integers, decimals = [int(d) for d in line.split('{')[1].split('/')[0].split(':')]
+                digits = integers + decimals
+                suppression = 'trailing' if 'suppress trailing' in line else 'leading'
+                format_read = True
+            continue
+
+        if line == 'M48':
+            in_header = True
+            continue
+        if line in ['%', 'M95']:
+            in_header = False
+            continue
+
+        if line.startswith('METRIC') or line.startswith('INCH') or line in ['M71', 'M72']:
+            inch = line.startswith('INCH') or line == 'M72'
+            to_mm = 25.4 if inch else 1.0
+            if not format_read:
+                decimals, digits = (4, 6) if inch else (3, 6)
+            if ',TZ' in line:
+                suppression = 'leading'
+            elif ',LZ' in line:
+                suppression = 'trailing'
+            integers_decimals = re.search(r',(\d+)\.(\d+)', line)
+            if integers_decimals is not None:
+                decimals = len(integers_decimals.group(2))
+                digits = len(integers_decimals.group(1)) + decimals
+            continue
+
+        tool_match = DRILL_TOOL.match(line)
+        if tool_match is not None and in_header:
+            tools[int(tool_match.group(1))] = (float(tool_match.group(2)) * to_mm, file_plated if tool_plated is None else tool_plated)
+            tool_plated = None
+            continue
+
+        if line[0] == 'T' and line[1:].isdigit():
+            tool = tools.get(int(line[1:]))
+            continue
+
+        if line == 'M15':
+            plunged = True
+            continue
+        if line in ['M16', 'M17']:
+            plunged = False
+            continue
+
+        if tool is None or line[0] not in 'XYG' or ('X' not in line and 'Y' not in line):
+            continue
+
+        route = None
+        if line.startswith('G00') or line.startswith('G01'):
+            route = line[:3]
+            line = line[3:]
+
+        hits = line.split('G85')
+        positions = []
+        for hit in hits:
+            coordinates = DRILL_COORDINATES.match(hit)
+            if coordinates.group(1) is not None:
+                x = parseDrillNumber(coordinates.group(1), decimals, suppression, digits) * to_mm
+            if coordinates.group(2) is not None:
+                y = parseDrillNumber(coordinates.group(2), decimals, suppression, digits) * to_mm
+            positions.append((x, y))
+
+        diameter, plated = tool
+        if len(positions) == 2:
+            rows.append((positions[0], positions[1], diameter, plated))
+        elif route == 'G01' and plunged:
+            rows.append((start, positions[0], diameter, plated))
+        elif route is None:
+            rows.append((positions[0], positions[0], diameter, plated))
+
+        start = positions[-1]
+
+    holes = np.zeros(len(rows), dtype=DRILL_DTYPE)
+    if len(rows) == 0:
+        return holes
+
+    starts = np.array([row[0] for row in rows])
+    ends = np.array([row[1] for row in rows])
+    holes['sx'], holes['sy'] = starts[:, 0], starts[:, 1]
+    holes['ex'], holes['ey'] = ends[:, 0], ends[:, 1]
+    holes['x'] = (holes['sx'] + holes['ex']) / 2.0
+    holes['y'] = (holes['sy'] + holes['ey']) / 2.0
+    holes['is_slot'] = (holes['sx'] != holes['ex']) | (holes['sy'] != holes['ey'])
+    holes['diameter'] = [row[2] for row in rows]
+    holes['plated'] = [row[3] for row in rows]
 
-    holes = []
-    excellonFileObject = gerber.read(file)
-    drillhits = excellonFileObject.hits #.hits returns a list of DrillHit objects (class outlined in the github)
+    return holes
 
-    
-    for dh in drillhits:
-        if isinstance(dh, DrillSlot):
-            holeDiameter = dh.tool.diameter
-            holePlated = dh.tool.plated
 
-            (sx,sy) = dh.start
-            (ex,ey) = dh.end
 
-            x = (sx + ex)/2.0
-            y = (sy + ey)/2.0
+# INPUT: numpy array of DRILL_DTYPE (see getHoleArrayFromDRL)
+# OUTPUT: list of Hole objects, one per row
+def holesFromArray(holes):
+    return [Hole(diameter=diameter, isPlated=plated, isVia=False, coordinates=(x, y)) for x, y, diameter, plated in zip(holes['x'].tolist(), holes['y'].tolist(), holes['diameter'].tolist(), holes['plated'].tolist())]
 
-            coordinates = (x,y)
-            holes.append(Hole(diameter=holeDiameter, isPlated=holePlated, isVia=False, coordinates=coordinates))
 
 
-        else:
-            tool = dh.tool
-            holeDiameter = tool.diameter
-            holePlated = tool.plated
+# INPUT: full path to a DRL file (PTH or NPTH)
+# OUTPUT: list of Hole objects that correspond to each hole on the drill file
+def getHolesFromDRL(file):
 
-            coordinates = dh.position
-            xCoordinate = coordinates[0]
-            yCoordinate = coordinates[1]  
+    return holesFromArray(getHoleArrayFromDRL(file))
 
-            holes.append(Hole(diameter=holeDiameter, isPlated=holePlated, isVia=False, coordinates=(xCoordinate, yCoordinate)))
 
 
-    return holes
+# INPUT: x and y drill coordinates (numpy arrays, in mm as in the drill file), top left corner, width and height of the board (see get_board_bounds), shape of the board image
+# OUTPUT: x and y pixel coordinates (numpy int arrays) of the holes on the board image
+def drillToPixels(x, y, tl_coords, width, height, shape):
+
+    px = np.abs(np.rint(((np.asarray(x) - tl_coords[0]) / width) * shape[1])).astype(int)
+    py = np.abs(np.rint(((np.abs(np.asarray(y)) - tl_coords[1]) / height) * shape[0])).astype(int)
+
+    return px, py
 
 
 
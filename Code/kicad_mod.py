@@ -4,7 +4,10 @@ Library for handling KiCad's footprint files (`*.kicad_mod`).
 
 import copy
 import math
+import os
+import threading
 import time
+from functools import cached_property
 from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import sexpr
@@ -57,7 +60,13 @@ class KicadMod:
 
     SEXPR_BOARD_FILE_VERSION = 20210108
 
-    def __init__(self, filename: str=None, data=None):
+    def __init__(self, filename: str=None, data=None, pads_only: bool=False):
+        """
+        Sections (texts, lines, rects, circles, polygons, arcs, pads and models) are extracted on first access.
+
+        data -- s-expression text of the footprint, or the already parsed footprint list (e.g. a footprint of a board)
+        pads_only -- only read the pad lists of the file (every other section is left empty)
+        """
         self.filename: str = filename
 
         if data is not None:
@@ -70,7 +79,8 @@ class KicadMod:
             raise ValueError('Either filename or data must be given.')
 
         # parse s-expr
-        sexpr_data = sexpr.parse_sexp(sexpr_data)
+        if isinstance(sexpr_data, str):
+            sexpr_data = sexpr.read_sexp(sexpr_data, sections=["pad"] if pads_only else None)
         self.sexpr_data = sexpr_data
 
         # module name
@@ -107,35 +117,55 @@ class KicadMod:
         # attribute
         self._getAttributes()
 
-        # reference
-        self.reference = self._getText("reference")[0]
-
-        # value
-        self.value = self._getText("value")[0]
-
-        # user text
-        self.userText: List[Dict[str, Any]] = self._getText("user")
-
-        # lines
-        self.lines: List[Dict[str, Any]] = self._getLines()
-
-        # rects
-        self.rects = self._getRects()
-
-        # circles
-        self.circles = self._getCircles()
-
-        # polygons
-        self.polys = self._getPolys()
-
-        # arcs
-        self.arcs = self._getArcs()
-
-        # pads
-        self.pads = self._getPads()
-
-        # models
-        self.models = self._getModels()
+    # reference
+    @cached_property
+    def reference(self) -> Dict[str, Any]:
+        return self._getText("reference")[0]
+
+    # value
+    @cached_property
+    def value(self) -> Dict[str, Any]:
+        return self._getText("value")[0]
+
+    # user text
+    @cached_property
+    def userText(self) -> List[Dict[str, Any]]:
+        return self._getText("user")
+
+    # lines
+    @cached_property
+    def lines(self) -> List[Dict[str, Any]]:
+        return self._getLines()
+
+    # rects
+    @cached_property
+    def rects(self) -> List[Dict[str, Any]]:
+        return self._getRects()
+
+    # circles
+    @cached_property
+    def circles(self) -> List[Dict[str, Any]]:
+        return self._getCircles()
+
+    # polygons
+    @cached_property
+    def polys(self) -> List[Dict[str, Any]]:
+        return self._getPolys()
+
+    # arcs
+    @cached_property
+    def arcs(self) -> List[Dict[str, Any]]:
+        return self._getArcs()
+
+    # pads
+    @cached_property
+    def pads(self) -> List[Dict[str, Any]]:
+        return self._getPads()
+
+    # models
+    @cached_property
+    def models(self) -> List[Dict[str, Any]]:
+        return self._getModels()
 
     # check if value exists in any element of data
     def _hasValue(self, data: Iterable[Any], value: str) -> bool:
@@ -495,6 +525,17 @@ class KicadMod:
             if a:
                 pad_dict["roundrect_rratio"] = a[0][1]
 
+            # chamfered corners
+            pad_dict["chamfer_ratio"] = {}
+            a = self._getArray(pad, "chamfer_ratio")
+            if a:
+                pad_dict["chamfer_ratio"] = a[0][1]
+
+            pad_dict["chamfer"] = []
+            a = self._getArray(pad, "chamfer")
+            if a:
+                pad_dict["chamfer"] = [str(corner) for corner in a[0][1:]]
+
             # drill
             pad_dict["drill"] = {}
             drill = self._getArray(pad, "drill")
@@ -1267,6 +1308,10 @@ class KicadMod:
             if rratio:
                 fp_pad.append({"roundrect_rratio": rratio})
 
+            if pad.get("chamfer"):
+                fp_pad.append({"chamfer_ratio": pad["chamfer_ratio"]})
+                fp_pad.append({"chamfer": pad["chamfer"]})
+
         se.addItems(fp_pad, newline=False)
 
         extras = []
@@ -1450,3 +1495,33 @@ class KicadMod:
         with open(filename, "w", newline="\n") as f:
             f.write(se.output)
             f.write("\n")
+
+
+# pad tables read by load_pads, keyed by (path, mtime, size) of the .kicad_mod file
+_pad_tables: Dict[Tuple[str, int, int], List[Dict[str, Any]]] = {}
+_pad_tables_lock = threading.Lock()
+
+
+def footprint_file_key(filename: str) -> Tuple[str, int, int]:
+    """
+    (path, mtime, size) of a footprint file, changes whenever the file is edited
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def load_pads(filename: str) -> List[Dict[str, Any]]:
+    """
+    Pads of a footprint file as returned by KicadMod._getPads, read with the pads-only loader once per file version.
+    The returned list is shared between callers and must not be modified.
+    """
+    key = footprint_file_key(filename)
+
+    with _pad_tables_lock:
+        if key not in _pad_tables:
+            for old_key in [old_key for old_key in _pad_tables.keys() if old_key[0] == key[0]]:
+                del _pad_tables[old_key]
+            _pad_tables[key] = KicadMod(filename=filename, pads_only=True).pads
+
+        return _pad_tables[key]
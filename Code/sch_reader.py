@@ -74,69 +74,137 @@ def get_symbol(filename_sch, ref):
 
     return ''
 
-def get_connections(filename_net):
+class Netlist():
     """
-    Gets all the net connections from the .net file
-
-    Parameters:
-    filename_net (str): string of the .net file path
+        Indexed view of a .net file, built in a single pass over its components, libparts and nets.
+        get_connections and get_ordered_components_list read from these dicts instead of searching the whole tree for every node.
 
-    Returns:
-    nets_arr (array of dicts): array of each net represented by a {'name': '', 'node arr': []} format.
-    'node arr' represented as an array of node dicts as {'ref': '', 'pin': '', 'footprint': ''}
+        Properties include
+        root (Objectifier root): root of the Objectifier tree from .net file
+        refs (array of str): ref of every comp entry in netlist order
+        components (dict): ref -> {'lib': '', 'part': '', 'footprint': ''}
+        libpart_pins (dict): (lib, part) -> number of pins
+        footprint_dict (dict): 'footprint': [array of refs]
+        nets (array of Nodes): net nodes of the netlist
     """
-    net = Objectifier(filename_net)
-    root = net.root
+    def __init__(self, filename_net):
+        self.root = Objectifier(filename_net).root
 
-    nets_arr = []
+        self.refs = []
+        self.components = {}
+        self.libpart_pins = {}
+        self.footprint_dict = {}
+        self.nets = []
 
-    for net in root.xpath('/export/nets/net'):
+        for section in self.root:
+            if not isinstance(section, Node):
+                continue
 
-        net_name = net.xpath('name')[0].first_child
-        node_arr = []
-        if (net_name[:3] == 'Net'):
-            for node in net.xpath('node'):
-                ref = node.xpath('ref')[0].first_child
-                pin = node.xpath('pin')[0].first_child
-                footprint = get_footprint_of_ref(root, ref)
-                lib, part = get_lib_part(root, ref)
-                pins = get_pins_of_ref(root, lib, part)
+            if section.name == 'components':
+                for component in section.xpath('comp'):
+                    self.add_component(component)
+            elif section.name == 'libparts':
+                for libpart in section.xpath('libpart'):
+                    self.add_libpart(libpart)
+            elif section.name == 'nets':
+                self.nets.extend(section.xpath('net'))
 
-                if pins > 0:
-                    node_dict = {'ref': ref, 'pin': pin, 'footprint': footprint, 'total pins': pins}
+    def add_component(self, component):
+        ref = component.xpath('ref')[0].first_child
+        lib = component.xpath('libsource/lib')[0].first_child
+        part = component.xpath('libsource/part')[0].first_child
+        footprint = component.xpath('footprint')[0].first_child
+        self.refs.append(ref)
 
-                    node_arr.append(node_dict)
-            net_dict = {'name': net_name, 'node arr': node_arr}
-            nets_arr.append(net_dict)
+        #first component with a ref gives its libsource, the last gives its footprint (as in get_lib_part & get_footprint_of_ref)
+        if ref in self.components.keys():
+            self.components[ref]['footprint'] = footprint
+        else:
+            self.components[ref] = {'lib': lib, 'part': part, 'footprint': footprint}
 
+        if footprint in self.footprint_dict.keys():
+            self.footprint_dict[footprint].append(ref)
         else:
-            if (net_name == 'GND') or (net_name == 'VCC'):
-                for node in net.xpath('node'):
-                    ref = node.xpath('ref')[0].first_child
-                    pin = node.xpath('pin')[0].first_child
-                    footprint = get_footprint_of_ref(root, ref)
-                    lib, part = get_lib_part(root, ref)
-                    pins = get_pins_of_ref(root, lib, part)
-                    node_dict = {'ref': ref, 'pin': pin, 'footprint': footprint, 'total pins': pins}
-                    node_arr.append(node_dict)
-                net_dict = {'name': net_name, 'node arr': node_arr}
-                nets_arr.append(net_dict)
-            elif 'unconnected' in net_name:
+            self.footprint_dict[footprint] = [ref]
+
+    def add_libpart(self, libpart):
+        lib = libpart.xpath('lib')[0].first_child
+        part = libpart.xpath('part')[0].first_child
+        if (lib, part) in self.libpart_pins.keys():
+            return
+
+        pins = libpart.xpath('pins')
+        self.libpart_pins[(lib, part)] = len(pins[0]) if len(pins) > 0 else 0
+
+    def pins_of_ref(self, ref):
+        """
+            Returns:
+            (int) number of pins of the component's libpart, None if the libpart isn't in the netlist
+        """
+        component = self.components[ref]
+        return self.libpart_pins.get((component['lib'], component['part']))
+
+    def node_dict(self, node):
+        ref = node.xpath('ref')[0].first_child
+        pin = node.xpath('pin')[0].first_child
+
+        return {'ref': ref, 'pin': pin, 'footprint': self.components[ref]['footprint'], 'total pins': self.pins_of_ref(ref)}
+
+    def get_connections(self):
+        """
+        Returns:
+        nets_arr (array of dicts): see get_connections
+        """
+        nets_arr = []
+
+        for net in self.nets:
+            net_name = net.xpath('name')[0].first_child
+            if (net_name[:3] != 'Net') and (net_name != 'GND') and (net_name != 'VCC') and ('unconnected' in net_name):
                 continue
-            else:
-                for node in net.xpath('node'):
-                    ref = node.xpath('ref')[0].first_child
-                    pin = node.xpath('pin')[0].first_child
-                    footprint = get_footprint_of_ref(root, ref)
-                    lib, part = get_lib_part(root, ref)
-                    pins = get_pins_of_ref(root, lib, part)
-                    node_dict = {'ref': ref, 'pin': pin, 'footprint': footprint, 'total pins': pins}
-                    node_arr.append(node_dict)
-                net_dict = {'name': net_name, 'node arr': node_arr}
-                nets_arr.append(net_dict)
-                
 
-    return nets_arr
+            node_arr = []
+            for node in net.xpath('node'):
+                node_dict = self.node_dict(node)
+
+                #named 'Net-' nets leave out components without pins
+                if (net_name[:3] == 'Net') and not (node_dict['total pins'] > 0):
+                    continue
+
+                node_arr.append(node_dict)
+
+            nets_arr.append({'name': net_name, 'node arr': node_arr})
+
+        return nets_arr
+
+    def get_ordered_components_list(self):
+        """
+        Returns:
+        ref_arr_sorted (array of str): see get_ordered_components_list
+        footprint_dict (dict): see get_ordered_components_list
+        """
+        cmpnt_arr = [{'ref': ref, 'pins': self.pins_of_ref(ref)} for ref in self.refs]
+
+        sorted_components = sorted(cmpnt_arr, key=lambda item: item['pins'], reverse=True)
+
+        ref_arr_sorted = []
+        for cmpnt in sorted_components:
+            if cmpnt['pins'] != 0:
+                ref_arr_sorted.append(cmpnt['ref'])
+
+        return ref_arr_sorted, {footprint: refs.copy() for footprint, refs in self.footprint_dict.items()}
+
+def get_connections(filename_net):
+    """
+    Gets all the net connections from the .net file
+
+    Parameters:
+    filename_net (str): string of the .net file path
+
+    Returns:
+    nets_arr (array of dicts): array of each net represented by a {'name': '', 'node arr': []} format.
+    'node arr' represented as an array of node dicts as {'ref': '', 'pin': '', 'footprint': ''}
+    """
+    return Netlist(filename_net).get_connections()
 
 def get_lib_part(root, ref):
     """
@@ -169,33 +237,7 @@ def get_ordered_components_list(filename_net):
     footprint_dict (dict): 'footprint': [array of refs]
 
     """
-    net = Objectifier(filename_net)
-    root = net.root
-
-    cmpnt_arr = []
-    footprint_dict = {}
-
-    for component in root.xpath('/export/components/comp'):
-        ref = component.xpath('ref')[0].first_child
-        lib = component.xpath('libsource/lib')[0].first_child
-        part = component.xpath('libsource/part')[0].first_child
-        footprint = component.xpath('footprint')[0].first_child
-        pins = get_pins_of_ref(root, lib, part)
-        cmpnt_arr.append({'ref': ref, 'pins': pins})
-
-        if footprint in footprint_dict.keys():
-            footprint_dict[footprint].append(ref)
-        else:
-            footprint_dict[footprint] = [ref]
-
-    sorted_components = sorted(cmpnt_arr, key=lambda item: item['pins'], reverse=True)
-    
-    ref_arr_sorted = []
-    for cmpnt in sorted_components:
-        if cmpnt['pins'] != 0:
-            ref_arr_sorted.append(cmpnt['ref'])
-
-    return ref_arr_sorted, footprint_dict
+    return Netlist(filename_net).get_ordered_components_list()
 
 
 def get_pins_of_ref(root, lib, part):
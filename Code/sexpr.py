@@ -3,7 +3,7 @@ code extracted from: http://rosettacode.org/wiki/S-Expressions
 """
 
 import re
-from typing import Any, Optional
+from typing import Any, Iterable, List, Optional
 
 dbg: bool = False
 
@@ -22,6 +22,101 @@ class SexprError(ValueError):
     pass
 
 
+# one token per match: a paren, a quoted string (quotes kept) or a bare atom
+token_regex = re.compile(r'[()]|"[^"\\]*(?:\\.[^"\\]*)*"|[^\s()"]+', re.S)
+number_regex = re.compile(r'-?\d+|([+-]?\d+\.\d+)')
+
+
+def sexp_tokens(sexp: str, sections: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Splits an s-expression into tokens with a single compiled regex.
+
+    sections -- names of the top level lists to keep (e.g. ['footprint']),
+                the tokens of every other top level list are dropped
+    """
+    tokens = token_regex.findall(sexp)
+    if sections is None:
+        return tokens
+
+    sections = set(sections)
+    kept = []
+    depth = 0
+    i = 0
+    n = len(tokens)
+    while i < n:
+        token = tokens[i]
+        if token == '(':
+            if depth == 1 and (i + 1 == n or tokens[i + 1] not in sections):
+                # skip to the closing paren of the section
+                skip_depth = 0
+                while i < n:
+                    token = tokens[i]
+                    if token == '(':
+                        skip_depth += 1
+                    elif token == ')':
+                        skip_depth -= 1
+                        if skip_depth == 0:
+                            break
+                    i += 1
+                i += 1
+                continue
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        kept.append(token)
+        i += 1
+
+    return kept
+
+
+def read_sexp(sexp: str, sections: Optional[Iterable[str]] = None) -> Any:
+    """
+    Parses an s-expression into the same nested lists as parse_sexp,
+    building them with an explicit stack over sexp_tokens instead of recursing through a generator per token.
+
+    sections -- names of the top level lists to keep, see sexp_tokens
+    """
+    rv: list = []
+    current = rv
+    stack = []
+    number = number_regex.fullmatch
+
+    for token in sexp_tokens(sexp, sections):
+        c = token[0]
+        if c == '(':
+            new_list: list = []
+            current.append(new_list)
+            stack.append(current)
+            current = new_list
+        elif c == ')':
+            if not stack:
+                raise SexprError('Unbalanced closing parenthesis')
+            current = stack.pop()
+        elif c == '"':
+            current.append(token[1:-1].replace('\\"', '"'))
+        elif c in '+-0123456789':
+            match = number(token)
+            if match is None:
+                current.append(token)
+            elif match.group(1) is None:
+                current.append(int(token))
+            else:
+                current.append(float(token))
+        else:
+            current.append(token)
+
+    if stack:
+        raise SexprError('Missing closing parenthesis')
+
+    if len(rv) == 0:
+        raise SexprError('No or empty expression')
+
+    if len(rv) > 1:
+        raise SexprError('Missing initial opening parenthesis')
+
+    return rv[0]
+
+
 def parse_sexp(sexp: str) -> Any:
     re_iter = re.finditer(term_regex, sexp)
     rv = list(_parse_sexp_internal(re_iter))
@@ -2,11 +2,19 @@ from cairosvg import *
 from lxml import etree
 
 import os.path
+import cv2
+import numpy as np
 
-def gen_footprint_PNG(svg_file):
+def crop_footprint_svg(root):
+	'''
+		crops a kicad-cli footprint svg to its pads (paths and circles) with a 0.1mm margin, in place
 
-	tree = etree.parse(svg_file)
-	root = tree.getroot()
+		Parameters:
+		root (lxml element) - root <svg> element
+
+		Returns:
+		(lxml element) root
+	'''
 
 	prefix = root.tag[:-3]
 
@@ -94,13 +102,37 @@ def gen_footprint_PNG(svg_file):
 
 	root.attrib['viewBox'] = new_viewbox_str[:-1]
 
+	return root
+
+def gen_footprint_PNG(svg_file, scale=4):
+
+	tree = etree.parse(svg_file)
+	crop_footprint_svg(tree.getroot())
+
 	tree.write(svg_file)
-	svg2png(url=svg_file, write_to=svg_file[:-3] + "png", scale=4, dpi=300, background_color="white")
+	svg2png(url=svg_file, write_to=svg_file[:-3] + "png", scale=scale, dpi=300, background_color="white")
 
-def gen_sch_PNG(svg_file):
+def footprint_svg_to_array(svg_file, scale=4):
+	'''
+		same image as gen_footprint_PNG, without rewriting the svg or writing the png
 
+		Returns:
+		(2D array) BGR image of the footprint
+	'''
 	tree = etree.parse(svg_file)
-	root = tree.getroot()
+
+	return svg_to_array(crop_footprint_svg(tree.getroot()), scale=scale)
+
+def crop_sch_svg(root):
+	'''
+		crops a kicad-cli schematic svg to its drawing (paths, stroked text, rects and circles) with a 0.1mm margin, in place
+
+		Parameters:
+		root (lxml element) - root <svg> element
+
+		Returns:
+		(lxml element) root
+	'''
 
 	prefix = root.tag[:-3]
 
@@ -363,12 +395,54 @@ def gen_sch_PNG(svg_file):
 
 	root.attrib['viewBox'] = new_viewbox_str[:-1]
 
+	return root
+
+def gen_sch_PNG(svg_file):
+
+	tree = etree.parse(svg_file)
+	crop_sch_svg(tree.getroot())
+
 	tree.write(svg_file)
 	svg2png(url=svg_file, write_to=svg_file[:-3] + "png", scale=4, dpi=300, background_color="white")
 
+def sch_svg_to_array(svg_file):
+	'''
+		same image as gen_sch_PNG, without rewriting the svg or writing the png
+
+		Returns:
+		(2D array) BGR image of the schematic
+	'''
+	tree = etree.parse(svg_file)
+
+	return svg_to_array(crop_sch_svg(tree.getroot()))
+
 
 def svg_to_png_gen(svg_file, background_color="white"):
 	
 	svg2png(url=svg_file, write_to=svg_file[:-3] + "png", scale=4, dpi=300, background_color=background_color)
+
+def svg_to_array(svg, scale=4, dpi=300, background_color="white"):
+	'''
+		renders an svg in memory, in place of svg_to_png_gen + cv2.imread (no png written to or read from disk)
+
+		Parameters:
+		svg (str, bytes or lxml element/tree) - svg file path, svg document or parsed svg
+
+		Optional:
+		scale (float) - output scale, as in svg2png
+		dpi (float) - output resolution, as in svg2png
+		background_color (str) - background of the image
+
+		Returns:
+		(2D array) BGR image of the svg
+	'''
+	if isinstance(svg, str):
+		png = svg2png(url=svg, scale=scale, dpi=dpi, background_color=background_color)
+	else:
+		if not isinstance(svg, bytes):
+			svg = etree.tostring(svg)
+		png = svg2png(bytestring=svg, scale=scale, dpi=dpi, background_color=background_color)
+
+	return cv2.imdecode(np.frombuffer(png, dtype=np.uint8), cv2.IMREAD_COLOR)
 	
 
@@ -0,0 +1,425 @@
+import os
+import sys
+import glob
+import time
+import random
+import shutil
+import tempfile
+
+current_directory = os.path.dirname(os.path.abspath(__file__))
+parent_directory = os.path.dirname(current_directory)
+sys.path.append(parent_directory)
+
+from PCB_utils import *
+from CircuitMatch import CircuitMatching
+from ComponentMatch import *
+from footprint_cache import get_footprint_cache
+from footprint_raster import rasterize_footprint
+from board_raster import rasterize_board
+from sch_reader import get_connections, get_ordered_components_list
+from Objectifier import Objectifier
+import sexpr
+import gerber
+
+import sexpdata
+
+import cv2
+import numpy as np
+
+evaluation_directory = os.path.dirname(parent_directory) + '/Evaluation Files'
+testfiles_directory = current_directory + '/testfiles'
+
+
+
+def load_evaluation_board(board_dir, trace_backend='contours'):
+	board_path = evaluation_directory + '/' + board_dir
+	pcb_file = glob.glob(board_path + '/*.kicad_pcb')[0]
+	drill_file = glob.glob(board_path + '/*.drl')[0]
+
+	pcb = PCB_Board(pcb_file, trace_backend=trace_backend)
+	if pcb.double_sided:
+		pcb.initialize_via_files(board_path + '/mask.png', board_path + '/traces.png', board_path + '/mask_back.png', board_path + '/traces_back.png', drill_file)
+	else:
+		pcb.initialize_via_files(board_path + '/mask.png', board_path + '/traces.png')
+
+	return pcb
+
+
+def evaluation_boards():
+	return sorted([d for d in os.listdir(evaluation_directory) if os.path.isdir(evaluation_directory + '/' + d)])
+
+
+def time_call(fxn, *args, **kwargs):
+	t = time.perf_counter()
+	result = fxn(*args, **kwargs)
+	return result, time.perf_counter() - t
+
+
+def strip_holes(board_connections_dict):
+	return {trace: {k: v for k, v in connection.items() if k != 'holes'} for trace, connection in board_connections_dict.items()}
+
+
+def benchmark_trace_backends():
+	print('benchmark_trace_backends')
+	print('board, same board_connections_dict, connected_pads (s), connected_pads_labeled (s)')
+
+	for board_dir in evaluation_boards():
+		pcb = load_evaluation_board(board_dir, trace_backend='contours')
+		pcb_labels = load_evaluation_board(board_dir, trace_backend='labels')
+
+		same = strip_holes(pcb.board_connections_dict) == strip_holes(pcb_labels.board_connections_dict)
+
+		sides = [(pcb.front_pad_map, pcb.trace_contours, pcb.trace_hierarchy, pcb.pcb_rgb)]
+		if pcb.double_sided:
+			sides.append((pcb.back_pad_map, pcb.trace_back_contours, pcb.trace_back_hierarchy, pcb.pcb_rgb_back))
+
+		hole_arr = pcb.hole_arr if hasattr(pcb, 'hole_arr') else []
+
+		times = {}
+		for backend, fxn in TRACE_BACKENDS.items():
+			times[backend] = 0
+			for pad_map, trace_contours, trace_hierarchy, pcb_rgb in sides:
+				t_inv_img_grey = cv2.bitwise_not(cv2.cvtColor(pcb_rgb, cv2.COLOR_BGR2GRAY))
+				trace_map, t = time_call(fxn, pad_map, trace_contours, trace_hierarchy, t_inv_img_grey, hole_arr=hole_arr)
+				times[backend] += t
+
+		print(f"{board_dir}, {same}, {times['contours']:.3f}, {times['labels']:.3f}")
+
+def random_trace_cuts(pcb, rng, num_cuts=3):
+	trace_cuts = {'front cuts': [], 'back cuts': []}
+	sides = [('front', pcb.pcb_rgb)]
+	if pcb.double_sided:
+		sides.append(('back', pcb.pcb_rgb_back))
+
+	for fb, pcb_rgb in sides:
+		ys, xs = np.where(pcb_rgb[:, :, 0] < 128)
+		for n in range(num_cuts):
+			k = rng.randrange(len(xs))
+			x, y, r = int(xs[k]), int(ys[k]), rng.randrange(2, 12)
+			trace_cuts[fb + ' cuts'].append(np.array([[[x - r, y - r]], [[x + r, y - r]], [[x + r, y + r]], [[x - r, y + r]]], np.int32))
+
+	return trace_cuts
+
+
+def benchmark_trace_cuts(num_steps=6):
+	print('benchmark_trace_cuts')
+	print('board, same board_connections_dict, incremental update_profile (s), full update_profile (s)')
+
+	for board_dir in evaluation_boards():
+		pcb = load_evaluation_board(board_dir)
+		full_pcb = pcb.copy_self()
+		rng = random.Random(0)
+
+		same = True
+		times = {'incremental': 0, 'full': 0}
+		for step in range(num_steps):
+			trace_cuts = random_trace_cuts(pcb, rng)
+
+			for name, board in [('incremental', pcb), ('full', full_pcb)]:
+				new_pcb_rgb = board.pcb_rgb.copy()
+				for trace_cut_cnt in trace_cuts['front cuts']:
+					cv2.drawContours(new_pcb_rgb, [trace_cut_cnt], 0, (255, 255, 255), -1)
+
+				if board.double_sided:
+					new_pcb_rgb_back = board.pcb_rgb_back.copy()
+					for trace_cut_cnt in trace_cuts['back cuts']:
+						cv2.drawContours(new_pcb_rgb_back, [trace_cut_cnt], 0, (255, 255, 255), -1)
+					result, t = time_call(board.update_profile, new_pcb_rgb, new_pcb_rgb_back, incremental=(name == 'incremental'))
+				else:
+					result, t = time_call(board.update_profile, new_pcb_rgb, incremental=(name == 'incremental'))
+				times[name] += t
+
+			same = same and pcb.board_connections_dict == full_pcb.board_connections_dict
+
+		print(f"{board_dir}, {same}, {times['incremental']:.3f}, {times['full']:.3f}")
+
+
+def prepare_test_footprints(temp_dir, footprints):
+	'''
+	places the test footprints in .pretty libraries with their images already in the footprint cache (no kicad-cli needed)
+	'''
+	footprints_dir = temp_dir + '/footprints/'
+	fp_cache = get_footprint_cache(temp_dir, 'no-kicad-cli')
+
+	for fp, test_fp in footprints.items():
+		lib, name = fp.split(':')
+		fp_parent_file = footprints_dir + lib + '.pretty'
+		os.makedirs(fp_parent_file, exist_ok=True)
+		shutil.copyfile(testfiles_directory + '/' + test_fp + '.kicad_mod', fp_parent_file + '/' + name + '.kicad_mod')
+
+		png_file = temp_dir + '/' + name + '.render.png'
+		shutil.copyfile(testfiles_directory + '/' + test_fp + '.png', png_file)
+		fp_cache._install(fp_cache.key(fp_parent_file, name), fp_parent_file, name, png_file)
+
+	return footprints_dir
+
+
+def benchmark_fill_cm_data(worker_counts=[1, 2, 4]):
+	print('benchmark_fill_cm_data')
+	print('workers, same cm_data as serial, fill_cm_data (s)')
+
+	net_file = testfiles_directory + '/1_test_net.net'
+	pcb = PCB_Board(testfiles_directory + '/1_test_pcb.kicad_pcb')
+	pcb.initialize_via_files(testfiles_directory + '/1_test_pcb_mask.png', testfiles_directory + '/1_test_pcb_traces.png')
+
+	net_arr = get_connections(net_file)
+	sorted_refs, footprint_dict = get_ordered_components_list(net_file)
+
+	temp_dir = tempfile.mkdtemp()
+	try:
+		# only the resistor & SOIC footprints are in testfiles, the other 0805 parts use the resistor's
+		test_footprints = {fp: 'SOIC-8_3.9x4.9mm_P1.27mm' if 'SOIC' in fp else 'R_0805_2012Metric' for fp in footprint_dict.keys()}
+		footprints_dir = prepare_test_footprints(temp_dir, test_footprints)
+
+		serial_summary = None
+		for workers in worker_counts:
+			cir_m = CircuitMatching(sorted_refs, footprint_dict, net_arr)
+			cir_m.pcb_board = pcb
+			result, t = time_call(cir_m.fill_cm_data, temp_dir, 'no-kicad-cli', footprints_dir, workers=workers)
+
+			summary = {ref: [(match.coordinates, match.orientation, match.fb, match.pad_list, match.score) for match in val['matches']] for ref, val in cir_m.cm_data.items()}
+			if serial_summary is None:
+				serial_summary = summary
+
+			print(f'{workers}, {summary == serial_summary}, {t:.3f}')
+	finally:
+		shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def benchmark_sexpr_parsers(boards=['UNO', 'Cantact'], repeats=3):
+	print('benchmark_sexpr_parsers')
+	print('board, sexpdata.load (s), Objectifier (s), Objectifier board bounds sections (s), parse_sexp (s), read_sexp (s)')
+
+	for board_dir in boards:
+		pcb_file = glob.glob(evaluation_directory + '/' + board_dir + '/*.kicad_pcb')[0]
+		with open(pcb_file) as f:
+			text = f.read()
+
+		calls = [(sexpdata.loads, text), (Objectifier, pcb_file), (lambda file: Objectifier(file, sections=['gr_rect', 'gr_line', 'gr_arc', 'gr_circle']), pcb_file), (sexpr.parse_sexp, text), (sexpr.read_sexp, text)]
+		times = [min(time_call(fxn, arg)[1] for i in range(repeats)) for fxn, arg in calls]
+
+		print(board_dir + ', ' + ', '.join(f'{t:.3f}' for t in times))
+
+
+def benchmark_footprint_raster(repeats=20):
+	print('benchmark_footprint_raster')
+	print('footprint, same shape as kicad-cli render, copper IoU, rasterize_footprint (ms)')
+
+	for fp_file in sorted(glob.glob(testfiles_directory + '/*.kicad_mod')):
+		expected = cv2.imread(fp_file[:-len('.kicad_mod')] + '.png')
+		img, t = min((time_call(rasterize_footprint, fp_file) for i in range(repeats)), key=lambda result: result[1])
+
+		iou = None
+		if expected is not None and expected.shape == img.shape:
+			copper = img[:, :, 0] < 128
+			expected_copper = expected[:, :, 0] < 128
+			iou = np.count_nonzero(copper & expected_copper) / np.count_nonzero(copper | expected_copper)
+
+		print(f'{os.path.basename(fp_file)}, {expected is not None and expected.shape == img.shape}, {iou}, {t * 1000:.1f}')
+
+
+def benchmark_board_raster():
+	print('benchmark_board_raster')
+	print('board, rasterize_board (s), copper IoU with the kicad-cli images (F.Mask, F.Cu, B.Mask, B.Cu)')
+
+	images_files = {'F.Mask': 'mask.png', 'F.Cu': 'traces.png', 'B.Mask': 'mask_back.png', 'B.Cu': 'traces_back.png'}
+	for board_dir in evaluation_boards():
+		board_path = evaluation_directory + '/' + board_dir
+		(images, hole_arr), t = time_call(rasterize_board, glob.glob(board_path + '/*.kicad_pcb')[0])
+
+		ious = []
+		for layer, png in images_files.items():
+			expected = cv2.imread(board_path + '/' + png)
+			h, w = min(expected.shape[0], images[layer].shape[0]), min(expected.shape[1], images[layer].shape[1])
+			copper = images[layer][:h, :w, 0] < 128
+			expected_copper = expected[:h, :w, 0] < 128
+			ious.append(np.count_nonzero(copper & expected_copper) / np.count_nonzero(copper | expected_copper))
+
+		print(f'{board_dir}, {t:.3f}, ' + ', '.join(f'{iou:.3f}' for iou in ious))
+
+
+def benchmark_drill_reader(repeats=5):
+	print('benchmark_drill_reader')
+	print('board, holes, gerber.read (ms), getHoleArrayFromDRL (ms), drillToPixels (ms)')
+
+	for board_dir in evaluation_boards():
+		drill = glob.glob(evaluation_directory + '/' + board_dir + '/*.drl')[0]
+		tl_coords, width, height = get_board_bounds(glob.glob(evaluation_directory + '/' + board_dir + '/*.kicad_pcb')[0])
+
+		t_pcb_tools = min(time_call(gerber.read, drill)[1] for i in range(repeats))
+		holes, t_reader = min((time_call(getHoleArrayFromDRL, drill) for i in range(repeats)), key=lambda result: result[1])
+		t_pixels = min(time_call(drillToPixels, holes['x'], holes['y'], tl_coords, width, height, (4000, 4000, 3))[1] for i in range(repeats))
+
+		print(f'{board_dir}, {len(holes)}, {t_pcb_tools * 1000:.2f}, {t_reader * 1000:.2f}, {t_pixels * 1000:.3f}')
+
+
+def benchmark_hole_backends(repeats=3):
+	print('benchmark_hole_backends')
+	print('board, trace contours, holes, contours: classify_holes / map_vias / map_back_traces (ms), labels: same (ms), same result')
+
+	for board_dir in evaluation_boards():
+		pcb = load_evaluation_board(board_dir)
+		if not pcb.double_sided:
+			continue
+
+		t_inv_img_grey = cv2.bitwise_not(cv2.cvtColor(pcb.pcb_rgb, cv2.COLOR_BGR2GRAY))
+		tb_inv_img_grey = cv2.bitwise_not(cv2.cvtColor(pcb.pcb_rgb_back, cv2.COLOR_BGR2GRAY))
+
+		times = []
+		results = []
+		for hole_backend in ['contours', 'labels']:
+			fxns = HOLE_BACKENDS[hole_backend]
+			hole_arr = [Hole(diameter=hole.diameter, isPlated=hole.isPlated, isVia=False, coordinates=hole.coordinates) for hole in pcb.hole_arr]
+
+			vias_dict, t_classify = time_call(fxns['classify'], hole_arr, pcb.mask_rgb, pcb.trace_contours, pcb.trace_hierarchy, t_inv_img_grey)
+			t_vias = min(time_call(fxns['vias'], hole_arr, pcb.trace_contours, pcb.trace_hierarchy, t_inv_img_grey)[1] for i in range(repeats))
+			connected_traces_back_dict, t_back = min((time_call(fxns['back'], vias_dict, pcb.trace_back_contours, pcb.trace_back_hierarchy, tb_inv_img_grey) for i in range(repeats)), key=lambda result: result[1])
+
+			hole_IDs = {id(hole): hole_ID for hole_ID, hole in enumerate(hole_arr)}
+			results.append(([(hole.isVia, getattr(hole, 'isThroughHole', None), getattr(hole, 'isDrillHole', None)) for hole in hole_arr], [(trace, [hole_IDs[id(hole)] for hole in vias['holes']]) for trace, vias in vias_dict.items()], list(connected_traces_back_dict.items())))
+			times.append(f'{t_classify * 1000:.1f} / {t_vias * 1000:.1f} / {t_back * 1000:.1f}')
+
+		print(f'{board_dir}, {len(pcb.trace_contours)}, {len(pcb.hole_arr)}, {times[0]}, {times[1]}, {results[0] == results[1]}')
+
+
+def benchmark_pyramid_search(footprints=['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric'], factors=[2, 4, 8], threshold=0.15):
+	print('benchmark_pyramid_search')
+	print('board, footprint, coverage_map over all orientations (ms), coverage_map_pyramid per factor (ms), same peaks above threshold')
+
+	for board_dir in evaluation_boards():
+		pcb = load_evaluation_board(board_dir)
+		img = pcb.mask_rgb
+
+		for fp_name in footprints:
+			cm = ComponentMatching()
+			cm.pcb_board = pcb
+			cm.initialize_fp_from_file(testfiles_directory + '/' + fp_name + '.png', testfiles_directory + '/' + fp_name + '.kicad_mod')
+			bank = cm.get_template_bank()
+
+			t_full = 0
+			t_pyramid = {factor: 0 for factor in factors}
+			same = True
+			for orientation in bank.orientations:
+				template = bank.get(orientation)['template']
+				rad = max(int(min(template.shape[:2])/20), int(min(img.shape[:2])/140))
+
+				res, t = time_call(coverage_map, img, template, rad)
+				t_full += t
+
+				for factor in factors:
+					pyramid_res, t = time_call(coverage_map_pyramid, img, template, rad, threshold, factor=factor)
+					t_pyramid[factor] += t
+					same = same and np.array_equal(np.where(res > threshold, res, 0), np.where(pyramid_res > threshold, pyramid_res, 0))
+
+			print(f'{board_dir}, {fp_name}, {t_full * 1000:.1f}, ' + ', '.join(f'{factor}: {t * 1000:.1f}' for factor, t in t_pyramid.items()) + f', {same}')
+
+
+def benchmark_pad_prefilter(footprints=['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric']):
+	print('benchmark_pad_prefilter')
+	print('board, footprint, find_matches without / with the pad prefilter (s), windows, pruned, same matches')
+
+	for board_dir in evaluation_boards():
+		pcb = load_evaluation_board(board_dir)
+
+		for fp_name in footprints:
+			times = []
+			results = []
+			for pad_prefilter in [False, True]:
+				cm = ComponentMatching(pad_prefilter=pad_prefilter)
+				cm.pcb_board = pcb
+				cm.initialize_fp_from_file(testfiles_directory + '/' + fp_name + '.png', testfiles_directory + '/' + fp_name + '.kicad_mod')
+
+				matches, t = time_call(cm.find_matches, pcb.mask_rgb, cm.footprint_rgb, cm.fp_alpha, pcb.front_pad_map, 0)
+				times.append(t)
+				results.append([(match.coordinates, match.pad_list) for match in matches])
+
+			print(f'{board_dir}, {fp_name}, {times[0]:.2f}, {times[1]:.2f}, {cm.window_stats["windows"]}, {cm.window_stats["pruned"]}, {results[0] == results[1]}')
+
+
+def benchmark_geometric_match(footprints=['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric']):
+	print('benchmark_geometric_match')
+	print('board, footprint, get_matches raster / geometric (s), raster matches, geometric matches, geometric matches also found by raster')
+
+	for board_dir in evaluation_boards():
+		pcb = load_evaluation_board(board_dir)
+
+		for fp_name in footprints:
+			times = []
+			results = []
+			for match_engine in MATCH_ENGINES:
+				cm = ComponentMatching(match_engine=match_engine)
+				cm.pcb_board = pcb
+				cm.initialize_fp_from_file(testfiles_directory + '/' + fp_name + '.png', testfiles_directory + '/' + fp_name + '.kicad_mod')
+
+				matches, t = time_call(cm.get_matches)
+				times.append(t)
+				results.append(set((match.fb, tuple(sorted(match.pad_list))) for match in matches))
+
+			print(f'{board_dir}, {fp_name}, {times[0]:.2f}, {times[1]:.3f}, {len(results[0])}, {len(results[1])}, {len(results[0] & results[1])}')
+
+
+def benchmark_pad_info(footprints=['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric']):
+	print('benchmark_pad_info')
+	print('board, footprint, find_matches without the pad prefilter with the contours / labels get_pad_info (s), windows, same matches')
+
+	for board_dir in evaluation_boards():
+		pcb = load_evaluation_board(board_dir)
+
+		for fp_name in footprints:
+			times = []
+			results = []
+			for backend in ['contours', 'labels']:
+				cm = ComponentMatching(pad_prefilter=False, pad_info_backend=backend)
+				cm.pcb_board = pcb
+				cm.initialize_fp_from_file(testfiles_directory + '/' + fp_name + '.png', testfiles_directory + '/' + fp_name + '.kicad_mod')
+
+				matches, t = time_call(cm.find_matches, pcb.mask_rgb, cm.footprint_rgb, cm.fp_alpha, pcb.front_pad_map, 0)
+				times.append(t)
+				results.append([(match.coordinates, match.pad_list) for match in matches])
+
+			print(f'{board_dir}, {fp_name}, {times[0]:.2f}, {times[1]:.2f}, {cm.window_stats["windows"]}, {results[0] == results[1]}')
+
+
+def minmaxloc_peaks(res, threshold, rad):
+	# peak loop find_matches used before find_peaks
+	res = res.copy()
+	peaks = []
+	while True:
+		min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+		if max_val <= threshold:
+			return peaks
+		peaks.append((max_val, max_loc))
+		cv2.circle(res, (max_loc), radius=rad, color=0, thickness=cv2.FILLED)
+
+
+def benchmark_peak_extraction(footprints=['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric']):
+	print('benchmark_peak_extraction')
+	print('board, footprint, peaks of the 0 degree score map with the minMaxLoc loop / find_peaks (s), peaks, same peaks')
+
+	for board_dir in evaluation_boards():
+		pcb = load_evaluation_board(board_dir)
+
+		for fp_name in footprints:
+			cm = ComponentMatching()
+			cm.pcb_board = pcb
+			cm.initialize_fp_from_file(testfiles_directory + '/' + fp_name + '.png', testfiles_directory + '/' + fp_name + '.kicad_mod')
+
+			# radius of find_matches (the same for scoring and suppression)
+			h, w = cm.footprint_rgb.shape[:2]
+			rad = max(int(min(h, w)/20), int(min(pcb.mask_rgb.shape[:2])/140))
+			res = coverage_map(pcb.mask_rgb, cm.footprint_rgb, rad)
+
+			loop_peaks, loop_t = time_call(minmaxloc_peaks, res, 0.15, rad)
+			peaks, t = time_call(find_peaks, res, 0.15, rad)
+
+			print(f'{board_dir}, {fp_name}, {loop_t:.3f}, {t:.3f}, {len(peaks)}, {peaks == loop_peaks}')
+
+
+
+
+if __name__ == '__main__':
+	benchmarks = {'trace_backends': benchmark_trace_backends, 'trace_cuts': benchmark_trace_cuts, 'fill_cm_data': benchmark_fill_cm_data, 'sexpr_parsers': benchmark_sexpr_parsers, 'footprint_raster': benchmark_footprint_raster, 'board_raster': benchmark_board_raster, 'drill_reader': benchmark_drill_reader, 'hole_backends': benchmark_hole_backends, 'pyramid_search': benchmark_pyramid_search, 'pad_prefilter': benchmark_pad_prefilter, 'geometric_match': benchmark_geometric_match, 'pad_info': benchmark_pad_info, 'peak_extraction': benchmark_peak_extraction}
+
+	selected = sys.argv[1:] if len(sys.argv) > 1 else benchmarks.keys()
+	for name in selected:
+		benchmarks[name]()
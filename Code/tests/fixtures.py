@@ -0,0 +1,51 @@
+"""
+    Boards and footprints shared by the test modules.
+"""
+
+import os
+import sys
+
+current_directory = os.path.dirname(os.path.abspath(__file__))
+parent_directory = os.path.dirname(current_directory)
+sys.path.append(parent_directory)
+
+from ComponentMatch import *
+
+from PCB_utils import PCB_Board
+
+
+def load_board(board_ID, trace_backend='contours'):
+    pcb_file = current_directory + '/testfiles/' + board_ID + '_test_pcb.kicad_pcb'
+    mask_file_png = current_directory + '/testfiles/' + board_ID + '_test_pcb_mask.png'
+    pcb_file_png = current_directory + '/testfiles/' + board_ID + '_test_pcb_traces.png'
+
+    pcb = PCB_Board(pcb_file, trace_backend=trace_backend)
+    pcb.initialize_via_files(mask_file_png, pcb_file_png)
+
+    return pcb
+
+def load_double_sided_board(trace_backend='contours', hole_backend='contours'):
+    pcb_file = current_directory + '/testfiles/Adafruit LSM9DS1 Rev C.kicad_pcb'
+    mask_file_png = current_directory + '/testfiles/24_test_pcb_mask.png'
+    maskb_file_png = current_directory + '/testfiles/24_test_pcb_mask_back.png'
+    pcb_file_png = current_directory + '/testfiles/24_test_pcb_traces.png'
+    pcbb_file_png = current_directory + '/testfiles/24_test_pcb_traces_back.png'
+    drill_file = current_directory + '/testfiles/Adafruit LSM9DS1 Rev C.drl'
+
+    pcb = PCB_Board(pcb_file, trace_backend=trace_backend, hole_backend=hole_backend)
+    pcb.initialize_via_files(mask_file_png, pcb_file_png, maskb_file_png, pcbb_file_png, drill_file)
+
+    return pcb
+
+def load_component_matching(pcb, fp_name, scoring_engine='ccorr', search_mode='full'):
+    fp_file_png = current_directory + '/testfiles/' + fp_name + '.png'
+    fp_file = current_directory + '/testfiles/' + fp_name + '.kicad_mod'
+
+    cm = ComponentMatching(scoring_engine=scoring_engine, search_mode=search_mode)
+    cm.pcb_board = pcb
+    cm.initialize_fp_from_file(fp_file_png, fp_file)
+
+    return cm
+
+def match_summary(matches):
+    return [(match.coordinates, match.orientation, match.fb, match.pad_list, match.score) for match in matches]
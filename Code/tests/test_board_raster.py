@@ -0,0 +1,53 @@
+import unittest
+
+from fixtures import *
+from board_raster import BoardLayers, rasterize_board
+from identifyHoles import getHolesFromDRL
+
+
+class TestBoardRaster(unittest.TestCase):
+
+    def copper(self, img):
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) < 128
+
+    def test_matches_kicad_cli_images(self):
+        images, hole_arr = rasterize_board(current_directory + '/testfiles/1_test_pcb.kicad_pcb', ['F.Mask', 'F.Cu'])
+
+        for layer, png in [('F.Mask', '1_test_pcb_mask.png'), ('F.Cu', '1_test_pcb_traces.png')]:
+            expected = cv2.imread(current_directory + '/testfiles/' + png)
+            img = images[layer]
+
+            # kicad-cli rounds the page size differently, at most a pixel of empty border
+            self.assertLessEqual(abs(img.shape[0] - expected.shape[0]), 1)
+            self.assertLessEqual(abs(img.shape[1] - expected.shape[1]), 1)
+
+            h, w = min(img.shape[0], expected.shape[0]), min(img.shape[1], expected.shape[1])
+            copper, expected_copper = self.copper(img[:h, :w]), self.copper(expected[:h, :w])
+            self.assertGreater(np.count_nonzero(copper & expected_copper) / np.count_nonzero(copper | expected_copper), 0.97)
+
+    def test_holes_match_drill_file(self):
+        pcb_file = current_directory + '/testfiles/Adafruit LSM9DS1 Rev C.kicad_pcb'
+        hole_arr = BoardLayers(pcb_file).hole_arr
+        drill_holes = getHolesFromDRL(current_directory + '/testfiles/Adafruit LSM9DS1 Rev C.drl')
+
+        self.assertEqual(len(hole_arr), len(drill_holes))
+        board_xy = np.array([hole.coordinates for hole in hole_arr])
+        for drill_hole in drill_holes:
+            # the drill file keeps 3 decimals
+            nearest = np.argmin(np.linalg.norm(board_xy - drill_hole.coordinates, axis=1))
+            self.assertLess(np.linalg.norm(board_xy[nearest] - drill_hole.coordinates), 0.001)
+            self.assertAlmostEqual(hole_arr[nearest].diameter, drill_hole.diameter, places=3)
+
+    def test_profile_matches_image_files(self):
+        for board_ID in ['0', '1']:
+            pcb = load_board(board_ID)
+            board_pcb = PCB_Board(current_directory + '/testfiles/' + board_ID + '_test_pcb.kicad_pcb')
+            board_pcb.initialize_via_board()
+
+            self.assertEqual(len(board_pcb.mask_contours), len(pcb.mask_contours))
+            self.assertEqual(len(board_pcb.board_connections_dict), len(pcb.board_connections_dict))
+            self.assertEqual(sorted(len(connection['front pads']) for connection in board_pcb.board_connections_dict.values()), sorted(len(connection['front pads']) for connection in pcb.board_connections_dict.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
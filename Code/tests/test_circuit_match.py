@@ -0,0 +1,47 @@
+import unittest
+
+from fixtures import *
+from footprint_cache import get_footprint_cache
+from CircuitMatch import CircuitMatching
+
+import shutil
+import tempfile
+
+
+class TestParallelComponentMatching(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_same_as_serial(self):
+        # two libraries with differently named copies of the SOIC footprint, images already cached (no kicad-cli needed)
+        footprints_dir = self.temp_dir + '/footprints/'
+        fp_cache = get_footprint_cache(self.temp_dir, 'no-kicad-cli')
+        footprints_dict = {'LibA:SOIC-8_A': ['U1', 'U3'], 'LibB:SOIC-8_B': ['U2']}
+
+        for fp in footprints_dict.keys():
+            lib, name = fp.split(':')
+            fp_parent_file = footprints_dir + lib + '.pretty'
+            os.makedirs(fp_parent_file)
+            shutil.copyfile(current_directory + '/testfiles/SOIC-8_3.9x4.9mm_P1.27mm.kicad_mod', fp_parent_file + '/' + name + '.kicad_mod')
+            shutil.copyfile(current_directory + '/testfiles/SOIC-8_3.9x4.9mm_P1.27mm.png', self.temp_dir + '/render.png')
+            fp_cache._install(fp_cache.key(fp_parent_file, name), fp_parent_file, name, self.temp_dir + '/render.png')
+
+        pcb = load_board('0')
+        cm_data = {}
+        for workers in [1, 2]:
+            cir_m = CircuitMatching(['U1', 'U2', 'U3'], footprints_dict, [])
+            cir_m.pcb_board = pcb
+            cir_m.fill_cm_data(self.temp_dir, 'no-kicad-cli', footprints_dir, workers=workers)
+            cm_data[workers] = [(ref, match_summary(val['matches'])) for ref, val in cir_m.cm_data.items()]
+
+        self.assertEqual(cm_data[1], cm_data[2])
+        self.assertEqual([ref for ref, matches in cm_data[2]], ['U1', 'U3', 'U2'])
+        self.assertTrue(len(cm_data[2][0][1]) > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
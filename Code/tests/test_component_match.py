@@ -0,0 +1,401 @@
+import unittest
+
+from fixtures import *
+from ComponentMatch import _template_banks, _pin_mappings
+from geometric_match import MIN_PAD_COVERAGE
+
+import random
+import shutil
+import tempfile
+
+
+class TestScoringEngines(unittest.TestCase):
+
+    def test_coverage_maps_identical(self):
+        for board_ID in ['0', '1']:
+            pcb = load_board(board_ID)
+            for fp_name in ['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric']:
+                cm = load_component_matching(pcb, fp_name)
+                for orientation in [0, 45]:
+                    template = cv2.bitwise_not(rotation(cm.fp_alpha, orientation))
+
+                    loop_res = coverage_map(pcb.mask_rgb, template, 11, engine='loop')
+                    for engine in ['ccorr', 'fft']:
+                        res = coverage_map(pcb.mask_rgb, template, 11, engine=engine)
+                        self.assertTrue(np.array_equal(loop_res, res), f'{engine} differs on board {board_ID} / {fp_name} / {orientation}')
+
+    def test_peak_picks_identical(self):
+        for board_ID, fp_name in [('0', 'SOIC-8_3.9x4.9mm_P1.27mm'), ('1', 'R_0805_2012Metric')]:
+            pcb = load_board(board_ID)
+
+            results = {}
+            for engine in SCORING_ENGINES:
+                cm = load_component_matching(pcb, fp_name, scoring_engine=engine)
+                matches = cm.find_matches(pcb.mask_rgb, cm.footprint_rgb, cm.fp_alpha, pcb.front_pad_map, 0)
+                results[engine] = match_summary(matches)
+
+            self.assertEqual(results['loop'], results['ccorr'])
+            self.assertEqual(results['loop'], results['fft'])
+
+    def test_unknown_engine(self):
+        img = np.full((20, 20, 3), 255, np.uint8)
+        with self.assertRaises(ValueError):
+            coverage_map(img, img[:5, :5], 1, engine='gpu')
+
+
+class TestPyramidSearch(unittest.TestCase):
+
+    def test_peaks_identical(self):
+        pcb = load_board('1')
+        for fp_name in ['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric']:
+            bank = load_component_matching(pcb, fp_name).get_template_bank()
+            for orientation in bank.orientations:
+                template = bank.get(orientation)['template']
+
+                res = coverage_map(pcb.mask_rgb, template, 11)
+                pyramid_res = coverage_map_pyramid(pcb.mask_rgb, template, 11, 0.15)
+
+                # every offset above the threshold keeps its score, the others keep it or are skipped
+                self.assertTrue(np.array_equal(np.where(res > 0.15, res, 0), np.where(pyramid_res > 0.15, pyramid_res, 0)), f'{fp_name} / {orientation}')
+                self.assertTrue(np.all((pyramid_res == res) | (pyramid_res == 0)), f'{fp_name} / {orientation}')
+
+    def test_matches_identical(self):
+        pcb = load_board('0')
+        full = load_component_matching(pcb, 'SOIC-8_3.9x4.9mm_P1.27mm').get_matches()
+        pyramid = load_component_matching(pcb, 'SOIC-8_3.9x4.9mm_P1.27mm', search_mode='pyramid').get_matches()
+
+        self.assertEqual(match_summary(full), match_summary(pyramid))
+
+        pcb = load_board('1')
+        for fp_name in ['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric']:
+            results = {}
+            for search_mode in SEARCH_MODES:
+                cm = load_component_matching(pcb, fp_name, search_mode=search_mode)
+                results[search_mode] = match_summary(cm.find_matches(pcb.mask_rgb, cm.footprint_rgb, cm.fp_alpha, pcb.front_pad_map, 0))
+
+            self.assertEqual(results['full'], results['pyramid'])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            ComponentMatching(search_mode='coarse')
+
+
+class TestPadPrefilter(unittest.TestCase):
+
+    def test_pad_features(self):
+        pcb = load_board('1')
+        pad_index = pcb.get_pad_index('front')
+        features = pcb.get_pad_features('front')
+
+        self.assertEqual(len(features), len(pcb.mask_contours))
+        for pad_ID in random.Random(0).sample(range(len(features)), 20):
+            x, y, w, h = cv2.boundingRect(pcb.mask_contours[pad_ID])
+            self.assertEqual((features[pad_ID]['x'], features[pad_ID]['y'], features[pad_ID]['w'], features[pad_ID]['h']), (x, y, w, h))
+            self.assertEqual((int(features[pad_ID]['cx']), int(features[pad_ID]['cy'])), pad_index.pad_centers[pad_ID])
+            self.assertAlmostEqual(features[pad_ID]['area'], cv2.contourArea(pcb.mask_contours[pad_ID]))
+
+    def test_window_without_pads(self):
+        pcb = load_board('0')
+        cm = load_component_matching(pcb, 'SOIC-8_3.9x4.9mm_P1.27mm')
+        signature, pad_features, pad_weights = cm.get_prefilter_data(cm.fp_alpha, pcb.front_pad_map)
+
+        self.assertEqual(signature['num_pads'], cm.num_fp_pads)
+        self.assertFalse(window_can_match((-1000, -1000), (100, 100), signature, pad_features, pad_weights, cm.num_fp_pads))
+
+    def test_matches_identical(self):
+        pcb = load_board('0')
+        results = {}
+        for pad_prefilter in [False, True]:
+            cm = ComponentMatching(pad_prefilter=pad_prefilter)
+            cm.pcb_board = pcb
+            cm.initialize_fp_from_file(current_directory + '/testfiles/SOIC-8_3.9x4.9mm_P1.27mm.png', current_directory + '/testfiles/SOIC-8_3.9x4.9mm_P1.27mm.kicad_mod')
+            results[pad_prefilter] = match_summary(cm.get_matches())
+
+        self.assertEqual(results[False], results[True])
+        self.assertGreater(cm.window_stats['pruned'], 0)
+        self.assertLessEqual(cm.window_stats['pruned'], cm.window_stats['windows'])
+
+        pcb = load_board('1')
+        results = {}
+        for pad_prefilter in [False, True]:
+            cm = load_component_matching(pcb, 'R_0805_2012Metric')
+            cm.pad_prefilter = pad_prefilter
+            results[pad_prefilter] = match_summary(cm.find_matches(pcb.mask_rgb, cm.footprint_rgb, cm.fp_alpha, pcb.front_pad_map, 0))
+
+        self.assertEqual(results[False], results[True])
+        self.assertGreater(len(results[True]), 0)
+
+
+class TestGeometricMatching(unittest.TestCase):
+
+    def test_matches_identical(self):
+        pcb = load_board('0')
+        for fp_name in ['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric']:
+            results = {}
+            for match_engine in MATCH_ENGINES:
+                cm = load_component_matching(pcb, fp_name)
+                cm.match_engine = match_engine
+                matches = cm.get_matches()
+                results[match_engine] = set((match.fb, tuple(sorted((pin, tuple(sorted(IDs))) for pin, IDs in match.pad_IDs.items()))) for match in matches)
+
+            self.assertGreater(len(results['raster']), 0)
+            self.assertEqual(results['raster'], results['geometric'], fp_name)
+
+    def test_arbitrary_angle(self):
+        geometry = load_footprint_geometry(current_directory + '/testfiles/SOIC-8_3.9x4.9mm_P1.27mm.kicad_mod')
+
+        # two copies of the footprint pads, one turned by 30 degrees
+        mask = np.zeros((800, 1400), np.uint8)
+        for angle, offset in [(30, (400, 400)), (0, (1000, 400))]:
+            c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+            R = np.array([[c, -s], [s, c]])
+            for polygon in geometry.polygons:
+                cv2.fillPoly(mask, [np.round(polygon @ R.T + offset).astype(np.int32)], 255)
+
+        contours, hierarchy = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        pad_index = PadIndex(contours, mask.shape, gen_pad_map(contours))
+
+        placements = find_placements(geometry, pad_index)
+        orientations = sorted(placement_orientation(placement['R']) for placement in placements)
+
+        # each copy also fits turned by 180 degrees (pins swapped)
+        self.assertEqual(len(placements), 4)
+        for expected, orientation in zip([0, 150, 180, 330], orientations):
+            self.assertAlmostEqual(orientation, expected, delta=0.5)
+        for placement in placements:
+            self.assertTrue(np.all(placement['covered'] >= MIN_PAD_COVERAGE * placement['total']))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            ComponentMatching(match_engine='kdtree')
+
+    def test_match_helpers_at_arbitrary_angle(self):
+        # board 0 turned by 30 degrees
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for name in ['mask', 'traces']:
+                img = cv2.imread(current_directory + '/testfiles/0_test_pcb_' + name + '.png')
+                rot, size = rotation_matrix(img.shape[0], img.shape[1], 30)
+                cv2.imwrite(temp_dir + '/' + name + '.png', cv2.warpAffine(img, rot, size, flags=cv2.INTER_NEAREST, borderValue=tuple(int(v) for v in img[0, 0])))
+
+            pcb = PCB_Board(current_directory + '/testfiles/0_test_pcb.kicad_pcb')
+            pcb.initialize_via_files(temp_dir + '/mask.png', temp_dir + '/traces.png')
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        cm = load_component_matching(pcb, 'SOIC-8_3.9x4.9mm_P1.27mm')
+        cm.match_engine = 'geometric'
+        matches = cm.get_matches()
+        self.assertEqual(sorted(match.orientation for match in matches), [30, 210])
+
+        pin_map, pin_centers_map = cm.get_pin_mapping(cm.fp_contours, cm.fp_file)
+        for match in matches:
+            # every footprint pad of the image lands on the board pads of its pin
+            M, (w, h) = cm.get_match_warp(match)
+            for pin, cnt_ID in pin_map:
+                moments = cv2.moments(cm.fp_contours[cnt_ID])
+                x, y = M @ [moments['m10'] / moments['m00'], moments['m01'] / moments['m00'], 1] + match.coordinates
+                self.assertEqual([pad_ID for pad_ID in match.pad_IDs[pin] if cv2.pointPolygonTest(pcb.mask_contours[pad_ID], (x, y), False) > 0], match.pad_IDs[pin])
+
+            # the pads of a removed pin are found under it
+            pin, cnt_ID = pin_map[0]
+            match.removed_cnts = [cm.fp_contours[cnt_ID]]
+            cm.add_warnings_missing_pins(match)
+            self.assertEqual(sorted(match.warnings['pins_missing']['touched pads']), sorted(match.pad_IDs[pin]))
+
+            cm.pcb_rgb = pcb.pcb_rgb
+            cm.mask_contours = pcb.mask_contours
+            match_crop, pcb_view_img = cm.get_images_of_match(match, pcb.front_pad_map, {})
+            self.assertEqual(match_crop.shape[:2], (h, w))
+            self.assertTrue(np.any(np.all(match_crop == (0, 0, 255), axis=2)))
+
+    def test_raster_match_warp(self):
+        pcb = load_board('0')
+        cm = load_component_matching(pcb, 'SOIC-8_3.9x4.9mm_P1.27mm')
+        for orientation in FootprintTemplateBank().orientations:
+            M, (w, h) = cm.get_match_warp(ComponentMatch(1, {}, [], (0, 0), orientation))
+            self.assertTrue(np.array_equal(cv2.warpAffine(cm.fp_alpha, M, (w, h), flags=cv2.INTER_LINEAR), cm.get_template_bank().get(orientation)['alpha']))
+
+
+class TestPadInfoBackends(unittest.TestCase):
+
+    def test_footprint_pad_pixels(self):
+        pcb = load_board('0')
+        cm = load_component_matching(pcb, 'SOIC-8_3.9x4.9mm_P1.27mm')
+        fp_contours, hierarchy = cv2.findContours(cv2.cvtColor(cm.fp_alpha, cv2.COLOR_BGR2GRAY), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        fp_pixels = footprint_pad_pixels(cm.fp_alpha, fp_contours)
+
+        self.assertEqual(len(fp_pixels['pixels']), np.count_nonzero(cv2.cvtColor(cm.fp_alpha, cv2.COLOR_BGR2GRAY)))
+        self.assertEqual(len(fp_pixels['areas']), len(fp_contours))
+        for i, fp_cnt in enumerate(fp_contours):
+            self.assertAlmostEqual(fp_pixels['areas'][i], cv2.contourArea(fp_cnt))
+            x, y = np.unravel_index(fp_pixels['pixels'][fp_pixels['codes'] // 3 == i][0], fp_pixels['shape'])[::-1]
+            self.assertGreaterEqual(cv2.pointPolygonTest(fp_cnt, (int(x), int(y)), False), 0)
+
+    def test_matches_identical(self):
+        for board_ID, fp_name in [('1', 'R_0805_2012Metric'), ('1', 'SOIC-8_3.9x4.9mm_P1.27mm')]:
+            pcb = load_board(board_ID)
+            results = {}
+            for backend in PAD_INFO_BACKENDS:
+                cm = ComponentMatching(pad_prefilter=False, pad_info_backend=backend)
+                cm.pcb_board = pcb
+                cm.initialize_fp_from_file(current_directory + '/testfiles/' + fp_name + '.png', current_directory + '/testfiles/' + fp_name + '.kicad_mod')
+                matches = cm.find_matches(pcb.mask_rgb, cm.footprint_rgb, cm.fp_alpha, pcb.front_pad_map, 0)
+                results[backend] = [(match_summary([match]), match.pad_centers, sorted(match.pad_coverage.keys())) for match in matches]
+
+            self.assertEqual(results['labels'], results['contours'], f'board {board_ID} / {fp_name}')
+
+        pcb = load_board('0')
+        results = {}
+        for backend in PAD_INFO_BACKENDS:
+            cm = load_component_matching(pcb, 'SOIC-8_3.9x4.9mm_P1.27mm')
+            cm.pad_info_backend = backend
+            results[backend] = match_summary(cm.get_matches())
+
+        self.assertGreater(len(results['labels']), 0)
+        self.assertEqual(results['labels'], results['contours'])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            ComponentMatching(pad_info_backend='masks')
+
+
+def minmaxloc_peaks(res, threshold, rad):
+    # peak loop find_matches used before find_peaks
+    res = res.copy()
+    peaks = []
+    while True:
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+        if max_val <= threshold:
+            return peaks
+        peaks.append((max_val, max_loc))
+        cv2.circle(res, (max_loc), radius=rad, color=0, thickness=cv2.FILLED)
+
+
+class TestPeakExtraction(unittest.TestCase):
+
+    def test_peaks_identical(self):
+        pcb = load_board('1')
+        for fp_name in ['SOIC-8_3.9x4.9mm_P1.27mm', 'R_0805_2012Metric']:
+            bank = load_component_matching(pcb, fp_name).get_template_bank()
+            for orientation in [0, 45, 90]:
+                res = coverage_map(pcb.mask_rgb, bank.get(orientation)['template'], 11)
+                for threshold, rad in [(0.15, 19), (0.3, 16)]:
+                    peaks = find_peaks(res, threshold, rad)
+                    self.assertGreater(len(peaks), 0)
+                    self.assertEqual(peaks, minmaxloc_peaks(res, threshold, rad), f'{fp_name} / {orientation} / {threshold}')
+
+    def test_ties_and_edges(self):
+        # coarse values give plateaus, the suppressed circles cross the map edges
+        rng = np.random.default_rng(0)
+        for dtype in [np.float32, np.float64]:
+            res = np.round(rng.random((60, 90)), 1).astype(dtype)
+            for rad in [0, 1, 4]:
+                self.assertEqual(find_peaks(res, 0.3, rad), minmaxloc_peaks(res, 0.3, rad))
+
+        self.assertEqual(find_peaks(np.zeros((10, 10)), 0.15, 3), [])
+
+
+class TestTemplateBank(unittest.TestCase):
+
+    def test_bank_matches_rotation(self):
+        pcb = load_board('0')
+        cm = load_component_matching(pcb, 'SOIC-8_3.9x4.9mm_P1.27mm')
+        bank = cm.get_template_bank()
+
+        for orientation in [45, 90, 315]:
+            alpha = rotation(cm.fp_alpha, orientation)
+            fp_alpha_img = cv2.cvtColor(alpha, cv2.COLOR_BGR2GRAY)
+            o_fp_contours, hierarchy = cv2.findContours(fp_alpha_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+            o_map = cm.map_pads(cm.fp_contours, cm.fp_alpha, o_fp_contours, alpha, orientation)
+
+            o_bank = bank.get(orientation)
+            self.assertTrue(np.array_equal(o_bank['alpha'], alpha))
+            self.assertTrue(np.array_equal(o_bank['template'], cv2.bitwise_not(alpha)))
+            self.assertEqual(len(o_bank['contours']), len(o_fp_contours))
+            self.assertEqual(o_bank['cnt_map'], o_map)
+
+    def test_bank_shared(self):
+        pcb = load_board('0')
+        cm_a = load_component_matching(pcb, 'R_0805_2012Metric')
+        cm_b = load_component_matching(pcb, 'R_0805_2012Metric')
+
+        self.assertIs(cm_a.get_template_bank(), cm_b.get_template_bank())
+        self.assertIsNot(cm_a.get_template_bank(), cm_a.get_template_bank(cm_a.footprint_rgb.copy(), bank_ID='copy'))
+
+        bank = cm_a.get_template_bank()
+        clear_template_banks()
+        self.assertIsNot(bank, cm_b.get_template_bank())
+
+    def test_old_versions_dropped(self):
+        pcb = load_board('0')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            fp_file_png = temp_dir + '/R_0805_2012Metric.png'
+            fp_file = temp_dir + '/R_0805_2012Metric.kicad_mod'
+            shutil.copyfile(current_directory + '/testfiles/R_0805_2012Metric.png', fp_file_png)
+            shutil.copyfile(current_directory + '/testfiles/R_0805_2012Metric.kicad_mod', fp_file)
+
+            image = cv2.imread(fp_file_png)
+            ys, xs = np.nonzero(image[:, :, 0] == 0)
+            for version in range(3):
+                # a new version of both files (a pad pixel changes shade)
+                image[ys[version], xs[version]] = 1
+                cv2.imwrite(fp_file_png, image)
+                os.utime(fp_file, (1000 + version, 1000 + version))
+
+                cm = ComponentMatching()
+                cm.pcb_board = pcb
+                cm.initialize_fp_from_file(fp_file_png, fp_file)
+                cm.get_template_bank()
+                cm.get_pin_mapping(cm.fp_contours, fp_file)
+
+            self.assertEqual(len([key for key in _template_banks.keys() if key[0][0] == os.path.abspath(fp_file_png)]), 1)
+            self.assertEqual(len([key for key in _pin_mappings.keys() if key[0][0] == os.path.abspath(fp_file)]), 1)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def test_find_matches_with_bank(self):
+        pcb = load_board('1')
+        cm = load_component_matching(pcb, 'R_0805_2012Metric')
+        o_bank = cm.get_template_bank().get(45)
+
+        matches = cm.find_matches(pcb.mask_rgb, o_bank['template'], o_bank['alpha'], pcb.front_pad_map, 45)
+        bank_matches = cm.find_matches(pcb.mask_rgb, o_bank['template'], o_bank['alpha'], pcb.front_pad_map, 45, fp_contours=o_bank['contours'], fp_areas=o_bank['pad_areas'])
+
+        self.assertEqual(match_summary(matches), match_summary(bank_matches))
+
+
+class TestPinMapping(unittest.TestCase):
+
+    def test_lazy_sections(self):
+        fp_file = current_directory + '/testfiles/SOIC-8_3.9x4.9mm_P1.27mm.kicad_mod'
+        footprint_kicad = KicadMod(filename=fp_file)
+        self.assertNotIn('pads', footprint_kicad.__dict__)
+        self.assertNotIn('lines', footprint_kicad.__dict__)
+
+        pads = footprint_kicad.pads
+        self.assertIs(footprint_kicad.pads, pads)
+        self.assertEqual(pads, KicadMod(filename=fp_file)._getPads())
+
+        pads_only = KicadMod(filename=fp_file, pads_only=True)
+        self.assertEqual(pads_only.pads, pads)
+        self.assertEqual(pads_only.lines, [])
+        self.assertEqual(load_pads(fp_file), pads)
+        self.assertIs(load_pads(fp_file), load_pads(fp_file))
+
+    def test_memoized(self):
+        pcb = load_board('0')
+        cm = load_component_matching(pcb, 'SOIC-8_3.9x4.9mm_P1.27mm')
+
+        clear_template_banks()
+        pin_map, pin_centers_map = cm.get_pin_mapping(cm.fp_contours, cm.fp_file)
+        self.assertEqual(sorted(pin for pin, contour_ID in pin_map), ['1', '2', '3', '4', '5', '6', '7', '8'])
+        self.assertIs(cm.get_pin_mapping(cm.fp_contours, cm.fp_file)[0], pin_map)
+
+        # different contours aren't served from the memo
+        self.assertEqual(cm.get_pin_mapping(cm.fp_contours[:4], cm.fp_file)[0], [(pin, contour_ID) for pin, contour_ID in pin_map if contour_ID < 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from fixtures import *
+from PCB_utils import get_board_bounds, is_board_fb
+from document_cache import DocumentCache, get_document_cache, TREE_BYTES_PER_FILE_BYTE
+
+import shutil
+import tempfile
+
+
+class TestDocumentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_parsed_once(self):
+        pcb_file = self.temp_dir + '/board.kicad_pcb'
+        shutil.copyfile(current_directory + '/testfiles/0_test_pcb.kicad_pcb', pcb_file)
+
+        cache = get_document_cache()
+        is_board_fb(pcb_file)
+        document = cache.get(pcb_file)
+        get_board_bounds(pcb_file)
+        PCB_Board(pcb_file)
+        self.assertIs(cache.get(pcb_file), document)
+        self.assertEqual(len([key for key in cache.entries.keys() if key[0] == os.path.abspath(pcb_file)]), 1)
+
+        # changed on disk, parsed again & the old tree dropped
+        with open(pcb_file, 'a') as f:
+            f.write('\n')
+        os.utime(pcb_file, ns=(0, 0))
+        new_document = cache.get(pcb_file)
+        self.assertIsNot(new_document, document)
+        self.assertEqual(len([key for key in cache.entries.keys() if key[0] == os.path.abspath(pcb_file)]), 1)
+
+    def test_memory_bound(self):
+        files = [current_directory + '/testfiles/' + str(i) + '_test_pcb.kicad_pcb' for i in range(3)]
+        cache = DocumentCache(max_memory=(os.path.getsize(files[0]) + os.path.getsize(files[2])) * TREE_BYTES_PER_FILE_BYTE)
+
+        for file in files:
+            cache.get(file)
+        self.assertTrue(cache.memory <= cache.max_memory)
+        self.assertIn(cache.key(files[2]), cache.entries)
+        self.assertNotIn(cache.key(files[0]), cache.entries)
+
+        # most recently used is kept
+        cache.get(files[1])
+        cache.get(files[0])
+        self.assertIn(cache.key(files[0]), cache.entries)
+        self.assertNotIn(cache.key(files[2]), cache.entries)
+
+
+if __name__ == '__main__':
+    unittest.main()
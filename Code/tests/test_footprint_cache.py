@@ -0,0 +1,125 @@
+import unittest
+
+from fixtures import *
+from footprint_cache import FootprintCache, file_hash, prepare_footprint_png
+
+import shutil
+import tempfile
+
+
+class TestFootprintCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.fp_parent_file = current_directory + '/testfiles'
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def add_entry(self, cache, footprint):
+        # installs the existing test image as if it was rendered by kicad-cli
+        png_file = self.cache_dir + '/' + footprint + '.png'
+        shutil.copyfile(self.fp_parent_file + '/' + footprint + '.png', png_file)
+        return cache._install(cache.key(self.fp_parent_file, footprint), self.fp_parent_file, footprint, png_file)
+
+    def test_key(self):
+        cache = FootprintCache(self.cache_dir, 'no-kicad-cli')
+        key = cache.key(self.fp_parent_file, 'R_0805_2012Metric')
+
+        self.assertEqual(key, FootprintCache(self.cache_dir, 'no-kicad-cli').key(self.fp_parent_file, 'R_0805_2012Metric'))
+        self.assertNotEqual(key, cache.key(self.fp_parent_file, 'SOIC-8_3.9x4.9mm_P1.27mm'))
+        self.assertNotEqual(key, FootprintCache(self.cache_dir, 'no-kicad-cli', scale=2).key(self.fp_parent_file, 'R_0805_2012Metric'))
+        self.assertIsNone(cache.key(self.fp_parent_file, 'not_a_footprint'))
+
+    def test_entry_round_trip(self):
+        cache = FootprintCache(self.cache_dir, 'no-kicad-cli')
+        self.assertIsNone(cache.lookup(self.fp_parent_file, 'SOIC-8_3.9x4.9mm_P1.27mm'))
+
+        entry = self.add_entry(cache, 'SOIC-8_3.9x4.9mm_P1.27mm')
+        self.assertEqual(cache.lookup(self.fp_parent_file, 'SOIC-8_3.9x4.9mm_P1.27mm'), entry)
+        self.assertEqual(sorted(os.listdir(entry)), ['footprint.png', 'meta.json'])
+
+        out_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        png_file = cache.export_png(self.fp_parent_file, 'SOIC-8_3.9x4.9mm_P1.27mm', out_dir)
+        expected = cv2.imread(self.fp_parent_file + '/SOIC-8_3.9x4.9mm_P1.27mm.png')
+        self.assertTrue(np.array_equal(cv2.imread(png_file), expected))
+
+        # a second writer finishing the same entry keeps the first one
+        self.assertEqual(self.add_entry(cache, 'SOIC-8_3.9x4.9mm_P1.27mm'), entry)
+        self.assertEqual(len([name for name in os.listdir(self.cache_dir) if name.startswith('.tmp-')]), 0)
+
+    def test_export_keeps_template_bank(self):
+        cache = FootprintCache(self.cache_dir, 'no-kicad-cli')
+        self.add_entry(cache, 'R_0805_2012Metric')
+        out_dir = tempfile.mkdtemp(dir=self.cache_dir)
+
+        banks = []
+        for i in range(3):
+            png_file = cache.export_png(self.fp_parent_file, 'R_0805_2012Metric', out_dir)
+            if i == 0:
+                os.utime(png_file, (0, 0))
+            else:
+                # the image already in place is not written again
+                self.assertEqual(os.path.getmtime(png_file), 0)
+
+            cm = ComponentMatching()
+            cm.initialize_fp_from_file(png_file, self.fp_parent_file + '/R_0805_2012Metric.kicad_mod')
+            banks.append(cm.get_template_bank())
+
+        self.assertIs(banks[0], banks[1])
+        self.assertIs(banks[0], banks[2])
+
+        # an image with the same contents at a different time gives the same bank too
+        os.utime(png_file, (1000, 1000))
+        cm.initialize_fp_from_file(png_file, self.fp_parent_file + '/R_0805_2012Metric.kicad_mod')
+        self.assertIs(cm.get_template_bank(), banks[0])
+
+    def test_existing_png_kept(self):
+        cache = FootprintCache(self.cache_dir, 'no-kicad-cli')
+        self.add_entry(cache, 'R_0805_2012Metric')
+        out_dir = tempfile.mkdtemp(dir=self.cache_dir)
+
+        # an image the cache didn't write is never replaced
+        png_file = out_dir + '/R_0805_2012Metric.png'
+        shutil.copyfile(self.fp_parent_file + '/SOIC-8_3.9x4.9mm_P1.27mm.png', png_file)
+        png_hash = file_hash(png_file)
+        self.assertEqual(cache.export_png(self.fp_parent_file, 'R_0805_2012Metric', out_dir), png_file)
+        self.assertEqual(file_hash(png_file), png_hash)
+
+        # an image the cache wrote is updated with its entry
+        os.remove(png_file)
+        cache.export_png(self.fp_parent_file, 'R_0805_2012Metric', out_dir)
+        entry = cache.lookup(self.fp_parent_file, 'R_0805_2012Metric')
+        shutil.copyfile(self.fp_parent_file + '/SOIC-8_3.9x4.9mm_P1.27mm.png', entry + '/footprint.png')
+        cache.export_png(self.fp_parent_file, 'R_0805_2012Metric', out_dir)
+        self.assertEqual(file_hash(png_file), png_hash)
+
+    def test_without_kicad_cli(self):
+        cache = FootprintCache(self.cache_dir, '/nonexistent/kicad-cli', renderer='kicad-cli')
+        self.assertIsNone(cache.render(self.fp_parent_file, 'R_0805_2012Metric'))
+        self.assertEqual(cache.prewarm(self.fp_parent_file), 0)
+
+        # an image already in the temp directory is used as is
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        png_file = temp_dir + '/R_0805_2012Metric.png'
+        shutil.copyfile(self.fp_parent_file + '/R_0805_2012Metric.png', png_file)
+        png_hash = file_hash(png_file)
+
+        self.assertEqual(prepare_footprint_png(temp_dir, '/nonexistent/kicad-cli', self.fp_parent_file, 'R_0805_2012Metric'), (png_file, self.fp_parent_file))
+        self.assertEqual(file_hash(png_file), png_hash)
+
+    def test_lru_eviction(self):
+        cache = FootprintCache(self.cache_dir, 'no-kicad-cli')
+        old_entry = self.add_entry(cache, 'SOIC-8_3.9x4.9mm_P1.27mm')
+        os.utime(old_entry, (0, 0))
+        new_entry = self.add_entry(cache, 'R_0805_2012Metric')
+
+        cache.max_size = sum(os.path.getsize(new_entry + '/' + file) for file in os.listdir(new_entry))
+        cache.evict()
+
+        self.assertFalse(os.path.exists(old_entry))
+        self.assertTrue(os.path.exists(new_entry))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+from fixtures import *
+from footprint_cache import FootprintCache
+from footprint_raster import MARGIN, rasterize_footprint, rasterize_pads
+
+import shutil
+import tempfile
+
+
+class TestFootprintRaster(unittest.TestCase):
+
+    def setUp(self):
+        self.fp_parent_file = current_directory + '/testfiles'
+
+    def copper(self, img):
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) < 128
+
+    def test_matches_kicad_cli_render(self):
+        fp_file = self.fp_parent_file + '/SOIC-8_3.9x4.9mm_P1.27mm.kicad_mod'
+        expected = cv2.imread(self.fp_parent_file + '/SOIC-8_3.9x4.9mm_P1.27mm.png')
+        img = rasterize_footprint(fp_file)
+
+        self.assertEqual(img.shape, expected.shape)
+        copper, expected_copper = self.copper(img), self.copper(expected)
+        self.assertGreater(np.count_nonzero(copper & expected_copper) / np.count_nonzero(copper | expected_copper), 0.99)
+
+        contours = cv2.findContours(cv2.bitwise_not(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+        self.assertEqual(len(contours), 8)
+
+    def test_pad_shapes(self):
+        pad = {'number': '1', 'type': 'thru_hole', 'shape': 'rect', 'pos': {'x': 0, 'y': 0, 'orientation': 0}, 'size': {'x': 2, 'y': 1},
+               'layers': ['*.Cu', '*.Mask'], 'drill': {}, 'roundrect_rratio': {}, 'rect_delta': {}}
+        px_per_mm = 10
+        margin_px = MARGIN * px_per_mm
+
+        img = rasterize_pads([pad], px_per_mm)
+        self.assertEqual(img.shape[:2], (12, 22))
+        self.assertEqual(np.count_nonzero(self.copper(img)), 20 * 10)
+
+        # rotated by 90 degrees
+        img = rasterize_pads([dict(pad, pos={'x': 0, 'y': 0, 'orientation': 90})], px_per_mm)
+        self.assertEqual(img.shape[:2], (22, 12))
+
+        # drill holes are left white
+        img = rasterize_pads([dict(pad, drill={'shape': 'circular', 'size': {'x': 0.6, 'y': 0.6}, 'offset': {}})], px_per_mm)
+        self.assertFalse(self.copper(img)[int(margin_px + 5), int(margin_px + 10)])
+        self.assertTrue(self.copper(img)[int(margin_px + 1), int(margin_px + 1)])
+
+        # rounded corners are left white
+        img = rasterize_pads([dict(pad, shape='oval')], px_per_mm)
+        self.assertFalse(self.copper(img)[int(margin_px), int(margin_px)])
+        self.assertLess(np.count_nonzero(self.copper(img)), 20 * 10)
+
+        # back copper is not drawn
+        self.assertEqual(np.count_nonzero(self.copper(rasterize_pads([pad, dict(pad, pos={'x': 5, 'y': 0, 'orientation': 0}, layers=['B.Cu'])], px_per_mm))), 20 * 10)
+
+    def test_cache_renders_without_kicad(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = FootprintCache(cache_dir, 'no-kicad-cli', renderer='raster')
+            self.assertNotEqual(cache.key(self.fp_parent_file, 'R_0805_2012Metric'), FootprintCache(cache_dir, 'no-kicad-cli', renderer='kicad-cli').key(self.fp_parent_file, 'R_0805_2012Metric'))
+
+            entry = cache.render(self.fp_parent_file, 'R_0805_2012Metric')
+            self.assertEqual(cache.lookup(self.fp_parent_file, 'R_0805_2012Metric'), entry)
+            self.assertEqual(sorted(os.listdir(entry)), ['footprint.png', 'meta.json'])
+
+            png_file = cache.export_png(self.fp_parent_file, 'R_0805_2012Metric', cache_dir)
+            self.assertEqual(cv2.imread(png_file).shape, cv2.imread(self.fp_parent_file + '/R_0805_2012Metric.png').shape)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_cache_evicts_raster_renders(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = FootprintCache(cache_dir, 'no-kicad-cli', renderer='raster')
+            old_entry = cache.render(self.fp_parent_file, 'SOIC-8_3.9x4.9mm_P1.27mm')
+            os.utime(old_entry, (0, 0))
+
+            # room for one entry, the next render evicts the older one
+            cache.max_size = sum(os.path.getsize(old_entry + '/' + file) for file in os.listdir(old_entry))
+            new_entry = cache.render(self.fp_parent_file, 'R_0805_2012Metric')
+
+            self.assertFalse(os.path.exists(old_entry))
+            self.assertTrue(os.path.exists(new_entry))
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_matches_with_raster_render(self):
+        pcb = load_board('0')
+        fp_name = 'SOIC-8_3.9x4.9mm_P1.27mm'
+        expected = load_component_matching(pcb, fp_name).get_matches()
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = FootprintCache(cache_dir, 'no-kicad-cli', renderer='raster')
+            png_file = cache.export_png(self.fp_parent_file, fp_name, cache_dir)
+
+            cm = ComponentMatching()
+            cm.pcb_board = pcb
+            cm.initialize_fp_from_file(png_file, self.fp_parent_file + '/' + fp_name + '.kicad_mod')
+            matches = cm.get_matches()
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        self.assertTrue(len(matches) > 0)
+        self.assertEqual([(match.coordinates, match.orientation, match.fb, match.pad_list) for match in matches],
+                         [(match.coordinates, match.orientation, match.fb, match.pad_list) for match in expected])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from fixtures import *
+from PCB_utils import get_board_bounds
+from identifyHoles import getHolesFromDRL, getHoleArrayFromDRL, drillToPixels
+from gerber.excellon import DrillSlot
+import gerber
+
+import tempfile
+
+
+class TestDrillReader(unittest.TestCase):
+
+    def test_matches_pcb_tools(self):
+        for name in ['22_test.drl', '23_test_drill.drl', 'estacao_metereologica_lora.drl', 'Adafruit LSM9DS1 Rev C.drl']:
+            drill = current_directory + '/testfiles/' + name
+            holes = getHoleArrayFromDRL(drill)
+            hits = gerber.read(drill).hits
+
+            self.assertEqual(len(holes), len(hits))
+            for hole, hit in zip(holes, hits):
+                if isinstance(hit, DrillSlot):
+                    self.assertTrue(hole['is_slot'])
+                    self.assertEqual((hole['sx'], hole['sy'], hole['ex'], hole['ey']), hit.start + hit.end)
+                    self.assertEqual((hole['x'], hole['y']), ((hit.start[0] + hit.end[0]) / 2.0, (hit.start[1] + hit.end[1]) / 2.0))
+                else:
+                    self.assertFalse(hole['is_slot'])
+                    self.assertEqual((hole['x'], hole['y']), hit.position)
+                self.assertAlmostEqual(hole['diameter'], hit.tool.diameter)
+
+            self.assertEqual([hole.coordinates for hole in getHolesFromDRL(drill)], list(zip(holes['x'].tolist(), holes['y'].tolist())))
+
+    def test_plating_units_and_routed_slots(self):
+        # 22_test has 12 hits with NonPlated tools
+        self.assertEqual(np.count_nonzero(~getHoleArrayFromDRL(current_directory + '/testfiles/22_test.drl')['plated']), 12)
+
+        drill = tempfile.mkstemp(suffix='.drl')[1]
+        try:
+            with open(drill, 'w') as f:
+                f.write('M48\n; #@! TF.FileFunction,NonPlated,1,2,NPTH\nINCH,LZ\nT1C0.0394\nT2C0.0236\n%\nG90\nG05\nT1\nX015Y-02\nY-025\nT2\nG00X01Y-01\nM15\nG01X02Y-01\nM16\nG05\nM30\n')
+            holes = getHoleArrayFromDRL(drill)
+        finally:
+            os.remove(drill)
+
+        self.assertFalse(holes['plated'].any())
+        np.testing.assert_allclose(np.stack([holes['x'], holes['y']], axis=1), [[38.1, -50.8], [38.1, -63.5], [38.1, -25.4]])
+        self.assertEqual(holes['is_slot'].tolist(), [False, False, True])
+        self.assertAlmostEqual(holes['diameter'][0], 1.00076)
+
+    def test_pixels_match_profile_conversion(self):
+        pcb_file = current_directory + '/testfiles/Adafruit LSM9DS1 Rev C.kicad_pcb'
+        holes = getHoleArrayFromDRL(current_directory + '/testfiles/Adafruit LSM9DS1 Rev C.drl')
+        tl_coords, width, height = get_board_bounds(pcb_file)
+        shape = (1000, 1500, 3)
+
+        xs, ys = drillToPixels(holes['x'], holes['y'], tl_coords, width, height, shape)
+        for x, y, px, py in zip(holes['x'].tolist(), holes['y'].tolist(), xs.tolist(), ys.tolist()):
+            self.assertEqual((px, py), (abs(round(((x - tl_coords[0]) / width) * shape[1])), abs(round(((abs(y) - tl_coords[1]) / height) * shape[0]))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from fixtures import *
+from Objectifier import Objectifier, Node
+
+
+class TestObjectifierIndex(unittest.TestCase):
+
+    def assertSameNodes(self, nodes, other_nodes):
+        self.assertEqual([id(node) for node in nodes], [id(node) for node in other_nodes])
+
+    def test_xpath_same_as_search(self):
+        for file in [current_directory + '/testfiles/0_test_pcb.kicad_pcb', current_directory + '/testfiles/UNO-TH_Rev3e.net']:
+            root = Objectifier(file).root
+            plain_root = Objectifier(file, index=False).root
+            self.assertIsNone(plain_root._child_index)
+
+            nodes = []
+            root.depth_first_search(lambda node: nodes.append(node) or True)
+
+            paths = set('/' + '/'.join(node.path) for node in nodes if all(isinstance(name, str) for name in node.path))
+            for path in sorted(paths) + ['/' + root.name, '/not_a_node', root.name]:
+                self.assertSameNodes(root.xpath(path), root._xpath_search(path))
+                self.assertEqual(len(root.xpath(path)), len(plain_root.xpath(path)))
+
+            for node in nodes[::7]:
+                for child in node:
+                    if isinstance(child, Node) and isinstance(child.name, str):
+                        for path in [child.name, child.name + '/at', child.name + '/xy', child.name + '/ref']:
+                            self.assertSameNodes(node.xpath(path), node._xpath_search(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
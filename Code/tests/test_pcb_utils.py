@@ -0,0 +1,306 @@
+import unittest
+
+from fixtures import *
+from PCB_utils import TraceLabels, TRACE_BACKENDS, HOLE_BACKENDS, board_profile_key
+
+import random
+import shutil
+import tempfile
+
+
+class TestPadIndex(unittest.TestCase):
+
+    def test_pad_at_matches_point_polygon_test(self):
+        pcb = load_board('0')
+        pad_index = pcb.get_pad_index()
+
+        for pad_ID, cnt in enumerate(pcb.mask_contours):
+            x, y, w, h = cv2.boundingRect(cnt)
+            for p_y in range(y - 1, y + h + 1):
+                for p_x in range(x - 1, x + w + 1):
+                    inside = cv2.pointPolygonTest(cnt, (p_x, p_y), False) == 1
+                    self.assertEqual(pad_index.pad_at((p_x, p_y)) == pad_ID, inside, f'pad {pad_ID} at {(p_x, p_y)}')
+
+    def test_center_lookup(self):
+        pcb = load_board('1')
+        cm = load_component_matching(pcb, 'R_0805_2012Metric')
+
+        centers = list(pcb.front_pad_map.values())[::3] + [(-5, -5)]
+        expected = [pad_ID for center in centers for pad_ID, pad_center in pcb.front_pad_map.items() if center == pad_center]
+
+        self.assertIs(pcb.find_pad_index(pcb.front_pad_map), pcb.get_pad_index())
+        self.assertEqual(cm.get_list_from_pad_centers(centers, pcb.front_pad_map), expected)
+        self.assertEqual(cm.get_list_from_pad_centers(centers, pcb.front_pad_map.copy()), expected)
+        self.assertEqual(cm.get_list_from_pad_centers(centers, {0: centers[0]}), [0])
+
+
+class TestTraceBackends(unittest.TestCase):
+
+    def assertSameConnections(self, pcb, pcb_labels):
+        self.assertEqual(pcb.board_connections_dict.keys(), pcb_labels.board_connections_dict.keys())
+        for trace, connection in pcb.board_connections_dict.items():
+            for key in ['front traces', 'back traces', 'front pads', 'back pads']:
+                self.assertEqual(connection[key], pcb_labels.board_connections_dict[trace][key], f'trace {trace} {key}')
+
+    def test_single_sided(self):
+        for board_ID in ['0', '1']:
+            self.assertSameConnections(load_board(board_ID), load_board(board_ID, trace_backend='labels'))
+
+    def test_double_sided(self):
+        self.assertSameConnections(load_double_sided_board(), load_double_sided_board(trace_backend='labels'))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            PCB_Board(current_directory + '/testfiles/0_test_pcb.kicad_pcb', trace_backend='gpu')
+
+
+class TestPadTraceIndex(unittest.TestCase):
+
+    def linear_traces(self, pcb, match):
+        # touched traces as found by scanning every connection of the board
+        touched_traces_dict = {}
+        for pin, pads in match.pad_IDs.items():
+            for pad in pads:
+                for trace_ID, trace_info in pcb.board_connections_dict.items():
+                    if pad in trace_info[match.fb + ' pads']:
+                        touched_traces_dict.setdefault(pin, []).append(trace_ID)
+                        break
+        return touched_traces_dict
+
+    def test_index_matches_connections(self):
+        pcb = load_double_sided_board()
+        pad_trace_index = pcb.get_pad_trace_index()
+
+        for fb in ['front', 'back']:
+            pad_map = pcb.front_pad_map if fb == 'front' else pcb.back_pad_map
+            for pad in pad_map.keys():
+                expected = [trace_ID for trace_ID, trace_info in pcb.board_connections_dict.items() if pad in trace_info[fb + ' pads']]
+                self.assertEqual(pad_trace_index.traces_of_pad(pad, fb), expected)
+                for trace_ID in expected:
+                    self.assertTrue(pad_trace_index.has_pad(trace_ID, pad, fb))
+
+    def test_update_traces(self):
+        pcb = load_board('1')
+        cm = load_component_matching(pcb, 'R_0805_2012Metric')
+        matches = cm.find_matches(pcb.mask_rgb, cm.footprint_rgb, cm.fp_alpha, pcb.front_pad_map, 0)
+        self.assertTrue(len(matches) > 0)
+
+        for match in matches:
+            match.update_traces(pcb)
+            self.assertEqual(match.touched_traces_dict, self.linear_traces(pcb, match))
+
+    def test_invalidation(self):
+        pcb = load_board('0')
+        pad_trace_index = pcb.get_pad_trace_index()
+        self.assertIs(pcb.get_pad_trace_index(), pad_trace_index)
+        self.assertIs(pcb.copy_self().get_pad_trace_index(), pad_trace_index)
+
+        # dropping a connection (as a trace cut would) replaces board_connections_dict
+        trace_ID = next(iter(pcb.board_connections_dict))
+        pad = pcb.board_connections_dict[trace_ID]['front pads'][0]
+        pcb.board_connections_dict = {t: c for t, c in pcb.board_connections_dict.items() if t != trace_ID}
+
+        self.assertIsNot(pcb.get_pad_trace_index(), pad_trace_index)
+        self.assertNotIn(trace_ID, pcb.get_pad_trace_index().traces_of_pad(pad))
+
+
+class TestIncrementalProfile(unittest.TestCase):
+
+    def trace_cuts(self, pcb, rng, num_cuts=4):
+        # small squares centered on copper pixels
+        trace_cuts = {'front cuts': [], 'back cuts': []}
+        sides = [('front', pcb.pcb_rgb)]
+        if pcb.double_sided:
+            sides.append(('back', pcb.pcb_rgb_back))
+
+        for fb, pcb_rgb in sides:
+            ys, xs = np.where(pcb_rgb[:, :, 0] < 128)
+            for n in range(num_cuts):
+                k = rng.randrange(len(xs))
+                x, y, r = int(xs[k]), int(ys[k]), rng.randrange(2, 12)
+                trace_cuts[fb + ' cuts'].append(np.array([[[x - r, y - r]], [[x + r, y - r]], [[x + r, y + r]], [[x - r, y + r]]], np.int32))
+
+        return trace_cuts
+
+    def assertSameAsFullProfile(self, pcb):
+        full_pcb = pcb.copy_self()
+        if pcb.double_sided:
+            full_pcb.update_profile(pcb.pcb_rgb, pcb.pcb_rgb_back, incremental=False)
+            self.assertEqual(full_pcb.back_pad_map, pcb.back_pad_map)
+        else:
+            full_pcb.update_profile(pcb.pcb_rgb, incremental=False)
+
+        self.assertEqual(full_pcb.front_pad_map, pcb.front_pad_map)
+        self.assertEqual(full_pcb.board_connections_dict, pcb.board_connections_dict)
+
+    def check_trace_cuts(self, pcb):
+        rng = random.Random(0)
+        original_connections = pcb.board_connections_dict
+
+        for step in range(4):
+            if step == 2:
+                pcb.revert_original()
+            pcb.integrate_trace_cuts(self.trace_cuts(pcb, rng))
+            self.assertSameAsFullProfile(pcb)
+
+        self.assertNotEqual(pcb.board_connections_dict, original_connections)
+
+    def test_single_sided(self):
+        self.check_trace_cuts(load_board('1'))
+
+    def test_double_sided(self):
+        self.check_trace_cuts(load_double_sided_board())
+
+    def test_unchanged_contours_reused(self):
+        pcb = load_board('0')
+        cache = pcb.contour_profile_cache
+        keys = list(cache.keys('front', pcb.trace_contours, pcb.trace_hierarchy))
+        pads = {key: entry['pads'] for key, entry in cache.entries['front'].items()}
+
+        pcb.update_profile(pcb.pcb_rgb.copy())
+        self.assertEqual(cache.keys('front', pcb.trace_contours, pcb.trace_hierarchy), keys)
+        for key in keys:
+            self.assertIs(cache.entries['front'][key]['pads'], pads[key])
+
+
+class TestBoardSnapshots(unittest.TestCase):
+
+    def front_cut(self, pcb):
+        # cut through the middle of the first front trace with pads
+        trace_ID = next(trace_ID for trace_ID, connection in pcb.board_connections_dict.items() if len(connection['front pads']) > 1)
+        pad_center = pcb.front_pad_map[pcb.board_connections_dict[trace_ID]['front pads'][0]]
+        (x, y) = pad_center
+        return {'front cuts': [np.array([[[x - 15, y - 15]], [[x + 15, y - 15]], [[x + 15, y + 15]], [[x - 15, y + 15]]], np.int32)], 'back cuts': []}
+
+    def test_layers_shared(self):
+        pcb = load_double_sided_board()
+        pcb_rgb, pcb_rgb_back = pcb.pcb_rgb, pcb.pcb_rgb_back
+        pcb_rgb_pixels = pcb_rgb.copy()
+        board_connections_dict = pcb.board_connections_dict
+
+        pcb_copy = pcb.copy_self()
+        self.assertIs(pcb_copy.pcb_rgb, pcb_rgb)
+        self.assertIs(pcb_copy.mask_rgb_back, pcb.mask_rgb_back)
+
+        pcb.integrate_trace_cuts(self.front_cut(pcb))
+        self.assertIsNot(pcb.pcb_rgb, pcb_rgb)
+        self.assertIs(pcb.pcb_rgb_back, pcb_rgb_back)
+        self.assertTrue(np.array_equal(pcb_rgb, pcb_rgb_pixels))
+
+        # the copy keeps the state it was made with
+        self.assertIs(pcb_copy.pcb_rgb, pcb_rgb)
+        self.assertIs(pcb_copy.board_connections_dict, board_connections_dict)
+
+        pcb.revert_original()
+        self.assertIs(pcb.pcb_rgb, pcb_rgb)
+        self.assertIs(pcb.board_connections_dict, board_connections_dict)
+
+    def test_revert(self):
+        pcb = load_board('1')
+        original_state = pcb.snapshot().state
+
+        pcb.integrate_trace_cuts(self.front_cut(pcb))
+        first_cut_state = pcb.snapshot().state
+        self.assertNotEqual(pcb.board_connections_dict, original_state['board_connections_dict'])
+
+        pcb.integrate_trace_cuts(self.front_cut(pcb))
+        branch = pcb.copy_self()
+
+        pcb.revert()
+        self.assertEqual(pcb.snapshot().state, first_cut_state)
+
+        branch.revert_original()
+        self.assertEqual(branch.snapshot().state, original_state)
+
+
+class TestBoardProfileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def board_state(self, pcb):
+        hole_arr = getattr(pcb, 'hole_arr', [])
+        hole_IDs = {id(hole): hole_ID for hole_ID, hole in enumerate(hole_arr)}
+
+        state = {'holes': [(hole.diameter, hole.isPlated, hole.isVia, tuple(hole.coordinates), getattr(hole, 'isThroughHole', None), getattr(hole, 'isDrillHole', None)) for hole in hole_arr]}
+        state['board_connections_dict'] = {trace_ID: {key: [hole_IDs[id(v)] for v in val] if key == 'holes' else val for key, val in connection.items()} for trace_ID, connection in pcb.board_connections_dict.items()}
+        for name in ['mask_contours', 'trace_contours', 'mask_back_contours', 'trace_back_contours']:
+            if hasattr(pcb, name):
+                state[name] = [cnt.tolist() for cnt in getattr(pcb, name)]
+        for name in ['trace_hierarchy', 'trace_back_hierarchy', 'front_pad_map', 'back_pad_map']:
+            if hasattr(pcb, name):
+                state[name] = np.asarray(getattr(pcb, name)).tolist() if 'hierarchy' in name else getattr(pcb, name)
+
+        return state
+
+    def test_round_trip(self):
+        testfiles = current_directory + '/testfiles/'
+        boards = [(testfiles + '0_test_pcb.kicad_pcb', [testfiles + '0_test_pcb_mask.png', testfiles + '0_test_pcb_traces.png']),
+                  (testfiles + 'Adafruit LSM9DS1 Rev C.kicad_pcb', [testfiles + '24_test_pcb_mask.png', testfiles + '24_test_pcb_traces.png', testfiles + '24_test_pcb_mask_back.png', testfiles + '24_test_pcb_traces_back.png', testfiles + 'Adafruit LSM9DS1 Rev C.drl'])]
+
+        for pcb_file, input_files in boards:
+            pcb = PCB_Board(pcb_file)
+            pcb.initialize_via_files(*input_files, cache_dir=self.cache_dir)
+
+            cached_pcb = PCB_Board(pcb_file)
+            cached_pcb.initialize_via_files(*input_files, cache_dir=self.cache_dir)
+
+            self.assertEqual(self.board_state(pcb), self.board_state(cached_pcb))
+            self.assertEqual(cached_pcb.get_pad_index().pad_at(pcb.front_pad_map[0]), 0)
+
+        self.assertEqual(len([name for name in os.listdir(self.cache_dir) if not name.startswith('.')]), 2)
+
+    def test_key(self):
+        testfiles = current_directory + '/testfiles/'
+        input_files = [testfiles + '0_test_pcb.kicad_pcb', testfiles + '0_test_pcb_mask.png', testfiles + '0_test_pcb_traces.png', '', '', '']
+        key = board_profile_key(input_files, 'contours', 'contours')
+
+        changed_file = self.cache_dir + '/traces.png'
+        shutil.copyfile(input_files[2], changed_file)
+        self.assertEqual(board_profile_key(input_files[:2] + [changed_file] + input_files[3:], 'contours', 'contours'), key)
+
+        with open(changed_file, 'ab') as f:
+            f.write(b'0')
+        self.assertNotEqual(board_profile_key(input_files[:2] + [changed_file] + input_files[3:], 'contours', 'contours'), key)
+
+        # every backend combination has its own profile
+        keys = [board_profile_key(input_files, trace_backend, hole_backend) for trace_backend in TRACE_BACKENDS for hole_backend in HOLE_BACKENDS]
+        self.assertEqual(len(set(keys)), len(TRACE_BACKENDS) * len(HOLE_BACKENDS))
+
+
+class TestHoleBackends(unittest.TestCase):
+
+    def test_trace_labels(self):
+        pcb = load_board('1')
+        trace_img = cv2.bitwise_not(cv2.cvtColor(pcb.pcb_rgb, cv2.COLOR_BGR2GRAY))
+        labels = TraceLabels(pcb.trace_contours, pcb.trace_hierarchy, trace_img)
+
+        rng = random.Random(0)
+        points = [(rng.randrange(pcb.pcb_rgb.shape[1]), rng.randrange(pcb.pcb_rgb.shape[0])) for i in range(200)]
+        # points on contours too
+        points += [tuple(int(c) for c in pcb.trace_contours[i][0][0]) for i in range(0, len(pcb.trace_contours), 5)]
+
+        for point, within in zip(points, labels.containing(points)):
+            self.assertEqual(within, set(i for i in range(len(pcb.trace_contours)) if cv2.pointPolygonTest(pcb.trace_contours[i], point, False) == 1))
+
+    def test_same_profile(self):
+        pcb = load_double_sided_board(hole_backend='labels')
+        contours_pcb = load_double_sided_board(hole_backend='contours')
+
+        self.assertEqual(TestBoardProfileCache.board_state(self, pcb), TestBoardProfileCache.board_state(self, contours_pcb))
+        self.assertTrue(any(hole.isVia for hole in pcb.hole_arr))
+
+        # after trace cuts (full profile, 'create_vias_maps')
+        trace_cuts = TestIncrementalProfile.trace_cuts(self, pcb, random.Random(1))
+        for board in [pcb, contours_pcb]:
+            board.integrate_trace_cuts(trace_cuts)
+            board.update_profile(board.pcb_rgb.copy(), board.pcb_rgb_back.copy(), incremental=False)
+
+        self.assertEqual(TestBoardProfileCache.board_state(self, pcb), TestBoardProfileCache.board_state(self, contours_pcb))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from fixtures import *
+from Objectifier import Objectifier
+from sch_reader import Netlist, get_connections, get_ordered_components_list, get_footprint_of_ref, get_lib_part, get_pins_of_ref
+
+
+class TestNetlist(unittest.TestCase):
+
+    def test_indexes_match_tree_search(self):
+        filename_net = current_directory + '/testfiles/UNO-TH_Rev3e.net'
+        netlist = Netlist(filename_net)
+        root = Objectifier(filename_net).root
+
+        self.assertEqual(netlist.refs, [cmpnt.xpath('ref')[0].first_child for cmpnt in root.xpath('/export/components/comp')])
+        for ref in netlist.refs:
+            lib, part = get_lib_part(root, ref)
+            self.assertEqual(netlist.components[ref], {'lib': lib, 'part': part, 'footprint': get_footprint_of_ref(root, ref)})
+            self.assertEqual(netlist.pins_of_ref(ref), get_pins_of_ref(root, lib, part))
+
+    def test_module_functions(self):
+        for filename_net in ['1_test_net.net', 'Adafruit ATECC608.net']:
+            netlist = Netlist(current_directory + '/testfiles/' + filename_net)
+            self.assertEqual(get_connections(current_directory + '/testfiles/' + filename_net), netlist.get_connections())
+            self.assertEqual(get_ordered_components_list(current_directory + '/testfiles/' + filename_net), netlist.get_ordered_components_list())
+
+        nets_arr = Netlist(current_directory + '/testfiles/1_test_net.net').get_connections()
+        self.assertTrue(all('unconnected' not in net['name'] for net in nets_arr))
+        self.assertTrue(all(node['total pins'] > 0 for net in nets_arr if net['name'][:3] == 'Net' for node in net['node arr']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from fixtures import *
+from Objectifier import Objectifier, Node
+import sexpr
+import sexpdata
+
+
+def node_to_list(node):
+    return [sexpdata.Symbol(node.name) if isinstance(node.name, str) else node.name] + [node_to_list(child) if isinstance(child, Node) else child for child in node]
+
+
+class TestSexprReader(unittest.TestCase):
+
+    def test_read_sexp_same_as_parse_sexp(self):
+        for file in ['/testfiles/SOIC-8_3.9x4.9mm_P1.27mm.kicad_mod', '/testfiles/R_0805_2012Metric.kicad_mod', '/testfiles/0_test_pcb.kicad_pcb']:
+            with open(current_directory + file) as f:
+                text = f.read()
+            self.assertEqual(sexpr.read_sexp(text), sexpr.parse_sexp(text))
+
+        self.assertEqual(sexpr.read_sexp('(a "b \\"c\\"" "" -1 2.5 +3 1.5.2 (d))'), ['a', 'b "c"', '', -1, 2.5, '+3', '1.5.2', ['d']])
+        self.assertRaises(sexpr.SexprError, sexpr.read_sexp, '(a (b)')
+        self.assertRaises(sexpr.SexprError, sexpr.read_sexp, '(a) (b)')
+
+    def test_objectifier_same_as_sexpdata(self):
+        for file in ['/testfiles/0_test_pcb.kicad_pcb', '/testfiles/1_test_net.net']:
+            with open(current_directory + file) as f:
+                expected = sexpdata.load(f)
+            tree = node_to_list(Objectifier(current_directory + file).root)
+            self.assertEqual(tree, expected)
+            self.assertEqual(str(tree), str(expected))
+
+    def test_sections(self):
+        pcb_file = current_directory + '/testfiles/0_test_pcb.kicad_pcb'
+        sections = ['footprint', 'gr_line']
+
+        with open(pcb_file) as f:
+            text = f.read()
+        parsed = sexpr.read_sexp(text)
+        self.assertEqual(sexpr.read_sexp(text, sections=sections), parsed[:1] + [item for item in parsed[1:] if item[0] in sections])
+
+        root = Objectifier(pcb_file).root
+        section_root = Objectifier(pcb_file, sections=sections).root
+        self.assertEqual([child.name for child in section_root], [child.name for child in root if child.name in sections])
+        self.assertEqual(node_to_list(section_root.xpath('/kicad_pcb/footprint')[-1]), node_to_list(root.xpath('/kicad_pcb/footprint')[-1]))
+        self.assertEqual(section_root.xpath('/kicad_pcb/segment'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
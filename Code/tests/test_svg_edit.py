@@ -0,0 +1,39 @@
+import unittest
+
+from fixtures import *
+from svg_edit import crop_footprint_svg, svg_to_array
+from lxml import etree
+
+
+class TestSvgToArray(unittest.TestCase):
+
+    def setUp(self):
+        # written by gen_footprint_PNG, the svg is already cropped
+        self.svg_file = parent_directory + '/temp/0603R.svg'
+        self.png_file = parent_directory + '/temp/0603R.png'
+
+    def test_crop_in_memory(self):
+        with open(self.svg_file, 'rb') as f:
+            svg = f.read()
+
+        root = etree.fromstring(svg)
+        width, height = root.attrib['width'], root.attrib['height']
+        crop_footprint_svg(root)
+
+        self.assertAlmostEqual(float(root.attrib['width'][:-2]), float(width[:-2]), places=6)
+        self.assertAlmostEqual(float(root.attrib['height'][:-2]), float(height[:-2]), places=6)
+        with open(self.svg_file, 'rb') as f:
+            self.assertEqual(f.read(), svg)
+
+    def test_matches_png(self):
+        try:
+            img = svg_to_array(etree.parse(self.svg_file))
+        except (OSError, RuntimeError) as e:
+            self.skipTest(f'cairo unavailable: {e}')
+
+        self.assertEqual(img.shape, cv2.imread(self.png_file).shape)
+        self.assertEqual(img.shape, svg_to_array(self.svg_file).shape)
+
+
+if __name__ == '__main__':
+    unittest.main()